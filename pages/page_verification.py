@@ -1,7 +1,7 @@
 import streamlit as st
 import time
 from utils.util_sms_sender import send_sms, generate_verification_code
-from utils.utils_gsheet import update_sheet_add_row
+from utils.util_datastore import append_log
 
 WEBAPP_NAME = "BASECAMP Agent"
 
@@ -44,7 +44,7 @@ def page_verification():
                         admin_mode = "관리자"
                     else:
                         admin_mode = "일반(학생)"
-                    update_sheet_add_row("tbl_mbr_login_incr", [date_partition, create_dt, phn_no, admin_mode])
+                    append_log("tbl_mbr_login_incr", [date_partition, create_dt, phn_no, admin_mode])
 
                     st.session_state.verification_code = verification_code
                     st.session_state.logged_in = True # 메인 페이지로 이동
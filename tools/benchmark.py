@@ -0,0 +1,302 @@
+"""
+구글 시트 유틸리티와 대시보드 데이터 경로의 벤치마크
+
+- 합성 tbl_mbr_req_incr / tbl_agent_usg_incr 테이블(기본 1천~10만 행, --sizes로 100만 행까지)을 로컬 시트 서버에 만들고
+  경로별 실행 시간(중앙값), 시트 API 호출 수, 최대 메모리 사용량(tracemalloc)을 측정
+- 로컬 시트 서버(tools/fake_services.py)는 별도 프로세스로 실행하여 메모리 측정에 서버 측 할당이 포함되지 않도록 함
+- 기준값(tools/benchmark_baseline.json) 대비 실행 시간/메모리가 허용 범위를 넘거나 API 호출 수가 늘어나면 종료 코드 1
+
+실행 예:
+    python tools/benchmark.py                       # 기준값과 비교
+    python tools/benchmark.py --update-baseline     # 기준값 갱신
+    python tools/benchmark.py --sizes 1000000 --cases read_sheet_cold
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+import urllib.request
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCHMARK_SIZES = [1000, 10000, 100000]
+BENCHMARK_REPEAT = 3
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+WALL_TOLERANCE = 0.5  # 기준 대비 허용하는 실행 시간 증가율 (머신/부하에 따른 편차 고려)
+WALL_MIN_DIFF_SEC = 0.005  # 이보다 작은 실행 시간 증가는 무시 (캐시 적중 등 1ms 미만 항목의 편차)
+MEMORY_TOLERANCE = 0.25  # 기준 대비 허용하는 최대 메모리 증가율
+MEMORY_MIN_DIFF_MB = 1.0  # 이보다 작은 메모리 증가는 무시
+LOOKUPS_PER_RUN = 1000  # is_registered_user 1회 측정당 조회 수
+UPDATED_ROWS = 10  # update_sheet_specific_rows 1회 측정당 변경 행 수
+SERVER_START_TIMEOUT_SEC = 120
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _serve_sheets(port, size, ready):
+    """(별도 프로세스) 합성 데이터를 채운 로컬 시트 서버를 실행합니다."""
+    from tools.fake_services import FakeServer, FakeSheets, LatencyProfile, seed_sheets
+
+    os.environ["GSHEET_API_BASE_URL"] = f"http://127.0.0.1:{port}"
+    server = FakeServer(FakeSheets(LatencyProfile(0, 0, None)), port=port)
+    seed_sheets(server.service, members=size, usage_rows=size)
+    server.start()
+    ready.set()
+    while True:
+        time.sleep(3600)
+
+class SheetsServer:
+    """크기별로 다시 시작하는 로컬 시트 서버 프로세스 (포트는 고정하여 앱의 GSHEET_API_BASE_URL 유지)"""
+
+    def __init__(self, port):
+        self.port = port
+        self.base_url = f"http://127.0.0.1:{port}"
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+
+    def start(self, size):
+        self.stop()
+        ready = self._context.Event()
+        self._process = self._context.Process(target=_serve_sheets, args=(self.port, size, ready), daemon=True)
+        self._process.start()
+        if not ready.wait(SERVER_START_TIMEOUT_SEC):
+            raise RuntimeError("sheets server did not start")
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def calls(self):
+        with urllib.request.urlopen(f"{self.base_url}/__stats", timeout=10) as response:
+            return json.loads(response.read())["calls"]
+
+    def reset(self):
+        urllib.request.urlopen(urllib.request.Request(f"{self.base_url}/__reset", data=b"", method="POST"), timeout=10).read()
+
+def _reset_app_state():
+    """
+    크기 변경 시 앱의 프로세스 공유 상태를 새 데이터로 다시 만듭니다.
+    - 시트 핸들은 미리 열어 두어 핸들 생성 호출(메타데이터 조회)은 측정에서 제외
+    - 회원 색인/사용 이력 집계는 새로 생성하지 않고 다시 읽음 (백그라운드 갱신 스레드가 늘어나지 않도록)
+    """
+    from utils.utils_gsheet import invalidate_sheet_cache, invalidate_worksheet, get_worksheet
+    from utils.util_member_index import get_member_index
+    from utils.util_usage_rollup import get_usage_rollup
+    from utils.util_partitioned_reader import get_partitioned_reader
+
+    for table in ["tbl_mbr_req_incr", "tbl_agent_usg_incr"]:
+        invalidate_sheet_cache(table)
+        invalidate_worksheet(table)
+        get_worksheet(table)
+    get_partitioned_reader.clear()
+    # 백그라운드 갱신이 측정 중에 시트를 조회하지 않도록 중지하고 직접 갱신
+    member_index = get_member_index()
+    member_index.close()
+    if not member_index.refresh():
+        raise RuntimeError("member index refresh failed")
+    usage_rollup = get_usage_rollup()
+    usage_rollup.close()
+    usage_rollup.rebuild()
+
+class Case:
+    """벤치마크 경로 1개: setup(ctx, repeat)은 측정에서 제외하고 run(ctx)만 측정"""
+
+    def __init__(self, name, run, setup=None, description=""):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda ctx, repeat: None)
+        self.description = description
+
+def _cases():
+    from utils.utils_gsheet import read_sheet_by_df, invalidate_sheet_cache, update_sheet_specific_rows
+    from utils.util_member_index import get_member_index, is_registered_user
+    from utils.util_usage_rollup import get_usage_rollup
+    from utils.util_partitioned_reader import get_partitioned_reader
+    from utils.util_datastore import query_table
+    from tools.fake_services import member_phone
+
+    def cold_sheet(ctx, repeat):
+        invalidate_sheet_cache("tbl_mbr_req_incr")
+
+    def warm_sheet(ctx, repeat):
+        read_sheet_by_df("tbl_mbr_req_incr")
+
+    def cold_member_index(ctx, repeat):
+        invalidate_sheet_cache("tbl_mbr_req_incr")
+
+    def run_member_index(ctx):
+        if not get_member_index().refresh():
+            raise RuntimeError("member index refresh failed")
+
+    def lookups(ctx, repeat):
+        step = max(1, ctx["size"] // LOOKUPS_PER_RUN)
+        ctx["phones"] = [member_phone(i) for i in range(0, ctx["size"], step)][:LOOKUPS_PER_RUN]
+
+    def run_lookups(ctx):
+        for phone in ctx["phones"]:
+            is_registered_user(phone, "normal")
+
+    def changed_rows(ctx, repeat):
+        # 측정마다 상태를 번갈아 바꿔 항상 UPDATED_ROWS개 셀이 변경되도록 함
+        original_df = read_sheet_by_df("tbl_mbr_req_incr")
+        updated_df = original_df.copy()
+        updated_df.loc[updated_df.index[:UPDATED_ROWS], "status"] = "대기" if repeat % 2 == 0 else "활성"
+        ctx["update"] = (original_df, updated_df)
+
+    def run_update(ctx):
+        success, updated_count = update_sheet_specific_rows("tbl_mbr_req_incr", *ctx["update"])
+        if not success or updated_count != UPDATED_ROWS:
+            raise RuntimeError(f"update failed: {success}, {updated_count}")
+
+    def cold_rollup(ctx, repeat):
+        get_partitioned_reader.clear()
+
+    def warm_dashboard(ctx, repeat):
+        ctx["phone"] = member_phone(ctx["size"] // 2)
+        ctx["end_date"] = time.strftime("%Y%m%d", time.localtime())
+        ctx["start_date"] = time.strftime("%Y%m%d", time.localtime(time.time() - 30 * 86400))
+        # 증분 조회 주기(INCREMENTAL_REFRESH_SEC) 안에서 측정되도록 직전에 조회하여 API 호출 수를 고정
+        query_table("tbl_agent_usg_incr", ctx["start_date"], ctx["end_date"], limit=1)
+
+    def run_dashboard_summary(ctx):
+        usage_rollup = get_usage_rollup()
+        usage_rollup.totals()
+        usage_rollup.daily()
+        usage_rollup.by("subject")
+        usage_rollup.by("access_type")
+        df_top = usage_rollup.top_users(10)
+        df_top["name"] = df_top["phn_no"].map(get_member_index().names())
+
+    def run_dashboard_page(ctx):
+        df_page, _ = query_table("tbl_agent_usg_incr", ctx["start_date"], ctx["end_date"], sort_by="create_dt", offset=0, limit=50)
+        df_page.assign(name=df_page["phn_no"].map(get_member_index().names()))
+        query_table("tbl_agent_usg_incr", ctx["start_date"], ctx["end_date"], filters={"phn_no": ctx["phone"]}, sort_by="create_dt", limit=50)
+
+    return [
+        Case("read_sheet_cold", lambda ctx: read_sheet_by_df("tbl_mbr_req_incr"), cold_sheet, "read_sheet_by_df (캐시 미적중, 시트 전체 조회)"),
+        Case("read_sheet_warm", lambda ctx: read_sheet_by_df("tbl_mbr_req_incr"), warm_sheet, "read_sheet_by_df (캐시 적중)"),
+        Case("member_index_build", run_member_index, cold_member_index, "회원 색인 생성 (시트 조회 포함)"),
+        Case("is_registered_user", run_lookups, lookups, f"is_registered_user {LOOKUPS_PER_RUN}회"),
+        Case("update_specific_rows", run_update, changed_rows, f"update_sheet_specific_rows ({UPDATED_ROWS}행 변경)"),
+        Case("usage_rollup_build", lambda ctx: get_usage_rollup().rebuild(), cold_rollup, "사용 이력 집계 생성 (시트 조회 포함)"),
+        Case("dashboard_summary", run_dashboard_summary, warm_dashboard, "집계 합계/추이/과목별/상위 사용자 + 이름 매핑"),
+        Case("dashboard_page", run_dashboard_page, warm_dashboard, "사용 이력 30일 페이지 조회 (전체/연락처 조건)"),
+    ]
+
+def measure(case, ctx, server, repeat):
+    """(실행 시간 중앙값(초), 시트 API 호출 수, 최대 메모리(MB))를 반환합니다."""
+    wall_times = []
+    api_calls = None
+    for i in range(repeat):
+        case.setup(ctx, i)
+        server.reset()
+        start = time.perf_counter()
+        case.run(ctx)
+        wall_times.append(time.perf_counter() - start)
+        if api_calls is None:
+            api_calls = server.calls()
+
+    # 메모리는 tracemalloc 오버헤드가 실행 시간에 섞이지 않도록 별도로 1회 측정
+    case.setup(ctx, repeat)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        case.run(ctx)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(wall_times), api_calls, peak / 1024 / 1024
+
+def compare(results, baseline, wall_tolerance=WALL_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """기준값 대비 회귀 항목 목록을 반환합니다. 기준값이 없는 항목은 비교하지 않습니다."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result["wall_sec"] > base["wall_sec"] * (1 + wall_tolerance) and result["wall_sec"] - base["wall_sec"] > WALL_MIN_DIFF_SEC:
+            regressions.append(f"{key}: wall {result['wall_sec']:.4f}s > baseline {base['wall_sec']:.4f}s (+{wall_tolerance:.0%})")
+        if result["api_calls"] > base["api_calls"]:
+            regressions.append(f"{key}: api_calls {result['api_calls']} > baseline {base['api_calls']}")
+        if result["peak_mb"] > base["peak_mb"] * (1 + memory_tolerance) and result["peak_mb"] - base["peak_mb"] > MEMORY_MIN_DIFF_MB:
+            regressions.append(f"{key}: peak {result['peak_mb']:.1f}MB > baseline {base['peak_mb']:.1f}MB (+{memory_tolerance:.0%})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="구글 시트 유틸리티/대시보드 데이터 경로 벤치마크")
+    parser.add_argument("--sizes", type=int, nargs="+", default=BENCHMARK_SIZES, help="테이블 행 수")
+    parser.add_argument("--cases", nargs="+", default=None, help="실행할 항목 (기본: 전체)")
+    parser.add_argument("--repeat", type=int, default=BENCHMARK_REPEAT)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="결과를 기준값으로 저장 (기존 항목은 덮어씀)")
+    parser.add_argument("--wall-tolerance", type=float, default=WALL_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    parser.add_argument("--json", default=None, help="결과를 JSON 파일로 저장")
+    parser.add_argument("--list", action="store_true", help="항목 목록 출력")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for case in _cases():
+            print(f"{case.name:<24}{case.description}")
+        return 0
+
+    baseline_path = os.path.abspath(args.baseline)
+    json_path = os.path.abspath(args.json) if args.json else None
+    server = SheetsServer(_free_port())
+    # utils 모듈은 import 시 API 주소를 읽으므로 import 전에 지정하고, 캐시 파일은 임시 디렉터리에 생성
+    os.environ["GSHEET_API_BASE_URL"] = server.base_url
+    os.chdir(tempfile.mkdtemp(prefix="benchmark-"))
+
+    cases = [case for case in _cases() if args.cases is None or case.name in args.cases]
+    results = {}
+    print(f"{'case':<24}{'rows':>10}{'wall(s)':>12}{'api_calls':>11}{'peak(MB)':>10}")
+    try:
+        for size in args.sizes:
+            server.start(size)
+            _reset_app_state()
+            ctx = {"size": size}
+            for case in cases:
+                wall_sec, api_calls, peak_mb = measure(case, ctx, server, args.repeat)
+                key = f"{case.name}[{size}]"
+                results[key] = {"wall_sec": wall_sec, "api_calls": api_calls, "peak_mb": peak_mb}
+                print(f"{case.name:<24}{size:>10}{wall_sec:>12.4f}{api_calls:>11}{peak_mb:>10.1f}")
+    finally:
+        server.stop()
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.update_baseline:
+        baseline.update(results)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+        print(f"\nbaseline updated: {baseline_path}")
+        return 0
+
+    regressions = compare(results, baseline, args.wall_tolerance, args.memory_tolerance)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for regression in regressions:
+            print(f"- {regression}")
+        return 1
+    print(f"\nno regressions ({sum(key in baseline for key in results)}/{len(results)} compared with baseline)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
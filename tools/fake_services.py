@@ -0,0 +1,635 @@
+"""
+NCP SENS / OpenAI / Google Sheets API를 흉내 내는 로컬 서버
+
+- 각 서비스는 별도 포트의 HTTP 서버로 실행되며, 실제 API와 같은 경로/요청/응답 형식을 사용
+- 응답 지연은 서비스별 로그 정규분포(중앙값, p95)로 생성하고, 분당 요청 한도를 넘으면 429 응답
+- GET /__stats 로 경로별 호출 수/상태 코드를 조회하고, POST /__reset 으로 초기화
+
+실행 예:
+    python tools/fake_services.py --latency-scale 0.1 --seed-members 100
+
+출력되는 환경 변수(OPENAI_BASE_URL, SMS_API_BASE_URL, GSHEET_API_BASE_URL 등)를 지정하고 앱을 실행하면
+외부 API 대신 로컬 서버를 사용합니다.
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# python tools/fake_services.py로 실행하는 경우에도 저장소 루트의 utils를 import할 수 있도록 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 서비스별 기본 지연 시간(ms)과 분당 요청 한도
+SMS_LATENCY_MS = (80, 250)  # (중앙값, p95)
+SMS_RATE_LIMIT_PER_MIN = 1200
+SMS_COMPLETE_DELAY_SEC = 1.0  # 발송 요청 후 전송 결과가 확정되기까지의 시간
+SMS_FAIL_RATE = 0.02  # 전송 실패로 처리되는 메시지 비율
+SMS_SIGNATURE_MAX_AGE_SEC = 300  # 타임스탬프 기준 요청 허용 시간
+
+OPENAI_LATENCY_MS = (3000, 9000)  # 첫 토큰까지의 시간
+OPENAI_RATE_LIMIT_PER_MIN = 500
+OPENAI_TOKEN_INTERVAL_MS = 15  # 스트리밍 시 청크 간격
+OPENAI_CHUNK_CHARS = 8
+OPENAI_IMAGE_TOKENS = 765  # 이미지 1장당 입력 토큰 수 (1024px 기준 근사값)
+
+SHEETS_LATENCY_MS = (250, 800)
+SHEETS_RATE_LIMIT_PER_MIN = 300  # 프로젝트당 분당 요청 한도
+
+class LatencyProfile:
+    """로그 정규분포 응답 지연과 분당 요청 한도(token bucket)"""
+
+    def __init__(self, median_ms, p95_ms, rate_limit_per_min, latency_scale=1.0):
+        self.mu = math.log(median_ms / 1000 * latency_scale) if median_ms and latency_scale else None
+        self.sigma = math.log(p95_ms / median_ms) / 1.645 if median_ms else 0.0
+        self.rate_per_sec = rate_limit_per_min / 60 if rate_limit_per_min else None
+        self.capacity = max(1.0, self.rate_per_sec or 0)  # 1초 분량까지 순간 요청 허용
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """응답 지연(초)을 생성합니다."""
+        if self.mu is None:
+            return 0.0
+        return random.lognormvariate(self.mu, self.sigma)
+
+    def acquire(self):
+        """요청 한도 내이면 0을, 초과한 경우 다시 시도할 때까지의 대기 시간(초)을 반환합니다."""
+        if self.rate_per_sec is None:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_sec)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate_per_sec
+
+class Response:
+    def __init__(self, status, body=None, headers=None, stream=None):
+        self.status = status
+        self.body = body  # dict (JSON) 또는 None
+        self.headers = headers or {}
+        self.stream = stream  # 스트리밍 응답인 경우 bytes를 생성하는 iterator
+
+class FakeService:
+    """서비스 공통: 지연/요청 한도 적용 및 호출 통계"""
+
+    name = None
+
+    def __init__(self, profile):
+        self.profile = profile
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.calls = defaultdict(int)  # route -> 호출 수
+            self.status_counts = defaultdict(int)
+            self.rate_limited = 0
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "service": self.name,
+                "calls": sum(self.calls.values()),
+                "routes": dict(self.calls),
+                "status_counts": {str(status): count for status, count in self.status_counts.items()},
+                "rate_limited": self.rate_limited,
+            }
+
+    def handle(self, method, path, query, headers, body):
+        route, handler = self.route(method, path)
+        if handler is None:
+            return route, Response(404, self.error_body(404, f"Not found: {method} {path}"))
+        retry_after = self.profile.acquire()
+        if retry_after:
+            with self._stats_lock:
+                self.rate_limited += 1
+            return route, Response(429, self.error_body(429, "Rate limit exceeded"), {"Retry-After": str(math.ceil(retry_after))})
+        time.sleep(self.profile.sample())
+        return route, handler(path, query, headers, body)
+
+    def record(self, route, status):
+        with self._stats_lock:
+            self.calls[route] += 1
+            self.status_counts[status] += 1
+
+    def route(self, method, path):
+        raise NotImplementedError
+
+    def error_body(self, status, message):
+        return {"error": {"code": status, "message": message}}
+
+class FakeSens(FakeService):
+    """NCP SENS SMS API (v2)"""
+
+    name = "sms"
+    _messages_path = re.compile(r"^/sms/v2/services/([^/]+)/messages(?:/([^/]+))?$")
+
+    def __init__(self, profile, complete_delay_sec=SMS_COMPLETE_DELAY_SEC, fail_rate=SMS_FAIL_RATE):
+        super().__init__(profile)
+        self.complete_delay_sec = complete_delay_sec
+        self.fail_rate = fail_rate
+        self._requests = {}  # requestId -> [messageId]
+        self._messages = {}  # messageId -> 메시지
+        self._lock = threading.Lock()
+
+    def route(self, method, path):
+        match = self._messages_path.match(path)
+        if match is None:
+            return "unknown", None
+        if method == "POST" and match.group(2) is None:
+            return "send", self._send
+        if method == "GET" and match.group(2) is None:
+            return "list_by_request", self._list_by_request
+        if method == "GET":
+            return "get_message", self._get_message
+        return "unknown", None
+
+    def error_body(self, status, message):
+        return {"status": status, "errorMessage": message}
+
+    def _authenticated(self, headers):
+        try:
+            timestamp = int(headers.get("x-ncp-apigw-timestamp", ""))
+        except ValueError:
+            return False
+        return (
+            bool(headers.get("x-ncp-iam-access-key"))
+            and bool(headers.get("x-ncp-apigw-signature-v2"))
+            and abs(time.time() * 1000 - timestamp) <= SMS_SIGNATURE_MAX_AGE_SEC * 1000
+        )
+
+    def _send(self, path, query, headers, body):
+        if not self._authenticated(headers):
+            return Response(401, {"errorCode": "200", "message": "Authentication Failed"})
+        messages = (body or {}).get("messages") or []
+        if not messages or len(messages) > 100 or any(not message.get("to") for message in messages):
+            return Response(400, {"status": 400, "errorMessage": "Invalid messages"})
+        request_id = f"RSSA-{uuid.uuid4().hex[:20].upper()}"
+        request_time = time.strftime("%Y-%m-%dT%H:%M:%S.000", time.localtime())
+        with self._lock:
+            self._requests[request_id] = []
+            for message in messages:
+                message_id = uuid.uuid4().hex
+                self._requests[request_id].append(message_id)
+                self._messages[message_id] = {
+                    "requestId": request_id,
+                    "messageId": message_id,
+                    "requestTime": request_time,
+                    "contentType": body.get("contentType", "COMM"),
+                    "countryCode": body.get("countryCode", "82"),
+                    "from": body.get("from"),
+                    "to": message["to"],
+                    "content": message.get("content", body.get("content")),
+                    "accepted_at": time.time(),
+                    "success": random.random() >= self.fail_rate,
+                }
+        return Response(202, {"requestId": request_id, "requestTime": request_time, "statusCode": "202", "statusName": "success"})
+
+    def _list_by_request(self, path, query, headers, body):
+        if not self._authenticated(headers):
+            return Response(401, {"errorCode": "200", "message": "Authentication Failed"})
+        request_id = query.get("requestId", [None])[0]
+        with self._lock:
+            message_ids = self._requests.get(request_id)
+            if message_ids is None:
+                return Response(404, {"status": 404, "errorMessage": "Request not found"})
+            messages = [
+                {key: self._messages[message_id][key] for key in ["messageId", "requestTime", "contentType", "countryCode", "from", "to"]}
+                for message_id in message_ids
+            ]
+        return Response(200, {"requestId": request_id, "statusCode": "200", "statusName": "success", "messages": messages})
+
+    def _get_message(self, path, query, headers, body):
+        if not self._authenticated(headers):
+            return Response(401, {"errorCode": "200", "message": "Authentication Failed"})
+        message_id = self._messages_path.match(path).group(2)
+        with self._lock:
+            message = self._messages.get(message_id)
+        if message is None:
+            return Response(404, {"status": 404, "errorMessage": "Message not found"})
+        completed = time.time() - message["accepted_at"] >= self.complete_delay_sec
+        result = {key: message[key] for key in ["requestTime", "contentType", "content", "countryCode", "from", "to", "messageId"]}
+        if not completed:
+            result.update({"status": "READY"})
+        elif message["success"]:
+            result.update({"status": "COMPLETED", "statusCode": "0", "statusName": "success", "statusMessage": "성공"})
+        else:
+            result.update({"status": "COMPLETED", "statusCode": "3018", "statusName": "fail", "statusMessage": "전송 실패"})
+        return Response(200, {"statusCode": "200", "statusName": "success", "messages": [result]})
+
+class FakeOpenAI(FakeService):
+    """OpenAI Chat Completions API (스트리밍/structured output 포함)"""
+
+    name = "openai"
+
+    def __init__(self, profile, token_interval_sec=OPENAI_TOKEN_INTERVAL_MS / 1000):
+        super().__init__(profile)
+        self.token_interval_sec = token_interval_sec
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def route(self, method, path):
+        if method == "POST" and path.rstrip("/").endswith("/chat/completions"):
+            return "chat_completions", self._chat_completions
+        return "unknown", None
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({"prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens})
+        return stats
+
+    def reset_stats(self):
+        super().reset_stats()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def error_body(self, status, message):
+        code = "rate_limit_exceeded" if status == 429 else None
+        return {"error": {"message": message, "type": "requests" if status == 429 else "invalid_request_error", "param": None, "code": code}}
+
+    def _content(self, body):
+        """response_format의 JSON schema가 있으면 해당 필드를, 없으면 문제 분석 응답 형식의 JSON 문자열을 생성합니다."""
+        schema = ((body.get("response_format") or {}).get("json_schema") or {}).get("schema") or {}
+        fields = list((schema.get("properties") or {}).keys()) or ["answer", "description", "keywords"]
+        samples = {
+            "answer": "③",
+            "description": "① 주어진 조건을 정리합니다.\n② 보기를 하나씩 확인합니다.\n③ 조건을 모두 만족하므로 정답입니다." * 3,
+            "keywords": "관계대명사, 수일치, 분사구문",
+        }
+        return json.dumps({field: samples.get(field, f"sample {field}") for field in fields}, ensure_ascii=False)
+
+    def _prompt_tokens(self, body):
+        tokens = 0
+        for message in body.get("messages", []):
+            content = message.get("content")
+            parts = content if isinstance(content, list) else [{"type": "text", "text": content or ""}]
+            for part in parts:
+                tokens += OPENAI_IMAGE_TOKENS if part.get("type") == "image_url" else len(part.get("text", "")) // 4
+        return tokens
+
+    def _chat_completions(self, path, query, headers, body):
+        if not headers.get("authorization", "").startswith("Bearer "):
+            return Response(401, {"error": {"message": "Missing API key", "type": "invalid_request_error", "param": None, "code": "invalid_api_key"}})
+        body = body or {}
+        model = body.get("model", "gpt-4o-mini")
+        content = self._content(body)
+        usage = {"prompt_tokens": self._prompt_tokens(body), "completion_tokens": max(1, len(content) // 2)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        with self._stats_lock:
+            self.prompt_tokens += usage["prompt_tokens"]
+            self.completion_tokens += usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            return Response(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content, "refusal": None}, "finish_reason": "stop", "logprobs": None}],
+                "usage": usage,
+            })
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta, finish_reason=None, chunk_usage=None, choices=True):
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}] if choices else []}
+            if chunk_usage is not None:
+                data["usage"] = chunk_usage
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+        def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            for i in range(0, len(content), OPENAI_CHUNK_CHARS):
+                time.sleep(self.token_interval_sec)
+                yield chunk({"content": content[i:i + OPENAI_CHUNK_CHARS]})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk({}, chunk_usage=usage, choices=False)
+            yield b"data: [DONE]\n\n"
+
+        return Response(200, headers={"Content-Type": "text/event-stream"}, stream=stream())
+
+def _column_number(letters):
+    number = 0
+    for ch in letters:
+        number = number * 26 + ord(ch) - ord("A") + 1
+    return number
+
+def _column_letters(number):
+    letters = ""
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+def parse_a1_range(range_name):
+    """"'시트'!A2:G" 형식의 범위를 (시트 이름, 시작 행, 시작 열, 끝 행, 끝 열)로 변환합니다. (1부터 시작, 열린 범위는 None)"""
+    if "!" in range_name:
+        title, cells = range_name.rsplit("!", 1)
+    else:
+        title, cells = range_name, ""
+    if len(title) >= 2 and title[0] == title[-1] == "'":
+        title = title[1:-1].replace("''", "'")
+    bounds = []
+    for cell in cells.split(":") if cells else []:
+        match = re.fullmatch(r"([A-Z]*)(\d*)", cell.upper())
+        if match is None:
+            raise ValueError(f"Invalid range: {range_name}")
+        bounds.append((int(match.group(2)) if match.group(2) else None, _column_number(match.group(1)) if match.group(1) else None))
+    start = bounds[0] if bounds else (None, None)
+    end = bounds[1] if len(bounds) > 1 else (start if bounds else (None, None))
+    return title, start[0] or 1, start[1] or 1, end[0], end[1]
+
+class FakeSheets(FakeService):
+    """Google Sheets API v4 (gspread가 사용하는 메타데이터 조회, 값 조회/추가/일괄 수정)"""
+
+    name = "sheets"
+    _spreadsheet_path = re.compile(r"^/v4/spreadsheets/([^/:]+)(.*)$")
+
+    def __init__(self, profile):
+        super().__init__(profile)
+        # 스프레드시트 ID와 관계없이 워크시트 이름(테이블명)으로 데이터를 공유
+        self._worksheets = {}  # title -> [[값]]
+        self._lock = threading.Lock()
+
+    def load_table(self, title, header, rows):
+        """워크시트를 헤더와 행으로 초기화합니다."""
+        with self._lock:
+            self._worksheets[title] = [list(map(str, header))] + [["" if value is None else str(value) for value in row] for row in rows]
+
+    def table(self, title):
+        with self._lock:
+            return [list(row) for row in self._worksheets.get(title, [])]
+
+    def route(self, method, path):
+        match = self._spreadsheet_path.match(path)
+        if match is None:
+            return "unknown", None
+        rest = match.group(2)
+        if method == "GET" and rest == "":
+            return "metadata", self._metadata
+        if method == "GET" and rest.startswith("/values/"):
+            return "values_get", self._values_get
+        if method == "POST" and rest.startswith("/values/") and rest.endswith(":append"):
+            return "values_append", self._values_append
+        if method == "POST" and rest == "/values:batchUpdate":
+            return "values_batch_update", self._values_batch_update
+        return "unknown", None
+
+    def error_body(self, status, message):
+        status_name = {404: "NOT_FOUND", 429: "RESOURCE_EXHAUSTED"}.get(status, "INVALID_ARGUMENT")
+        return {"error": {"code": status, "message": message, "status": status_name}}
+
+    def _range(self, path):
+        encoded = path.split("/values/", 1)[1]
+        if encoded.endswith(":append"):
+            encoded = encoded[:-len(":append")]
+        return unquote(encoded)
+
+    def _metadata(self, path, query, headers, body):
+        spreadsheet_id = self._spreadsheet_path.match(path).group(1)
+        with self._lock:
+            sheets = [
+                {"properties": {
+                    "sheetId": index, "title": title, "index": index, "sheetType": "GRID",
+                    "gridProperties": {"rowCount": max(1000, len(rows)), "columnCount": max(26, max((len(row) for row in rows), default=0))},
+                }}
+                for index, (title, rows) in enumerate(self._worksheets.items())
+            ]
+        return Response(200, {"spreadsheetId": spreadsheet_id, "properties": {"title": spreadsheet_id, "locale": "ko_KR", "timeZone": "Asia/Seoul"}, "sheets": sheets})
+
+    def _values_get(self, path, query, headers, body):
+        range_name = self._range(path)
+        title, start_row, start_col, end_row, end_col = parse_a1_range(range_name)
+        with self._lock:
+            if title not in self._worksheets:
+                return Response(400, self.error_body(400, f"Unable to parse range: {range_name}"))
+            rows = self._worksheets[title][start_row - 1:end_row]
+            values = []
+            for row in rows:
+                row = row[start_col - 1:end_col]
+                # 실제 API와 같이 행 끝의 빈 셀과 범위 끝의 빈 행은 생략
+                while row and row[-1] == "":
+                    row = row[:-1]
+                values.append(row)
+        while values and not values[-1]:
+            values.pop()
+        response = {"range": range_name, "majorDimension": "ROWS"}
+        if values:
+            response["values"] = values
+        return Response(200, response)
+
+    def _values_append(self, path, query, headers, body):
+        range_name = self._range(path)
+        title = parse_a1_range(range_name)[0]
+        new_rows = [["" if value is None else str(value) for value in row] for row in (body or {}).get("values", [])]
+        with self._lock:
+            if title not in self._worksheets:
+                return Response(400, self.error_body(400, f"Unable to parse range: {range_name}"))
+            rows = self._worksheets[title]
+            # 마지막으로 값이 있는 행 다음부터 추가
+            last = len(rows)
+            while last and not any(rows[last - 1]):
+                last -= 1
+            del rows[last:]
+            rows.extend(new_rows)
+            width = max((len(row) for row in new_rows), default=0)
+        updated_range = f"'{title}'!A{last + 1}:{_column_letters(max(1, width))}{last + len(new_rows)}"
+        return Response(200, {
+            "spreadsheetId": self._spreadsheet_path.match(path).group(1),
+            "tableRange": f"'{title}'!A1:{_column_letters(max(1, width))}{last}",
+            "updates": {"updatedRange": updated_range, "updatedRows": len(new_rows), "updatedColumns": width, "updatedCells": sum(len(row) for row in new_rows)},
+        })
+
+    def _values_batch_update(self, path, query, headers, body):
+        updated_cells = 0
+        with self._lock:
+            for data in (body or {}).get("data", []):
+                title, start_row, start_col, _, _ = parse_a1_range(data["range"])
+                if title not in self._worksheets:
+                    return Response(400, self.error_body(400, f"Unable to parse range: {data['range']}"))
+                rows = self._worksheets[title]
+                for i, values in enumerate(data.get("values", [])):
+                    row_number = start_row + i
+                    while len(rows) < row_number:
+                        rows.append([])
+                    row = rows[row_number - 1]
+                    for j, value in enumerate(values):
+                        col = start_col - 1 + j
+                        row.extend([""] * (col + 1 - len(row)))
+                        row[col] = "" if value is None else str(value)
+                        updated_cells += 1
+        return Response(200, {"spreadsheetId": self._spreadsheet_path.match(path).group(1), "totalUpdatedCells": updated_cells, "responses": []})
+
+def _make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive (연결 재사용 여부를 실제와 같게 확인)
+
+        def log_message(self, format, *args):
+            pass
+
+        def _dispatch(self, method):
+            parts = urlsplit(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if parts.path == "/__stats":
+                return self._send(Response(200, service.stats()))
+            if parts.path == "/__reset":
+                service.reset_stats()
+                return self._send(Response(200, {"reset": True}))
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                return self._send(Response(400, service.error_body(400, "Invalid JSON")))
+            headers = {key.lower(): value for key, value in self.headers.items()}
+            try:
+                route, response = service.handle(method, parts.path, parse_qs(parts.query), headers, body)
+            except Exception as e:
+                route, response = "error", Response(500, service.error_body(500, str(e)))
+            service.record(route, response.status)
+            self._send(response)
+
+        def _send(self, response):
+            self.send_response(response.status)
+            for key, value in response.headers.items():
+                self.send_header(key, value)
+            if response.stream is not None:
+                # 스트리밍 응답은 연결 종료로 끝을 표시
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for data in response.stream:
+                    self.wfile.write(data)
+                    self.wfile.flush()
+                return
+            payload = json.dumps(response.body, ensure_ascii=False).encode("utf-8")
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_PUT(self):
+            self._dispatch("PUT")
+
+    return Handler
+
+class FakeServer:
+    """서비스 1개를 별도 스레드의 HTTP 서버로 실행합니다."""
+
+    def __init__(self, service, host="127.0.0.1", port=0):
+        self.service = service
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(service))
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=f"fake-{service.name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def start_fake_services(host="127.0.0.1", sms_port=0, openai_port=0, sheets_port=0, latency_scale=1.0, rate_limits=True):
+    """세 서비스를 실행하고 {"sms", "openai", "sheets"} -> FakeServer를 반환합니다."""
+    def profile(latency_ms, rate_limit_per_min):
+        return LatencyProfile(*latency_ms, rate_limit_per_min if rate_limits else None, latency_scale)
+
+    return {
+        "sms": FakeServer(FakeSens(profile(SMS_LATENCY_MS, SMS_RATE_LIMIT_PER_MIN), complete_delay_sec=SMS_COMPLETE_DELAY_SEC * latency_scale), host, sms_port).start(),
+        "openai": FakeServer(FakeOpenAI(profile(OPENAI_LATENCY_MS, OPENAI_RATE_LIMIT_PER_MIN), token_interval_sec=OPENAI_TOKEN_INTERVAL_MS / 1000 * latency_scale), host, openai_port).start(),
+        "sheets": FakeServer(FakeSheets(profile(SHEETS_LATENCY_MS, SHEETS_RATE_LIMIT_PER_MIN)), host, sheets_port).start(),
+    }
+
+def service_env(servers):
+    """앱이 로컬 서버를 사용하도록 지정하는 환경 변수를 반환합니다."""
+    return {
+        "OPENAI_BASE_URL": f"{servers['openai'].base_url}/v1",
+        "OPENAI_API_KEY": "sk-local",
+        "SMS_API_BASE_URL": servers["sms"].base_url,
+        "NCP_ACCESS_KEY": "local-access-key",
+        "NCP_SECRET_KEY": "local-secret-key",
+        "NCP_SMS_SVC_ID": "ncp:sms:kr:000000000000:local",
+        "NCP_SMS_SENDER": "01000000000",
+        "GSHEET_API_BASE_URL": servers["sheets"].base_url,
+    }
+
+def member_phone(i):
+    return f"0109{i:07d}"
+
+def seed_sheets(sheets, members=100, usage_rows=0, days=30):
+    """
+    앱의 테이블을 생성하고 합성 데이터를 채웁니다.
+    - member_phone(0) ~ member_phone(members - 1): 활성 상태의 일반(학생) 회원 (0번은 관리자 권한도 보유)
+    - usage_rows: 최근 days일에 고르게 분포된 Agent 사용 이력
+    """
+    from utils.util_datastore import TABLE_COLUMNS
+
+    now = time.time()
+    requests = []
+    for i in range(members):
+        create_dt = time.strftime("%Y%m%d %H:%M:%S", time.localtime(now - days * 86400))
+        requests.append([f"req{i:07d}", create_dt.split(" ")[0], create_dt, f"회원{i}", member_phone(i), "일반(학생)", "동의", "동의", "활성"])
+    if members:
+        requests.append([f"req{members:07d}", requests[0][1], requests[0][2], "회원0", member_phone(0), "관리자", "동의", "동의", "활성"])
+
+    usage = []
+    subjects = ["영어", "과학"]
+    for i in range(usage_rows):
+        create_dt = time.strftime("%Y%m%d %H:%M:%S", time.localtime(now - (i % days) * 86400 - i % 86400))
+        usage.append([create_dt.split(" ")[0], create_dt, member_phone(i % max(1, members)), "일반(학생)", subjects[i % 2], "quiz_analyzer", 25.5])
+    usage.sort(key=lambda row: row[1])
+
+    for table, columns in TABLE_COLUMNS.items():
+        rows = {"tbl_mbr_req_incr": requests, "tbl_agent_usg_incr": usage}.get(table, [])
+        sheets.load_table(table, columns, rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NCP SENS / OpenAI / Google Sheets 로컬 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--sms-port", type=int, default=8701)
+    parser.add_argument("--openai-port", type=int, default=8702)
+    parser.add_argument("--sheets-port", type=int, default=8703)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="응답 지연 배율 (0이면 지연 없음)")
+    parser.add_argument("--no-rate-limit", action="store_true", help="요청 한도(429) 비활성화")
+    parser.add_argument("--seed-members", type=int, default=100)
+    parser.add_argument("--seed-usage-rows", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    servers = start_fake_services(args.host, args.sms_port, args.openai_port, args.sheets_port, args.latency_scale, not args.no_rate_limit)
+    seed_sheets(servers["sheets"].service, args.seed_members, args.seed_usage_rows)
+    for key, value in service_env(servers).items():
+        print(f"export {key}={value}")
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers.values():
+            server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+로그인 → 문제 분석 → 대시보드 흐름의 부하 테스트
+
+- 동시 세션 N개가 각 단계를 앱과 같은 함수(utils)로 실행하고, 단계별 p50/p95/p99 지연 시간과 외부 서비스별 호출 수를 출력
+- 기본적으로 tools/fake_services.py의 로컬 서버를 프로세스 내에서 실행하며, 실제 API는 호출하지 않음
+- --external 지정 시 환경 변수(OPENAI_BASE_URL, SMS_API_BASE_URL, GSHEET_API_BASE_URL)의 서버를 사용
+- 로그 저널/캐시 파일이 저장소에 남지 않도록 임시 디렉터리에서 실행
+
+실행 예:
+    python tools/load_test.py --sessions 50 --concurrency 10 --latency-scale 0.1
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import base64
+import asyncio
+import argparse
+import tempfile
+import threading
+import urllib.request
+from io import BytesIO
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.fake_services import start_fake_services, service_env, seed_sheets, member_phone
+
+STEPS = ["login", "analyze", "dashboard"]
+SERVICE_ENV = {"openai": "OPENAI_BASE_URL", "sms": "SMS_API_BASE_URL", "sheets": "GSHEET_API_BASE_URL"}
+LOG_DRAIN_TIMEOUT_SEC = 30  # 종료 전 로그 버퍼가 시트에 반영되기를 기다리는 최대 시간
+DASHBOARD_ROWS_PER_PAGE = 50
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+def make_sample_image(width=1240, height=1754):
+    """문제 사진 대용 이미지 (흰 배경에 글자 줄 모양의 사각형)"""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for y in range(120, height - 120, 48):
+        draw.rectangle([100, y, width - 100 - (y * 37) % 300, y + 18], fill="black")
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def fetch_service_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/__stats", timeout=5) as response:
+        return json.loads(response.read())
+
+def reset_service_stats(base_url):
+    urllib.request.urlopen(urllib.request.Request(f"{base_url}/__reset", data=b"", method="POST"), timeout=5).read()
+
+class SessionRecorder:
+    """단계별 지연 시간과 오류 수"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = {}
+
+    async def run(self, step, coro):
+        start = time.perf_counter()
+        try:
+            await coro
+        except Exception as e:
+            with self._lock:
+                self.errors[step] += 1
+                self.error_samples.setdefault(step, repr(e))
+            return False
+        with self._lock:
+            self.latencies[step].append(time.perf_counter() - start)
+        return True
+
+    def summary(self):
+        with self._lock:
+            return {
+                step: {
+                    "ok": len(self.latencies[step]),
+                    "errors": self.errors[step],
+                    "p50": percentile(self.latencies[step], 0.50),
+                    "p95": percentile(self.latencies[step], 0.95),
+                    "p99": percentile(self.latencies[step], 0.99),
+                    "max": max(self.latencies[step], default=None),
+                }
+                for step in STEPS + ["total"]
+            }
+
+async def run_session(index, args, sample_image, recorder, executor):
+    """
+    세션 1개: 로그인(회원 확인 + 인증번호 문자 + 로그인 기록) → 문제 분석 → 대시보드 조회
+    - 동기 단계(로그인/대시보드, 이미지 전처리)는 스레드 풀에서 실행
+    - LLM 분석은 모든 세션이 하나의 이벤트 루프에서 실행 (앱과 같이 공유 LLM 클라이언트를 한 루프에서만 사용)
+    """
+    loop = asyncio.get_running_loop()
+    from utils.util_member_index import is_registered_user, get_member_index
+    from utils.util_sms_sender import send_sms, generate_verification_code
+    from utils.util_datastore import append_log, query_table
+    from utils.util_image_preprocess import preprocess_image
+    from utils.util_quiz_agent import astream_analyze
+    from utils.util_usage_rollup import get_usage_rollup
+
+    phone = member_phone(index % args.members)
+    subject = args.subjects[index % len(args.subjects)]
+
+    def login():
+        if is_registered_user(phone, "normal") != "active":
+            raise RuntimeError(f"not registered: {phone}")
+        create_dt = time.strftime("%Y%m%d %H:%M:%S", time.localtime())
+        date_partition = create_dt.split(" ")[0]
+        sms_body = f"[BASECAMP Agent]\n인증번호: {generate_verification_code()}\n타인 유출로 인한 피해 주의"
+        result = send_sms(date_partition, create_dt, phone, "cert_code", sms_body)
+        if result.get("statusCode") != "202":
+            raise RuntimeError(f"sms failed: {result}")
+        append_log("tbl_mbr_login_incr", [date_partition, create_dt, phone, "일반(학생)"])
+
+    async def analyze():
+        processed_bytes, mime_type, _ = await loop.run_in_executor(executor, preprocess_image, sample_image)
+        img_base64 = base64.b64encode(processed_bytes).decode("utf-8")
+        total_cost, response = await astream_analyze(subject, img_base64, mime_type)
+        if response is None:
+            raise RuntimeError("analysis failed")
+        await loop.run_in_executor(executor, log_usage, total_cost)
+
+    def log_usage(total_cost):
+        create_dt = time.strftime("%Y%m%d %H:%M:%S", time.localtime())
+        date_partition = create_dt.split(" ")[0]
+        usage_rollup = get_usage_rollup()
+        if append_log("tbl_agent_usg_incr", [date_partition, create_dt, phone, "일반(학생)", subject, "quiz_analyzer", total_cost], dedupe_key=uuid.uuid4().hex):
+            usage_rollup.record(date_partition, create_dt, phone, "일반(학생)", subject, total_cost)
+
+    def dashboard():
+        usage_rollup = get_usage_rollup()
+        usage_rollup.totals(phn_no=phone, access_type="일반(학생)")
+        usage_rollup.daily(phn_no=phone, access_type="일반(학생)")
+        get_member_index().names()
+        end_date = time.strftime("%Y%m%d", time.localtime())
+        start_date = time.strftime("%Y%m%d", time.localtime(time.time() - 30 * 86400))
+        query_table("tbl_agent_usg_incr", start_date, end_date, filters={"phn_no": phone}, sort_by="create_dt", limit=DASHBOARD_ROWS_PER_PAGE)
+
+    start = time.perf_counter()
+    ok = (
+        await recorder.run("login", loop.run_in_executor(executor, login))
+        and await recorder.run("analyze", analyze())
+        and await recorder.run("dashboard", loop.run_in_executor(executor, dashboard))
+    )
+    if ok:
+        with recorder._lock:
+            recorder.latencies["total"].append(time.perf_counter() - start)
+
+async def run_sessions(args, sample_image, recorder):
+    """모든 세션을 하나의 이벤트 루프에서 동시 실행 수(--concurrency)를 제한하여 실행합니다."""
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run_one(index):
+        async with semaphore:
+            await run_session(index, args, sample_image, recorder, executor)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        await asyncio.gather(*[run_one(i) for i in range(args.sessions)])
+
+def warm_up():
+    """프로세스 공유 자원(회원 색인, 사용 이력 집계 등)을 미리 생성하여 세션 지연 시간에서 제외합니다."""
+    from utils.util_member_index import get_member_index
+    from utils.util_usage_rollup import get_usage_rollup
+    from utils.util_sms_sender import get_sms_client
+    from utils.util_log_writer import get_log_writer
+
+    get_member_index()
+    get_usage_rollup()
+    get_sms_client()
+    get_log_writer()
+
+def drain_logs():
+    from utils.util_log_writer import get_log_writer
+
+    writer = get_log_writer()
+    deadline = time.time() + LOG_DRAIN_TIMEOUT_SEC
+    while writer.stats()["queued"] and time.time() < deadline:
+        time.sleep(0.2)
+    return writer.stats()
+
+def print_report(report):
+    print(f"\nsessions={report['sessions']} concurrency={report['concurrency']} elapsed={report['elapsed_sec']:.1f}s")
+    print(f"{'step':<10}{'ok':>6}{'errors':>8}{'p50(s)':>10}{'p95(s)':>10}{'p99(s)':>10}{'max(s)':>10}")
+    for step, summary in report["steps"].items():
+        values = [f"{summary[key]:>10.3f}" if summary[key] is not None else f"{'-':>10}" for key in ["p50", "p95", "p99", "max"]]
+        print(f"{step:<10}{summary['ok']:>6}{summary['errors']:>8}{''.join(values)}")
+    print(f"\n{'service':<10}{'calls':>8}{'429':>6}  routes")
+    for service, stats in report["services"].items():
+        routes = ", ".join(f"{route}={count}" for route, count in sorted(stats["routes"].items()))
+        print(f"{service:<10}{stats['calls']:>8}{stats['rate_limited']:>6}  {routes}")
+    for step, sample in report["error_samples"].items():
+        print(f"\n[{step}] first error: {sample}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="로그인 → 문제 분석 → 대시보드 부하 테스트")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--members", type=int, default=100, help="합성 회원 수 (세션은 회원을 순환하며 사용)")
+    parser.add_argument("--usage-rows", type=int, default=1000, help="합성 사용 이력 행 수")
+    parser.add_argument("--subjects", nargs="+", default=["영어", "과학"])
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="로컬 서버 응답 지연 배율 (0이면 지연 없음)")
+    parser.add_argument("--no-rate-limit", action="store_true", help="로컬 서버 요청 한도(429) 비활성화")
+    parser.add_argument("--external", action="store_true", help="환경 변수에 지정된 서버 사용 (로컬 서버를 실행하지 않음)")
+    parser.add_argument("--workdir", default=None, help="로그 저널/캐시 파일을 만들 디렉터리 (기본: 임시 디렉터리)")
+    parser.add_argument("--json", default=None, help="결과를 JSON 파일로 저장")
+    args = parser.parse_args(argv)
+
+    if args.external:
+        missing = [name for name in SERVICE_ENV.values() if not os.environ.get(name)]
+        if missing:
+            parser.error(f"--external requires {', '.join(missing)}")
+    else:
+        servers = start_fake_services(latency_scale=args.latency_scale, rate_limits=not args.no_rate_limit)
+        # utils 모듈은 import 시 API 주소를 읽으므로 시트 데이터 생성(utils import) 전에 환경 변수 지정
+        os.environ.update(service_env(servers))
+        seed_sheets(servers["sheets"].service, args.members, args.usage_rows)
+    base_urls = {service: os.environ[name].rstrip("/").removesuffix("/v1") for service, name in SERVICE_ENV.items()}
+    json_path = os.path.abspath(args.json) if args.json else None
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix="load-test-"))
+
+    sample_image = make_sample_image()
+    warm_up()
+    for base_url in base_urls.values():
+        reset_service_stats(base_url)
+
+    recorder = SessionRecorder()
+    start = time.perf_counter()
+    asyncio.run(run_sessions(args, sample_image, recorder))
+    elapsed = time.perf_counter() - start
+    log_writer_stats = drain_logs()
+
+    report = {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "elapsed_sec": elapsed,
+        "steps": recorder.summary(),
+        "services": {service: fetch_service_stats(base_url) for service, base_url in base_urls.items()},
+        "log_writer": log_writer_stats,
+        "error_samples": recorder.error_samples,
+    }
+    print_report(report)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
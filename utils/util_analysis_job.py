@@ -0,0 +1,265 @@
+import time
+import uuid
+import base64
+import asyncio
+import threading
+
+import openai
+import streamlit as st
+
+from utils.util_result_cache import get_result_cache, make_cache_key
+from utils.util_image_hash import phash
+from utils.util_image_preprocess import preprocess_image
+from utils.util_page_splitter import split_problems
+from utils.util_quiz_agent import aanalyze, astream_analyze, get_schema_version
+from utils.util_tracing import span
+
+ANALYZER_STREAMING = True  # 해설(description)을 토큰 단위로 받아 중간 결과를 표시
+ANALYSIS_POLL_INTERVAL_SEC = 0.5
+JOB_RETENTION_SEC = 60 * 60  # 결과를 가져가지 않은 작업의 보관 기간
+
+BATCH_MAX_ITEMS = 30
+BATCH_MAX_CONCURRENCY = 8  # 동시에 실행하는 LLM 요청 수
+BATCH_MAX_RETRIES = 2
+BATCH_RETRY_BASE_SEC = 2  # 재시도 대기 시간 (지수 증가)
+RETRYABLE_ERRORS = (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+class AnalysisJob:
+    """백그라운드에서 실행 중인 분석 작업"""
+
+    def __init__(self, job_id, subject):
+        self.job_id = job_id
+        self.subject = subject
+        self.future = None
+        self.submitted_at = time.time()
+        # 스트리밍 모드에서 현재까지 수신된 해설
+        self.partial_description = ""
+
+    def set_partial_description(self, description):
+        self.partial_description = description
+
+    @property
+    def elapsed(self):
+        return time.time() - self.submitted_at
+
+    def done(self):
+        return self.future.done()
+
+    def cancelled(self):
+        return self.future.cancelled()
+
+    def result(self):
+        """(total_cost, response)를 반환합니다. 중단되었거나 오류가 발생한 경우 (None, None)을 반환합니다."""
+        if not self.future.done() or self.future.cancelled():
+            return None, None
+        try:
+            return self.future.result()
+        except Exception as e:
+            print(f"Error: {e}")
+            return None, None
+
+class AnalysisRunner:
+    """
+    전용 스레드의 asyncio 이벤트 루프에서 분석 작업을 실행하고 job id로 추적합니다.
+    - Streamlit 스크립트 스레드는 작업 제출 후 바로 반환되며, UI는 주기적으로 완료 여부를 확인
+    - 작업 취소 시 asyncio Task가 취소되어 진행 중인 HTTP 요청도 함께 중단됨
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="analysis-runner", daemon=True)
+        self._thread.start()
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, subject, img_base64, mime_type):
+        """분석 작업을 제출하고 job id를 반환합니다."""
+        job = AnalysisJob(uuid.uuid4().hex, subject)
+        if ANALYZER_STREAMING:
+            coro = astream_analyze(subject, img_base64, mime_type, on_description=job.set_partial_description)
+        else:
+            coro = aanalyze(subject, img_base64, mime_type)
+        job.future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        with self._lock:
+            self._cleanup()
+            self._jobs[job.job_id] = job
+        return job.job_id
+
+    def submit_batch(self, subject, images, split_pages=False):
+        """
+        (파일명, 이미지 바이트) 목록을 일괄 분석 작업으로 제출하고 job id를 반환합니다.
+        - split_pages: 각 이미지를 시험지 한 페이지로 보고 문제 단위로 분할하여 분석
+        """
+        items = [BatchItem(i, name, img_bytes) for i, (name, img_bytes) in enumerate(images[:BATCH_MAX_ITEMS])]
+        batch = BatchJob(uuid.uuid4().hex, subject, items, split_pages)
+        batch.future = asyncio.run_coroutine_threadsafe(_run_batch(batch), self._loop)
+        with self._lock:
+            self._cleanup()
+            self._jobs[batch.job_id] = batch
+        return batch.job_id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pop(self, job_id):
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def cancel(self, job_id):
+        """작업을 취소합니다. 진행 중인 LLM 요청은 즉시 중단됩니다."""
+        job = self.pop(job_id)
+        if job is None:
+            return False
+        return job.future.cancel()
+
+    def _cleanup(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items() if now - job.submitted_at > JOB_RETENTION_SEC]
+        for job_id in expired:
+            self._jobs.pop(job_id).future.cancel()
+
+class BatchItem:
+    """일괄 분석 대상 문제 1건"""
+
+    def __init__(self, index, name, img_bytes):
+        self.index = index
+        self.name = name
+        self.img_bytes = img_bytes
+        self.status = "대기"  # 대기 / 분석 중 / 재시도 대기 / 완료 / 실패
+        self.attempts = 0
+        self.total_cost = None
+        self.response = None
+        self.cached = False
+        self.error = None
+
+    def finished(self):
+        return self.status in ["완료", "실패"]
+
+class BatchJob:
+    """여러 문제를 제한된 동시 실행 수로 분석하는 일괄 작업"""
+
+    def __init__(self, job_id, subject, items, split_pages=False):
+        self.job_id = job_id
+        self.subject = subject
+        self.items = items
+        # 페이지 분할 모드에서는 분할이 끝난 뒤 items가 문제 단위로 교체됨
+        self.split_pages = split_pages
+        self.splitting = split_pages
+        self.future = None
+        self.submitted_at = time.time()
+        # 요청 한도 초과(429) 응답 시 모든 작업자가 함께 대기하는 시각
+        self.cooldown_until = 0.0
+
+    @property
+    def elapsed(self):
+        return time.time() - self.submitted_at
+
+    def done(self):
+        return self.future.done()
+
+    def progress(self):
+        return sum(item.finished() for item in self.items), len(self.items)
+
+def _retry_after_sec(error, attempt):
+    """Retry-After 헤더가 있으면 그 값을, 없으면 지수 증가 대기 시간을 반환합니다."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    return BATCH_RETRY_BASE_SEC * (2 ** attempt)
+
+async def _analyze_batch_item(batch, item, semaphore):
+    result_cache = get_result_cache()
+    schema_version = get_schema_version(batch.subject)
+    cache_key = await asyncio.to_thread(make_cache_key, item.img_bytes, batch.subject, schema_version)
+    cached_result = await asyncio.to_thread(result_cache.get, cache_key)
+    img_phash = None
+    if cached_result is None:
+        try:
+            img_phash = await asyncio.to_thread(phash, item.img_bytes)
+            cached_result = await asyncio.to_thread(result_cache.get_similar, img_phash, batch.subject, schema_version)
+        except Exception as e:
+            print(f"Error: {e}")
+    if cached_result:
+        item.response, item.total_cost, item.cached = cached_result, 0, True
+        item.status = "완료"
+        return
+
+    try:
+        processed_bytes, mime_type, _ = await asyncio.to_thread(preprocess_image, item.img_bytes)
+    except Exception as e:
+        print(f"Error: {e}")
+        processed_bytes, mime_type = item.img_bytes, "image/png"
+    with span("image.encode"):
+        img_base64 = base64.b64encode(processed_bytes).decode('utf-8')
+
+    # 대기(429 공동 대기, 재시도 대기)는 동시 실행 슬롯(semaphore) 밖에서 하여 바로 실행 가능한 문제가 밀리지 않도록 함
+    while True:
+        wait_sec = batch.cooldown_until - time.time()
+        if wait_sec > 0:
+            item.status = "재시도 대기"
+            await asyncio.sleep(wait_sec)
+            continue
+        async with semaphore:
+            # 슬롯을 기다리는 동안 다른 문제가 429를 받았을 수 있으므로 다시 확인
+            if batch.cooldown_until > time.time():
+                continue
+            item.status = "분석 중"
+            item.attempts += 1
+            try:
+                item.total_cost, item.response = await aanalyze(batch.subject, img_base64, mime_type, raise_errors=True)
+                break
+            except openai.RateLimitError as e:
+                error, retry_after = e, _retry_after_sec(e, item.attempts - 1)
+                batch.cooldown_until = max(batch.cooldown_until, time.time() + retry_after)
+            except RETRYABLE_ERRORS as e:
+                error, retry_after = e, _retry_after_sec(e, item.attempts - 1)
+            except Exception as e:
+                error, retry_after = e, None
+        if retry_after is None or item.attempts > BATCH_MAX_RETRIES:
+            print(f"Error: {error}")
+            item.error = str(error)
+            item.status = "실패"
+            return
+        item.status = "재시도 대기"
+        await asyncio.sleep(retry_after)
+
+    item.status = "완료"
+    try:
+        await asyncio.to_thread(result_cache.put, cache_key, batch.subject, schema_version, item.response, img_phash)
+    except Exception as e:
+        # 캐시 저장 실패가 일괄 작업 전체(asyncio.gather)를 중단시키지 않도록 함
+        print(f"Error: {e}")
+
+async def _split_batch_pages(batch):
+    """페이지 이미지를 문제 단위로 분할하여 batch.items를 교체합니다."""
+    async def split(item):
+        try:
+            return await asyncio.to_thread(split_problems, item.img_bytes)
+        except Exception as e:
+            print(f"Error: {e}")
+            return [item.img_bytes]
+
+    pages = await asyncio.gather(*[split(item) for item in batch.items])
+    items = []
+    for page, crops in zip(batch.items, pages):
+        for i, crop in enumerate(crops, start=1):
+            name = f"{page.name} #{i}" if len(crops) > 1 else page.name
+            items.append(BatchItem(len(items), name, crop))
+    batch.items = items
+    batch.splitting = False
+
+async def _run_batch(batch):
+    if batch.split_pages:
+        await _split_batch_pages(batch)
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+    await asyncio.gather(*[_analyze_batch_item(batch, item, semaphore) for item in batch.items])
+    return batch.items
+
+@st.cache_resource
+def get_analysis_runner():
+    """프로세스 전체에서 공유하는 분석 작업 실행기를 반환합니다."""
+    return AnalysisRunner()
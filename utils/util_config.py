@@ -0,0 +1,31 @@
+import os
+
+import streamlit as st
+
+_FALSE_VALUES = ["0", "false", "no", "off", ""]
+
+def get_setting(name, default=None):
+    """
+    설정값을 환경 변수 → st.secrets → default 순서로 조회합니다.
+    - 부하 테스트 등에서 secrets.toml 없이 실행하거나, 외부 API 주소를 로컬 서버로 바꿀 때 환경 변수 사용
+    - default가 bool인 경우 환경 변수 문자열('false', '0' 등)을 bool로 변환
+    """
+    if name in os.environ:
+        value = os.environ[name]
+        if isinstance(default, bool):
+            return value.strip().lower() not in _FALSE_VALUES
+        return value
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        # secrets.toml이 없는 경우
+        pass
+    return default
+
+def get_secret_section(name):
+    """st.secrets의 섹션(connections 등)을 dict로 반환합니다. 없으면 빈 dict를 반환합니다."""
+    try:
+        return st.secrets.get(name, {})
+    except Exception:
+        return {}
@@ -0,0 +1,382 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import defaultdict
+
+import pandas as pd
+import streamlit as st
+
+from utils.utils_gsheet import (
+    read_sheet_by_df, update_sheet_add_row, append_sheet_rows, update_sheet_specific_rows, find_changed_cells, format_phone_number,
+    has_sheet_connection
+)
+from utils.util_config import get_setting
+from utils.util_log_writer import get_log_writer
+from utils.util_partitioned_reader import get_partitioned_reader, normalize_partition
+
+# 저장소 설정
+# - gsheet: 구글 시트를 직접 조회/기록 (기존 방식)
+# - sqlite: 로컬 SQLite를 기본 저장소로 사용하고, 구글 시트에는 비동기로 복제 (DATASTORE_SHEETS_MIRROR)
+DATASTORE_BACKEND = get_setting("DATASTORE_BACKEND", "gsheet")
+DATASTORE_SHEETS_MIRROR = get_setting("DATASTORE_SHEETS_MIRROR", True)
+DATASTORE_PATH = get_setting("DATASTORE_PATH", os.path.join(".cache", "datastore.db"))
+DATASTORE_SYNC_SEC = 60  # 구글 폼으로 적재되는 테이블을 시트에서 다시 가져오는 주기
+
+TABLE_COLUMNS = {
+    "tbl_mbr_req_incr": ["req_id", "date_partition", "create_dt", "name", "phn_no", "access_type", "agr_svc_terms", "agr_psnl_info", "status"],
+    "tbl_mbr_login_incr": ["date_partition", "create_dt", "phn_no", "access_type"],
+    "tbl_agent_usg_incr": ["date_partition", "create_dt", "phn_no", "access_type", "subject", "agent_type", "total_cost"],
+    "tbl_sms_log_incr": ["date_partition", "create_dt", "phn_no", "sms_type"],
+    "tbl_mbr_access_chg_incr": ["req_id", "date_partition", "create_dt", "phn_no", "access_type", "author", "status_from", "status_to"],
+}
+# 구글 폼 응답이 시트에 직접 쌓이는 테이블 (시트가 원본이므로 주기적으로 가져오고, 수정은 시트에 먼저 반영)
+SHEET_SOURCED_TABLES = ["tbl_mbr_req_incr"]
+# 행 추가만 발생하는 로그성 테이블 (date_partition 단위 증분 조회 대상)
+LOG_TABLES = [table for table in TABLE_COLUMNS if table not in SHEET_SOURCED_TABLES]
+
+EXPORT_CHUNK_ROWS = 5000  # CSV 내보내기 시 한 번에 조회하는 행 수
+
+def _filter_values(value):
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+def _query_frame(df, filters=None, sort_by=None, ascending=False):
+    """조회된 DataFrame에 컬럼 조건(값 또는 값 목록)과 정렬을 적용합니다."""
+    for column, value in (filters or {}).items():
+        df = df[df[column].isin(_filter_values(value))]
+    if sort_by is not None:
+        df = df.sort_values(sort_by, ascending=ascending, kind="stable")
+    return df
+
+def filter_partitions(df, start_date=None, end_date=None):
+    """date_partition이 start_date~end_date(YYYYMMDD, 양 끝 포함)인 행만 남깁니다."""
+    if (start_date is None and end_date is None) or "date_partition" not in df.columns:
+        return df
+    partitions = df["date_partition"].map(normalize_partition)
+    mask = pd.Series(True, index=df.index)
+    if start_date is not None:
+        mask &= partitions >= normalize_partition(start_date)
+    if end_date is not None:
+        mask &= partitions <= normalize_partition(end_date)
+    return df[mask]
+
+class GSheetStore:
+    """구글 시트를 직접 조회/기록하는 저장소"""
+
+    name = "gsheet"
+
+    def read(self, table, start_date=None, end_date=None):
+        if table in LOG_TABLES:
+            return get_partitioned_reader().read(table, start_date, end_date)
+        return filter_partitions(read_sheet_by_df(table), start_date, end_date)
+
+    def query(self, table, start_date=None, end_date=None, filters=None, sort_by=None, ascending=False, offset=0, limit=None):
+        df = _query_frame(self.read(table, start_date, end_date), filters, sort_by, ascending)
+        end = None if limit is None else offset + limit
+        return df.iloc[offset:end].reset_index(drop=True), len(df)
+
+    def iter_chunks(self, table, start_date=None, end_date=None, filters=None, sort_by=None, ascending=False, chunk_rows=EXPORT_CHUNK_ROWS):
+        df = _query_frame(self.read(table, start_date, end_date), filters, sort_by, ascending)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+    def add_row(self, table, row):
+        return update_sheet_add_row(table, row)
+
+    def add_rows(self, table, rows):
+        try:
+            append_sheet_rows(table, rows)
+            return True
+        except Exception as e:
+            st.error(f"❌ 행 추가 중 오류: {e}")
+            return False
+
+    def append_log(self, table, row, dedupe_key=None):
+        return get_log_writer().log(table, row, dedupe_key)
+
+    def update_rows(self, table, original_df, updated_df):
+        return update_sheet_specific_rows(table, original_df, updated_df)
+
+def _to_sql_value(value):
+    """numpy 값/결측치를 SQLite에 저장 가능한 값으로 변환합니다."""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+class SQLiteStore:
+    """
+    로컬 SQLite(WAL)를 기본 저장소로 사용하며, 조회 결과는 구글 시트와 동일한 컬럼의 DataFrame으로 반환
+    - 테이블별 최초 사용 시 구글 시트의 기존 데이터를 1회 가져옴
+    - 로그성 테이블의 추가 행은 로그 버퍼를 통해 구글 시트에 비동기로 복제
+    - 구글 폼으로 적재되는 테이블은 DATASTORE_SYNC_SEC마다 시트에서 다시 가져오고, 수정 시 시트에 먼저 반영
+    - 시트 조회는 SQLite 잠금 밖에서 수행하므로, 가져오는 동안 다른 테이블의 조회/기록은 대기하지 않음
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=DATASTORE_PATH, sheets_mirror=DATASTORE_SHEETS_MIRROR, sync_sec=DATASTORE_SYNC_SEC):
+        self.sheets_mirror = sheets_mirror
+        self.sync_sec = sync_sec
+        self._lock = threading.Lock()
+        self._import_locks = defaultdict(threading.Lock)  # 테이블별 시트 가져오기 잠금 (self._lock 안에서 생성)
+        self._writes = defaultdict(int)  # 테이블별 로컬 변경 횟수 (시트 조회 중 변경 여부 확인용)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS datastore_imports (
+                table_name TEXT PRIMARY KEY,
+                imported_at REAL NOT NULL
+            )
+            """
+        )
+        for table, columns in TABLE_COLUMNS.items():
+            # 시트와 동일하게 값의 타입(숫자/문자)을 그대로 보존하도록 컬럼 타입은 지정하지 않음
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+            for column in ["phn_no", "date_partition", "req_id", "create_dt"]:
+                if column in columns:
+                    self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column})")
+        self._conn.commit()
+
+    def _has_sheet(self, table):
+        return has_sheet_connection(table)
+
+    def _import_needed(self, table):
+        """시트에서 가져와야 하면 최초 가져오기 여부(True/False)를, 필요 없으면 None을 반환합니다. (self._lock 안에서 호출)"""
+        row = self._conn.execute("SELECT imported_at FROM datastore_imports WHERE table_name = ?", (table,)).fetchone()
+        if row is not None and (table not in SHEET_SOURCED_TABLES or time.time() - row[0] < self.sync_sec):
+            return None
+        if not self._has_sheet(table):
+            return None
+        return row is None
+
+    def _ensure_imported(self, table):
+        """
+        시트의 데이터를 가져와야 하는 경우(최초 사용, 시트 원본 테이블의 동기화 주기 경과) 테이블을 교체합니다. (self._lock 밖에서 호출)
+        - 최초 가져오기는 완료될 때까지 같은 테이블 사용을 대기시키고, 주기적 동기화 중에는 기존 데이터로 응답
+        - 시트를 조회하는 동안 로컬 변경이 있었으면 이번 교체는 건너뜀 (다음 사용 시 다시 가져옴)
+        """
+        with self._lock:
+            first = self._import_needed(table)
+            import_lock = self._import_locks[table]
+        if first is None or not import_lock.acquire(blocking=first):
+            return
+        try:
+            with self._lock:
+                # 잠금을 기다리는 동안 다른 스레드가 가져왔을 수 있으므로 다시 확인
+                if self._import_needed(table) is None:
+                    return
+                writes = self._writes[table]
+            try:
+                df = read_sheet_by_df(table)
+            except Exception as e:
+                print(f"Error: {e}")
+                return
+            with self._lock:
+                if self._writes[table] == writes:
+                    self._replace(table, df)
+        finally:
+            import_lock.release()
+
+    def _replace(self, table, df):
+        columns = TABLE_COLUMNS[table]
+        df = df.reindex(columns=columns)
+        rows = [self._to_sql_row(table, row) for row in df.itertuples(index=False)]
+        with self._conn:
+            self._conn.execute(f"DELETE FROM {table}")
+            self._conn.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})", rows)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO datastore_imports (table_name, imported_at) VALUES (?, ?)",
+                (table, time.time())
+            )
+
+    def sync(self, table):
+        """시트의 데이터를 즉시 다시 가져옵니다."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM datastore_imports WHERE table_name = ?", (table,))
+        self._ensure_imported(table)
+
+    @staticmethod
+    def _to_sql_row(table, row):
+        # 기간 조건(인덱스 범위 조회)을 위해 date_partition은 'YYYYMMDD' 문자열로 통일하여 저장
+        values = [_to_sql_value(value) for value in row]
+        columns = TABLE_COLUMNS[table]
+        if "date_partition" in columns:
+            i = columns.index("date_partition")
+            values[i] = normalize_partition(values[i])
+        return values
+
+    @staticmethod
+    def _where(table, start_date=None, end_date=None, filters=None):
+        """기간/컬럼 조건을 WHERE 절과 파라미터로 변환합니다. (컬럼명은 테이블 정의에 있는 것만 허용)"""
+        conditions, params = [], []
+        if start_date is not None:
+            conditions.append("date_partition >= ?")
+            params.append(normalize_partition(start_date))
+        if end_date is not None:
+            conditions.append("date_partition <= ?")
+            params.append(normalize_partition(end_date))
+        for column, value in (filters or {}).items():
+            if column not in TABLE_COLUMNS[table]:
+                raise ValueError(f"Unknown column: {column}")
+            values = [_to_sql_value(v) for v in _filter_values(value)]
+            conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params += values
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    @staticmethod
+    def _order_by(table, sort_by=None, ascending=False):
+        if sort_by is None:
+            return "ORDER BY rowid"
+        if sort_by not in TABLE_COLUMNS[table]:
+            raise ValueError(f"Unknown column: {sort_by}")
+        direction = "ASC" if ascending else "DESC"
+        return f"ORDER BY {sort_by} {direction}, rowid {direction}"
+
+    def read(self, table, start_date=None, end_date=None):
+        return self.query(table, start_date, end_date)[0]
+
+    def query(self, table, start_date=None, end_date=None, filters=None, sort_by=None, ascending=False, offset=0, limit=None):
+        """조건에 맞는 행 중 offset부터 limit건과 전체 건수를 반환합니다. (조건/정렬/페이지 처리는 SQLite에서 수행)"""
+        columns = TABLE_COLUMNS[table]
+        where, params = self._where(table, start_date, end_date, filters)
+        order_by = self._order_by(table, sort_by, ascending)
+        self._ensure_imported(table)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM {table} {where}", params).fetchone()[0]
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(columns)} FROM {table} {where} {order_by} LIMIT ? OFFSET ?",
+                self._conn, params=params + [-1 if limit is None else limit, offset]
+            )
+        return self._postprocess(df), total
+
+    def iter_chunks(self, table, start_date=None, end_date=None, filters=None, sort_by=None, ascending=False, chunk_rows=EXPORT_CHUNK_ROWS):
+        offset = 0
+        while True:
+            df, _ = self.query(table, start_date, end_date, filters, sort_by, ascending, offset, chunk_rows)
+            if df.empty:
+                return
+            yield df
+            offset += chunk_rows
+
+    @staticmethod
+    def _postprocess(df):
+        # 시트 조회 결과와 동일하게 date_partition은 숫자, 연락처는 '0'으로 시작하는 문자열로 반환
+        try:
+            df["date_partition"] = pd.to_numeric(df["date_partition"])
+        except (KeyError, ValueError, TypeError):
+            pass
+        for column in ["phn_no", "author"]:
+            if column in df.columns:
+                df[column] = df[column].apply(format_phone_number)
+        return df
+
+    def _insert(self, table, rows):
+        columns = TABLE_COLUMNS[table]
+        self._ensure_imported(table)
+        with self._lock:
+            self._writes[table] += 1
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})",
+                    [self._to_sql_row(table, row) for row in rows]
+                )
+
+    def add_row(self, table, row):
+        return self.add_rows(table, [row])
+
+    def add_rows(self, table, rows):
+        try:
+            self._insert(table, rows)
+        except Exception as e:
+            st.error(f"❌ 행 추가 중 오류: {e}")
+            return False
+        if self.sheets_mirror and self._has_sheet(table):
+            # 로그 버퍼가 시트별로 모아 1회의 append_rows로 복제
+            writer = get_log_writer()
+            for row in rows:
+                writer.log(table, row)
+        return True
+
+    def append_log(self, table, row, dedupe_key=None):
+        writer = get_log_writer()
+        if dedupe_key is not None and not writer.claim(table, dedupe_key):
+            return False
+        self._insert(table, [row])
+        if self.sheets_mirror and self._has_sheet(table):
+            writer.log(table, row)
+        return True
+
+    def update_rows(self, table, original_df, updated_df):
+        changed_cells = [cell for cell in find_changed_cells(original_df, updated_df) if cell['column'] in TABLE_COLUMNS[table]]
+        if not changed_cells:
+            return True, 0
+        # 시트가 원본인 테이블은 다음 동기화 시 덮어쓰지 않도록 시트에 먼저 반영
+        if table in SHEET_SOURCED_TABLES or (self.sheets_mirror and self._has_sheet(table)):
+            success, _ = update_sheet_specific_rows(table, original_df, updated_df)
+            if not success:
+                return False, 0
+        try:
+            with self._lock, self._conn:
+                self._writes[table] += 1
+                for cell in changed_cells:
+                    self._conn.execute(
+                        f"UPDATE {table} SET {cell['column']} = ? WHERE req_id = ?",
+                        (_to_sql_value(cell['new_value']), _to_sql_value(cell['req_id']))
+                    )
+        except Exception as e:
+            st.error(f"❌ 데이터 업데이트 중 오류: {e}")
+            return False, 0
+        return True, len(changed_cells)
+
+@st.cache_resource
+def get_datastore():
+    """DATASTORE_BACKEND 설정에 따른 저장소를 반환합니다."""
+    if DATASTORE_BACKEND == "sqlite":
+        return SQLiteStore()
+    return GSheetStore()
+
+def read_table(table, start_date=None, end_date=None):
+    """테이블을 DataFrame으로 조회합니다. start_date/end_date(YYYYMMDD)로 기간을 제한할 수 있습니다."""
+    return get_datastore().read(table, start_date, end_date)
+
+def query_table(table, start_date=None, end_date=None, filters=None, sort_by=None, ascending=False, offset=0, limit=None):
+    """
+    조건에 맞는 행 중 한 페이지(offset부터 limit건)와 전체 건수를 반환합니다.
+    - filters: {컬럼: 값 또는 값 목록}
+    - sort_by/ascending: 정렬 컬럼/방향 (없으면 적재 순서)
+    """
+    return get_datastore().query(table, start_date, end_date, filters, sort_by, ascending, offset, limit)
+
+def iter_table_chunks(table, start_date=None, end_date=None, filters=None, sort_by=None, ascending=False):
+    """조건에 맞는 행 전체를 EXPORT_CHUNK_ROWS 단위의 DataFrame으로 나누어 반환합니다. (CSV 내보내기용)"""
+    return get_datastore().iter_chunks(table, start_date, end_date, filters, sort_by, ascending)
+
+def add_row(table, row):
+    """테이블에 행 1건을 추가합니다."""
+    return get_datastore().add_row(table, row)
+
+def add_rows(table, rows):
+    """테이블에 여러 행을 한 번에 추가합니다."""
+    if not rows:
+        return True
+    return get_datastore().add_rows(table, rows)
+
+def append_log(table, row, dedupe_key=None):
+    """로그성 테이블에 행 1건을 추가합니다. dedupe_key가 같은 로그는 한 번만 적재합니다."""
+    return get_datastore().append_log(table, row, dedupe_key)
+
+def update_rows(table, original_df, updated_df):
+    """req_id 기준으로 변경된 셀만 반영하고 (성공 여부, 변경 셀 수)를 반환합니다."""
+    return get_datastore().update_rows(table, original_df, updated_df)
@@ -0,0 +1,115 @@
+from io import BytesIO
+from itertools import combinations
+from collections import defaultdict
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from utils.util_tracing import traced
+
+HASH_SIZE = 8  # 8x8 = 64비트 해시
+PHASH_HIGHFREQ_FACTOR = 4  # pHash 계산 시 축소 크기 = HASH_SIZE * 4
+
+def _load_grayscale(img_bytes, size):
+    with Image.open(BytesIO(img_bytes)) as img:
+        img = ImageOps.exif_transpose(img).convert("L")
+        return img.resize(size, Image.Resampling.LANCZOS)
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+def dhash(img_bytes, hash_size=HASH_SIZE):
+    """인접 픽셀 밝기 차이 기반 difference hash (64비트 정수)"""
+    pixels = np.asarray(_load_grayscale(img_bytes, (hash_size + 1, hash_size)), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0, :] *= 1 / np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+_DCT_MATRIX = _dct_matrix(HASH_SIZE * PHASH_HIGHFREQ_FACTOR)
+
+@traced("image.phash")
+def phash(img_bytes, hash_size=HASH_SIZE):
+    """저주파 DCT 계수 기반 perceptual hash (64비트 정수)"""
+    img_size = hash_size * PHASH_HIGHFREQ_FACTOR
+    dct_matrix = _DCT_MATRIX if img_size == _DCT_MATRIX.shape[0] else _dct_matrix(img_size)
+    pixels = np.asarray(_load_grayscale(img_bytes, (img_size, img_size)), dtype=np.float64)
+    dct = dct_matrix @ pixels @ dct_matrix.T
+    low_freq = dct[:hash_size, :hash_size]
+    # DC 성분(0,0)은 전체 밝기에 해당하므로 중앙값 계산에서 제외
+    median = np.median(low_freq.flatten()[1:])
+    return _bits_to_int(low_freq > median)
+
+def hamming_distance(hash_a, hash_b):
+    return (hash_a ^ hash_b).bit_count()
+
+class HammingIndex:
+    """
+    Multi-index hashing 기반 해시 근접 검색 인덱스
+    - 64비트 해시를 num_chunks개의 부분 해시로 나누어 부분별 해시 테이블에 저장
+    - 거리 r 이내의 해시는 최소 한 부분에서 거리 r // num_chunks 이내이므로 해당 버킷만 후보로 검사
+    """
+
+    def __init__(self, hash_bits=HASH_SIZE * HASH_SIZE, num_chunks=4):
+        self.num_chunks = num_chunks
+        self.chunk_bits = hash_bits // num_chunks
+        self._chunk_mask = (1 << self.chunk_bits) - 1
+        self._tables = [defaultdict(set) for _ in range(num_chunks)]
+        self._hashes = {}
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _chunks(self, value):
+        return [(value >> (i * self.chunk_bits)) & self._chunk_mask for i in range(self.num_chunks)]
+
+    def _neighbors(self, chunk, radius):
+        yield chunk
+        for r in range(1, radius + 1):
+            for positions in combinations(range(self.chunk_bits), r):
+                flipped = chunk
+                for pos in positions:
+                    flipped ^= 1 << pos
+                yield flipped
+
+    def add(self, key, value):
+        if key in self._hashes:
+            self.remove(key)
+        self._hashes[key] = value
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            table[chunk].add(key)
+
+    def remove(self, key):
+        value = self._hashes.pop(key, None)
+        if value is None:
+            return
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            bucket = table.get(chunk)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del table[chunk]
+
+    def search(self, value, max_distance):
+        """거리 max_distance 이내의 (거리, key) 목록을 거리순으로 반환합니다."""
+        chunk_radius = max_distance // self.num_chunks
+        candidates = set()
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            for neighbor in self._neighbors(chunk, chunk_radius):
+                bucket = table.get(neighbor)
+                if bucket:
+                    candidates.update(bucket)
+
+        matches = []
+        for key in candidates:
+            distance = hamming_distance(value, self._hashes[key])
+            if distance <= max_distance:
+                matches.append((distance, key))
+        matches.sort()
+        return matches
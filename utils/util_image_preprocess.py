@@ -0,0 +1,88 @@
+import math
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from utils.util_tracing import traced
+
+IMAGE_MAX_EDGE = 1600  # 긴 변 기준 최대 크기 (px)
+IMAGE_GRAYSCALE = False
+IMAGE_OUTPUT_FORMAT = "JPEG"  # JPEG 또는 WEBP
+IMAGE_OUTPUT_QUALITY = 85
+CONTENT_THRESHOLD = 200  # 이 밝기 미만의 픽셀을 콘텐츠(글씨/도형)로 판단
+CONTENT_MARGIN = 16  # 콘텐츠 영역 자르기 시 여백 (px)
+
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "PNG": "image/png",
+}
+
+def estimate_image_tokens(width, height):
+    """OpenAI Vision(high detail) 기준 이미지 입력 토큰 수를 추정합니다."""
+    if width <= 0 or height <= 0:
+        return 0
+    # 2048x2048 이내로 축소 후, 짧은 변을 768px로 축소
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return 85 + 170 * tiles
+
+def crop_to_content(img, threshold=CONTENT_THRESHOLD, margin=CONTENT_MARGIN):
+    """여백을 제외한 콘텐츠 영역으로 이미지를 자릅니다."""
+    mask = ImageOps.autocontrast(img.convert("L")).point(lambda p: 255 if p < threshold else 0)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return img
+    left, top, right, bottom = bbox
+    bbox = (
+        max(0, left - margin),
+        max(0, top - margin),
+        min(img.width, right + margin),
+        min(img.height, bottom + margin),
+    )
+    if bbox == (0, 0, img.width, img.height):
+        return img
+    return img.crop(bbox)
+
+@traced("image.preprocess")
+def preprocess_image(img_bytes, max_edge=IMAGE_MAX_EDGE, grayscale=IMAGE_GRAYSCALE, output_format=IMAGE_OUTPUT_FORMAT, quality=IMAGE_OUTPUT_QUALITY):
+    """
+    LLM 요청 전 이미지 전처리
+    - EXIF 회전 정보 반영 → 콘텐츠 영역 자르기 → 최대 크기 축소 → (선택) 흑백 변환 → JPEG/WebP 재인코딩
+    - 반환값: (전처리된 이미지 바이트, MIME 타입, 절감 통계)
+    """
+    with Image.open(BytesIO(img_bytes)) as img:
+        original_size = img.size
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("L") if grayscale else img.convert("RGB")
+        img = crop_to_content(img)
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        buffer = BytesIO()
+        img.save(buffer, format=output_format, quality=quality, optimize=True)
+        processed_bytes = buffer.getvalue()
+        processed_size = img.size
+
+    # 전처리 결과가 더 크면 원본을 그대로 사용
+    if len(processed_bytes) >= len(img_bytes):
+        with Image.open(BytesIO(img_bytes)) as img:
+            mime_type = MIME_TYPES.get(img.format, "image/png")
+        processed_bytes = img_bytes
+        processed_size = original_size
+    else:
+        mime_type = MIME_TYPES[output_format]
+
+    original_tokens = estimate_image_tokens(*original_size)
+    processed_tokens = estimate_image_tokens(*processed_size)
+    stats = {
+        "original_bytes": len(img_bytes),
+        "processed_bytes": len(processed_bytes),
+        "bytes_saved": len(img_bytes) - len(processed_bytes),
+        "original_tokens": original_tokens,
+        "processed_tokens": processed_tokens,
+        "tokens_saved": original_tokens - processed_tokens,
+    }
+    return processed_bytes, mime_type, stats
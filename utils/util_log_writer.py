@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import queue
+import sqlite3
+import threading
+from collections import defaultdict
+
+import streamlit as st
+
+from utils.utils_gsheet import append_sheet_rows
+
+LOG_FLUSH_INTERVAL_SEC = 5  # 버퍼에 쌓인 로그를 시트에 반영하는 최대 대기 시간
+LOG_FLUSH_BATCH_SIZE = 50  # 버퍼에 이 개수 이상 쌓이면 즉시 반영
+LOG_JOURNAL_PATH = os.path.join(".cache", "log_journal.db")
+LOG_DEDUPE_RETENTION_SEC = 60 * 60 * 24 * 7  # 중복 적재 방지 key 보관 기간
+
+class LogWriter:
+    """
+    로그성 테이블(*_incr) 적재를 위한 write-behind 버퍼
+    - 요청 처리 경로에서는 로컬 SQLite 저널에 기록만 하고, 백그라운드 스레드가 시트별로 모아 append_rows로 일괄 반영
+    - 시트 반영에 성공한 로그만 저널에서 삭제하므로 반영 실패/프로세스 강제 종료 시에도 다음 반영 시(재시작 포함) 재전송
+    - 반영 성공 직후 저널 삭제 전에 강제 종료된 경우에는 해당 묶음이 한 번 더 적재될 수 있음 (at-least-once)
+    """
+
+    def __init__(self, journal_path=LOG_JOURNAL_PATH, flush_interval_sec=LOG_FLUSH_INTERVAL_SEC, flush_batch_size=LOG_FLUSH_BATCH_SIZE):
+        self.flush_interval_sec = flush_interval_sec
+        self.flush_batch_size = flush_batch_size
+        self.flushed = 0
+        self.failures = 0
+        self._queue = queue.Queue()  # 저널에 새 로그가 기록되었음을 백그라운드 스레드에 알리는 용도
+        self._flush_lock = threading.Lock()
+        self._attempted_id = 0  # 반영을 시도한 마지막 저널 id (이후 로그는 반영 대기, 이하 로그는 반영 실패로 보관 중)
+
+        if os.path.dirname(journal_path):
+            os.makedirs(os.path.dirname(journal_path), exist_ok=True)
+        self._journal = sqlite3.connect(journal_path, check_same_thread=False)
+        self._journal.execute("PRAGMA journal_mode=WAL")
+        self._journal.execute(
+            """
+            CREATE TABLE IF NOT EXISTS log_journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sheet_name TEXT NOT NULL,
+                row TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._journal.execute(
+            """
+            CREATE TABLE IF NOT EXISTS log_dedupe_keys (
+                sheet_name TEXT NOT NULL,
+                dedupe_key TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (sheet_name, dedupe_key)
+            )
+            """
+        )
+        self._journal.execute("CREATE INDEX IF NOT EXISTS idx_log_dedupe_keys_created_at ON log_dedupe_keys(created_at)")
+        self._journal.commit()
+        # 중복 확인/저널 기록은 요청 처리 경로에서 수행되므로 시트 반영과 별도 연결/잠금 사용
+        self._dedupe_conn = sqlite3.connect(journal_path, check_same_thread=False)
+        # WAL 모드에서는 NORMAL로도 프로세스 강제 종료 시 커밋된 로그가 유지되며, 커밋마다 fsync하지 않음
+        self._dedupe_conn.execute("PRAGMA synchronous=NORMAL")
+        self._dedupe_lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, sheet_name, row, dedupe_key=None):
+        """
+        로그 1건을 저널에 기록합니다. (시트 반영은 백그라운드에서 수행)
+        - dedupe_key가 주어지면 같은 시트/key의 로그는 한 번만 적재하며, 추가 여부를 반환
+        """
+        if dedupe_key is not None and not self.claim(sheet_name, dedupe_key):
+            return False
+        with self._dedupe_lock:
+            self._write_journal(self._dedupe_conn, sheet_name, [row])
+            self._dedupe_conn.commit()
+        self._queue.put(None)
+        return True
+
+    def claim(self, sheet_name, dedupe_key):
+        """같은 시트/key로 처음 요청된 경우에만 True를 반환합니다."""
+        with self._dedupe_lock:
+            cursor = self._dedupe_conn.execute(
+                "INSERT OR IGNORE INTO log_dedupe_keys (sheet_name, dedupe_key, created_at) VALUES (?, ?, ?)",
+                (sheet_name, str(dedupe_key), time.time())
+            )
+            self._dedupe_conn.commit()
+            return cursor.rowcount == 1
+
+    def _prune_dedupe_keys(self):
+        with self._dedupe_lock:
+            self._dedupe_conn.execute(
+                "DELETE FROM log_dedupe_keys WHERE created_at < ?",
+                (time.time() - LOG_DEDUPE_RETENTION_SEC,)
+            )
+            self._dedupe_conn.commit()
+
+    def _drain(self):
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def _run(self):
+        # 재시작 시 저널에 남아 있는 로그부터 재전송
+        self.flush()
+        deadline = time.time() + self.flush_interval_sec
+        waiting = 0
+        while True:
+            try:
+                self._queue.get(timeout=max(0.0, deadline - time.time()))
+                waiting += 1
+            except queue.Empty:
+                pass
+            if waiting >= self.flush_batch_size or time.time() >= deadline:
+                self._drain()
+                waiting = 0
+                self.flush()
+                self._prune_dedupe_keys()
+                deadline = time.time() + self.flush_interval_sec
+
+    def flush(self):
+        """저널에 남은 로그를 시트별로 모아 append_rows로 반영하고, 반영된 로그를 저널에서 삭제합니다."""
+        with self._flush_lock:
+            rows_by_sheet = defaultdict(list)
+            journal_ids_by_sheet = defaultdict(list)
+            for journal_id, sheet_name, row in self._journal.execute("SELECT id, sheet_name, row FROM log_journal ORDER BY id"):
+                rows_by_sheet[sheet_name].append(json.loads(row))
+                journal_ids_by_sheet[sheet_name].append(journal_id)
+                self._attempted_id = max(self._attempted_id, journal_id)
+
+            for sheet_name, rows in rows_by_sheet.items():
+                try:
+                    append_sheet_rows(sheet_name, rows)
+                    self.flushed += len(rows)
+                    self._journal.executemany(
+                        "DELETE FROM log_journal WHERE id = ?",
+                        [(journal_id,) for journal_id in journal_ids_by_sheet[sheet_name]]
+                    )
+                except Exception as e:
+                    # 반영 실패한 로그는 저널에 남아 다음 반영 시 재전송
+                    print(f"Error: {e}")
+                    self.failures += 1
+            self._journal.commit()
+
+    @staticmethod
+    def _write_journal(conn, sheet_name, rows):
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO log_journal (sheet_name, row, created_at) VALUES (?, ?, ?)",
+            [(sheet_name, json.dumps(list(row), ensure_ascii=False, default=str), now) for row in rows]
+        )
+
+    def stats(self):
+        """반영 대기 건수, 반영 실패로 저널에 보관 중인 건수, 누적 반영 건수, 실패 횟수를 반환합니다."""
+        with self._flush_lock:
+            queued, journaled = self._journal.execute(
+                "SELECT COALESCE(SUM(id > ?), 0), COALESCE(SUM(id <= ?), 0) FROM log_journal",
+                (self._attempted_id, self._attempted_id)
+            ).fetchone()
+        return {
+            "queued": queued,
+            "journaled": journaled,
+            "flushed": self.flushed,
+            "failures": self.failures,
+        }
+
+@st.cache_resource
+def get_log_writer():
+    """프로세스 전체에서 공유하는 로그 버퍼를 반환합니다."""
+    return LogWriter()
@@ -0,0 +1,129 @@
+import re
+import time
+import threading
+
+import streamlit as st
+
+from utils.utils_gsheet import format_phone_number
+from utils.util_datastore import read_table
+
+MEMBER_INDEX_REFRESH_SEC = 60  # 회원 시트(구글 폼 응답)를 다시 읽어 색인을 갱신하는 주기
+ACCESS_TYPE_LABELS = {"admin": "관리자", "normal": "일반(학생)"}
+STATUS_CODES = {"활성": "active", "대기": "waiting", "비활성": "inactive"}
+MEMBER_INDEX_OVERRIDE_MAX_SEC = 60 * 10  # update_status로 반영한 변경이 이 시간이 지나도 시트에 나타나지 않으면 시트 값을 따름
+STATUS_PRIORITY = {"active": 3, "waiting": 2, "inactive": 1}  # 동일 번호/권한 유형의 요청이 여러 건인 경우 우선순위
+
+def normalize_phone(phone):
+    """'01012345678', '010-1234-5678', 1012345678.0 등을 '01012345678' 형식으로 변환합니다."""
+    digits = re.sub(r"\D", "", format_phone_number(phone))
+    if len(digits) == 10 and digits.startswith("1"):
+        digits = "0" + digits
+    return digits
+
+class MemberIndex:
+    """
+    (전화번호, 권한 유형) -> 권한 상태 색인
+    - 로그인 확인 시 네트워크 호출 없이 dict 조회만 수행
+    - 백그라운드 스레드가 주기적으로 회원 시트를 다시 읽어 전체 색인을 교체
+    - Access Control에서 권한 상태를 변경한 경우 해당 요청만 즉시 반영하고, 갱신 시 시트에서 확인될 때까지 다시 적용
+    - 대시보드 표시용 연락처 -> 이름(가장 최근 요청 기준) 매핑을 함께 유지
+    """
+
+    def __init__(self, refresh_sec=MEMBER_INDEX_REFRESH_SEC):
+        self.refresh_sec = refresh_sec
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._requests = {}  # (전화번호, 권한 유형) -> {req_id: 상태}
+        self._index = {}  # (전화번호, 권한 유형) -> 상태
+        self._names = {}  # 전화번호 -> 이름 (갱신 시 통째로 교체하므로 조회 측에서 그대로 사용 가능)
+        self._overrides = {}  # (전화번호, 권한 유형, req_id) -> (상태, 변경 시각): 시트 조회 결과에서 확인되기 전의 상태 변경
+        self.refresh()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="member-index", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_sec):
+            self.refresh()
+
+    def close(self):
+        """백그라운드 갱신을 중지합니다. (이후에는 refresh를 직접 호출한 경우에만 갱신)"""
+        self._stop.set()
+
+    def refresh(self):
+        """회원 시트를 읽어 색인을 다시 만듭니다. 실패 시 기존 색인을 유지합니다."""
+        try:
+            df = read_table("tbl_mbr_req_incr")
+            requests = {}
+            names = {}
+            # 시트는 요청 순서대로 쌓이므로 나중 행의 이름이 최신 이름
+            for req_id, phn_no, access_type, status, name in zip(df["req_id"], df["phn_no"], df["access_type"], df["status"], df["name"]):
+                phone = normalize_phone(phn_no)
+                if isinstance(name, str) and name:
+                    names[phone] = name
+                if status not in STATUS_CODES:
+                    continue
+                requests.setdefault((phone, access_type), {})[req_id] = STATUS_CODES[status]
+        except Exception as e:
+            print(f"Error: {e}")
+            return False
+        now = time.time()
+        with self._lock:
+            # 시트 조회 이후(또는 조회 중)에 변경된 상태가 덮어쓰이지 않도록, 조회 결과에 아직 없는 변경은 다시 적용
+            overrides = {}
+            for (phone, access_type, req_id), (status, updated_at) in self._overrides.items():
+                if requests.get((phone, access_type), {}).get(req_id) == status or now - updated_at >= MEMBER_INDEX_OVERRIDE_MAX_SEC:
+                    continue
+                requests.setdefault((phone, access_type), {})[req_id] = status
+                overrides[(phone, access_type, req_id)] = (status, updated_at)
+            index = {key: self._best_status(statuses) for key, statuses in requests.items()}
+            self._requests, self._index, self._names, self._overrides = requests, index, names, overrides
+            self.loaded_at = time.time()
+        return True
+
+    @staticmethod
+    def _best_status(statuses):
+        return max(statuses.values(), key=STATUS_PRIORITY.get)
+
+    def update_status(self, req_id, phone, access_type, status):
+        """권한 요청 1건의 상태 변경을 색인에 반영합니다."""
+        if status not in STATUS_CODES:
+            return
+        key = (normalize_phone(phone), access_type)
+        with self._lock:
+            statuses = self._requests.setdefault(key, {})
+            statuses[req_id] = STATUS_CODES[status]
+            self._index[key] = self._best_status(statuses)
+            self._overrides[(*key, req_id)] = (STATUS_CODES[status], time.time())
+
+    def lookup(self, phone, access_type):
+        """'active' / 'waiting' / 'inactive' / 'not_found' 중 하나를 반환합니다."""
+        key = (normalize_phone(phone), ACCESS_TYPE_LABELS.get(access_type, access_type))
+        with self._lock:
+            return self._index.get(key, "not_found")
+
+    def names(self):
+        """연락처 -> 이름 매핑을 반환합니다. (df['phn_no'].map(...)으로 이름 컬럼 생성)"""
+        with self._lock:
+            return self._names
+
+    def stats(self):
+        with self._lock:
+            return {
+                "members": len(self._index),
+                "requests": sum(len(statuses) for statuses in self._requests.values()),
+                "age_sec": time.time() - self.loaded_at if self.loaded_at else None,
+            }
+
+@st.cache_resource
+def get_member_index():
+    """프로세스 전체에서 공유하는 회원 색인을 반환합니다."""
+    return MemberIndex()
+
+def is_registered_user(phone_number, access_type):
+    """등록된 사용자인지 확인 - 권한 상태('active' / 'waiting' / 'inactive' / 'not_found')를 반환"""
+    try:
+        return get_member_index().lookup(phone_number, access_type)
+    except Exception as e:
+        print(f"Error: {e}")
+        return 'not_found'
@@ -0,0 +1,120 @@
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageOps
+
+ANALYSIS_WIDTH = 1000  # 레이아웃 분석용 축소 너비 (px)
+INK_THRESHOLD = 160  # 이 밝기 미만의 픽셀을 잉크(글씨/도형)로 판단
+BLANK_ROW_INK_RATIO = 0.002  # 잉크 비율이 이 값 이하인 행/열을 공백으로 판단
+MIN_GAP_RATIO = 0.015  # 문제 사이 공백의 최소 높이 (페이지 높이 대비)
+MIN_PROBLEM_RATIO = 0.06  # 문제 1개의 최소 높이 (페이지 높이 대비)
+MIN_GUTTER_RATIO = 0.02  # 2단 편집 판단 시 단 사이 공백의 최소 너비 (페이지 너비 대비)
+MARKER_INDENT_RATIO = 0.04  # 문제 번호로 판단하는 단 왼쪽 끝으로부터의 최대 거리 (단 너비 대비)
+MAX_PROBLEMS_PER_COLUMN = 6
+CROP_MARGIN = 12  # 자른 이미지의 여백 (원본 px)
+
+def _blank_runs(is_blank):
+    """공백 여부 배열에서 연속된 공백 구간 [(시작, 끝)]을 반환합니다."""
+    runs = []
+    start = None
+    for i, blank in enumerate(is_blank):
+        if blank and start is None:
+            start = i
+        elif not blank and start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(is_blank)))
+    return runs
+
+def _split_columns(ink):
+    """2단 편집 여부를 판단하여 단별 (왼쪽, 오른쪽) 범위를 반환합니다."""
+    height, width = ink.shape
+    col_blank = ink.mean(axis=0) <= BLANK_ROW_INK_RATIO
+    min_gutter = max(1, int(width * MIN_GUTTER_RATIO))
+    for start, end in _blank_runs(col_blank):
+        center = (start + end) / 2
+        if end - start >= min_gutter and width * 0.35 <= center <= width * 0.65:
+            return [(0, start), (end, width)]
+    return [(0, width)]
+
+def _content_left(ink_rows):
+    cols = np.flatnonzero(ink_rows.any(axis=0))
+    return cols[0] if len(cols) else None
+
+def _split_rows(ink, left, right):
+    """단 내부를 수평 투영 프로파일의 공백 구간 기준으로 문제 단위 (위, 아래) 범위로 나눕니다."""
+    height = ink.shape[0]
+    column = ink[:, left:right]
+    row_blank = column.mean(axis=1) <= BLANK_ROW_INK_RATIO
+    content_rows = np.flatnonzero(~row_blank)
+    if len(content_rows) == 0:
+        return []
+    top, bottom = content_rows[0], content_rows[-1] + 1
+    column_left = _content_left(column[top:bottom])
+    indent_tol = max(2, int((right - left) * MARKER_INDENT_RATIO))
+
+    # 문제 번호 후보: 충분히 큰 공백 다음 줄이 단의 왼쪽 끝에서 시작하는 경우
+    min_gap = max(2, int(height * MIN_GAP_RATIO))
+    gaps = []
+    for start, end in _blank_runs(row_blank[top:bottom]):
+        start, end = start + top, end + top
+        if end - start < min_gap:
+            continue
+        next_blank = np.flatnonzero(row_blank[end:bottom])
+        line_end = end + (next_blank[0] if len(next_blank) else bottom - end)
+        line_left = _content_left(column[end:line_end])
+        if line_left is not None and line_left - column_left <= indent_tol:
+            gaps.append((end - start, start, end))
+
+    # 공백이 큰 순서대로 분할 위치를 선택하고, 너무 작은 조각이 생기는 위치는 제외
+    min_height = int(height * MIN_PROBLEM_RATIO)
+    cuts = []
+    for _, start, end in sorted(gaps, reverse=True):
+        if len(cuts) >= MAX_PROBLEMS_PER_COLUMN - 1:
+            break
+        cut = (start + end) // 2
+        bounds = sorted([top, bottom] + [c for c, _, _ in cuts] + [cut])
+        if min(b - a for a, b in zip(bounds, bounds[1:])) >= min_height:
+            cuts.append((cut, start, end))
+
+    segments = []
+    prev = top
+    for _, start, end in sorted(cuts):
+        segments.append((prev, start))
+        prev = end
+    segments.append((prev, bottom))
+    return segments
+
+def split_problems(img_bytes, output_format="PNG"):
+    """
+    한 장의 시험지 이미지를 문제 단위로 잘라 이미지 바이트 목록을 반환합니다.
+    - 2단 편집은 세로 공백(단 사이 여백)으로 먼저 나눈 뒤, 단별로 가로 공백과 문제 번호 위치를 기준으로 분할
+    - 분할 위치를 찾지 못한 경우 원본 이미지 1개를 그대로 반환
+    """
+    with Image.open(BytesIO(img_bytes)) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+
+    scale = img.width / ANALYSIS_WIDTH
+    small = img.convert("L").resize((ANALYSIS_WIDTH, max(1, int(img.height / scale))))
+    ink = np.asarray(ImageOps.autocontrast(small)) < INK_THRESHOLD
+
+    boxes = []
+    for left, right in _split_columns(ink):
+        for top, bottom in _split_rows(ink, left, right):
+            boxes.append((left, top, right, bottom))
+    if len(boxes) <= 1:
+        return [img_bytes]
+
+    crops = []
+    for left, top, right, bottom in boxes:
+        box = (
+            max(0, int(left * scale) - CROP_MARGIN),
+            max(0, int(top * scale) - CROP_MARGIN),
+            min(img.width, int(right * scale) + CROP_MARGIN),
+            min(img.height, int(bottom * scale) + CROP_MARGIN),
+        )
+        buffer = BytesIO()
+        img.crop(box).save(buffer, format=output_format)
+        crops.append(buffer.getvalue())
+    return crops
@@ -0,0 +1,132 @@
+import re
+import time
+import threading
+
+import pandas as pd
+import streamlit as st
+import gspread
+
+from utils.utils_gsheet import with_worksheet, convert_sheet_types
+from utils.util_tracing import span
+
+INCREMENTAL_REFRESH_SEC = 5  # 시트에 새로 추가된 행을 확인하는 최소 간격
+
+def normalize_partition(value):
+    """date_partition 값(20250814, 20250814.0, '20250814', date 등)을 'YYYYMMDD' 문자열로 변환합니다."""
+    if value is None:
+        return None
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y%m%d")
+    return str(value).replace(".0", "").replace("-", "")
+
+def _column_letter(n):
+    return re.sub(r"\d", "", gspread.utils.rowcol_to_a1(1, n))
+
+class _TableState:
+    def __init__(self):
+        self.header = None
+        self.row_count = 0  # 반영한 데이터 행 수 (high-water mark)
+        self.last_row = None  # 마지막으로 반영한 행 (시트 변경 감지용)
+        self.rows_by_partition = {}  # date_partition -> [행]
+        self.frames = {}  # date_partition -> DataFrame (새 행이 추가된 파티션만 다시 생성)
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+class PartitionedLogReader:
+    """
+    로그성 테이블(*_incr)을 date_partition 단위로 캐시하고, 시트에서는 마지막으로 반영한 행 이후만 가져옵니다.
+    - 최초 1회만 전체 조회하며, 이후에는 high-water mark(행 수) 다음 행부터 조회
+    - 마지막으로 반영한 행이 시트와 다른 경우(행 삭제/수정) 전체를 다시 조회
+    - 기간 조건이 있으면 해당 기간의 파티션만 합쳐서 반환
+    """
+
+    def __init__(self, refresh_sec=INCREMENTAL_REFRESH_SEC):
+        self.refresh_sec = refresh_sec
+        self._tables = {}
+        self._tables_lock = threading.Lock()
+        self.stats = {"full_loads": 0, "incremental_loads": 0, "rows_fetched": 0}
+
+    def _state(self, table):
+        with self._tables_lock:
+            return self._tables.setdefault(table, _TableState())
+
+    def _full_load(self, table, state):
+        with span("sheets.read"):
+            values = with_worksheet(table, lambda worksheet: worksheet.get_values())
+        self.stats["full_loads"] += 1
+        state.header = values[0] if values else []
+        state.row_count = 0
+        state.last_row = None
+        state.rows_by_partition = {}
+        state.frames = {}
+        self._append(state, values[1:])
+
+    def _append(self, state, rows):
+        width = len(state.header)
+        rows = [(row + [""] * width)[:width] for row in rows]
+        if not rows:
+            return
+        partition_col = state.header.index("date_partition") if "date_partition" in state.header else None
+        for row in rows:
+            # 중간의 빈 행은 high-water mark 계산에만 포함
+            if not any(row):
+                continue
+            partition = normalize_partition(row[partition_col]) if partition_col is not None else None
+            state.rows_by_partition.setdefault(partition, []).append(row)
+            state.frames.pop(partition, None)
+        state.row_count += len(rows)
+        state.last_row = rows[-1]
+        self.stats["rows_fetched"] += len(rows)
+
+    def _refresh(self, table, state):
+        if state.header is None:
+            self._full_load(table, state)
+            return
+        if time.time() - state.checked_at < self.refresh_sec:
+            return
+        # 마지막으로 반영한 행(헤더 포함 시 row_count + 1번째 행)부터 조회하여 변경 여부를 함께 확인
+        start_row = state.row_count + 1
+        range_name = f"A{start_row}:{_column_letter(max(1, len(state.header)))}"
+        with span("sheets.read_incremental"):
+            values = with_worksheet(table, lambda worksheet: worksheet.get_values(range_name))
+        self.stats["incremental_loads"] += 1
+        width = len(state.header)
+        first = (values[0] + [""] * width)[:width] if values else None
+        expected = state.last_row if state.row_count else state.header
+        if first != expected:
+            self._full_load(table, state)
+        else:
+            self._append(state, values[1:])
+        state.checked_at = time.time()
+
+    def read(self, table, start_date=None, end_date=None):
+        """테이블을 DataFrame으로 반환합니다. start_date/end_date(YYYYMMDD)가 있으면 해당 기간의 파티션만 포함합니다."""
+        state = self._state(table)
+        start, end = normalize_partition(start_date), normalize_partition(end_date)
+        with state.lock:
+            self._refresh(table, state)
+            partitions = [
+                partition for partition in sorted(state.rows_by_partition, key=lambda p: p or "")
+                if partition is None and start is None and end is None
+                or partition is not None and (start is None or partition >= start) and (end is None or partition <= end)
+            ]
+            frames = []
+            for partition in partitions:
+                if partition not in state.frames:
+                    state.frames[partition] = convert_sheet_types(pd.DataFrame(state.rows_by_partition[partition], columns=state.header))
+                frames.append(state.frames[partition])
+            header = list(state.header)
+        if not frames:
+            return pd.DataFrame(columns=header)
+        return pd.concat(frames, ignore_index=True)
+
+    def partitions(self, table):
+        """캐시된 파티션별 행 수를 반환합니다."""
+        state = self._state(table)
+        with state.lock:
+            return {partition: len(rows) for partition, rows in state.rows_by_partition.items()}
+
+@st.cache_resource
+def get_partitioned_reader():
+    """프로세스 전체에서 공유하는 로그 테이블 리더를 반환합니다."""
+    return PartitionedLogReader()
@@ -1,55 +1,58 @@
-import streamlit as st
+import re
+import json
+import threading
+
 from langchain_openai import ChatOpenAI
 from langchain.output_parsers import ResponseSchema, StructuredOutputParser, OutputFixingParser
 from langchain_core.messages import HumanMessage
+from langchain_core.exceptions import OutputParserException
 from langchain_community.callbacks import get_openai_callback
 
+from utils.util_config import get_setting
+from utils.util_tracing import span, traced
+
 # import os
 # from dotenv import load_dotenv
 # load_dotenv()
 # OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
+OPENAI_API_KEY = get_setting("OPENAI_API_KEY")
+# 부하 테스트 시 tools/fake_services.py의 로컬 서버 주소(.../v1)로 지정 (미지정 시 OpenAI API 사용)
+OPENAI_BASE_URL = get_setting("OPENAI_BASE_URL")
 
 llm_outputfixer = ChatOpenAI(
     openai_api_key=OPENAI_API_KEY,
+    base_url=OPENAI_BASE_URL,
     model_name="gpt-4o-mini",
     max_tokens=4096,
     temperature=0,
     max_retries=2,
 )
 
-llm_analyzer = ChatOpenAI(
+LLM_ANALYZER_OPTIONS = dict(
     openai_api_key=OPENAI_API_KEY,
+    base_url=OPENAI_BASE_URL,
     # model_name="gpt-5",
     model_name="o3",
     max_tokens=4096,
     timeout=None,
-    max_retries=2,
+    stream_usage=True,  # 스트리밍 시에도 토큰 사용량(비용) 집계
 )
 
-def quiz_analyzer_english(img_input_base64):
-    response_schemas = [
-        ResponseSchema(
-            name="answer", 
-            description="The answer for the given problem"
-        ),
-        ResponseSchema(
-            name="description", 
-            description="The solution process for the given problem"),
-        ResponseSchema(
-            name="keywords", 
-            description="The keywords about English grammar essential for problem-solving. If there are two or more keywords for the problem, separate them with commas (,) and output a maximum of three."
-        )
-    ]
-    parser = StructuredOutputParser.from_response_schemas(response_schemas)
-    output_parser = OutputFixingParser.from_llm(parser=parser, llm=llm_outputfixer)
-    format_instructions = output_parser.get_format_instructions()
-
-    message = HumanMessage(
-        content=[
-            {
-                "type": "text",
-                "text": f"""
+llm_analyzer = ChatOpenAI(**LLM_ANALYZER_OPTIONS, max_retries=2)
+# 일괄 분석용: 재시도(429 공동 대기 포함)는 호출자가 담당하므로 SDK 내부 재시도 없이 1회만 요청
+llm_batch_analyzer = ChatOpenAI(**LLM_ANALYZER_OPTIONS, max_retries=0)
+
+# 과목별 분석 설정
+# - 과목 추가 시 항목만 추가하면 되며, 프롬프트 또는 출력 스키마 변경 시 schema_version을 갱신 (분석 결과 캐시 키에 사용)
+SUBJECT_SPECS = {
+    "영어": {
+        "schema_version": "20261018",
+        "response_schemas": [
+            ("answer", "The answer for the given problem"),
+            ("description", "The solution process for the given problem"),
+            ("keywords", "The keywords about English grammar essential for problem-solving. If there are two or more keywords for the problem, separate them with commas (,) and output a maximum of three."),
+        ],
+        "prompt": """
                 # Role
                 Your role is to output the answer(answer), the solution process (description), and the keywords needed to solve a given South Korean high school-level english problem (Image).
                 - Answer: Provide the correct answer to the problem.
@@ -66,50 +69,16 @@ def quiz_analyzer_english(img_input_base64):
                 5. Do not arbitrarily change the numbering of the question’s answer choices or the order of the text; use them as they are.
                 
                 # OutputFormat: {format_instructions}
-                """
-            },
-            {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/png;base64,{img_input_base64}"
-                }
-            }
-        ]
-    )
-    chain = llm_analyzer | output_parser
-
-    try:
-        with get_openai_callback() as cb:
-            response = chain.invoke([message])
-        total_cost = cb.total_cost*1400
-        return total_cost, response
-    except Exception as e:
-        print(f"Error: {e}")
-        return None, None
-
-def quiz_analyzer_science(img_input_base64):
-    response_schemas = [
-        ResponseSchema(
-            name="answer", 
-            description="The answer for the given problem"
-        ),
-        ResponseSchema(
-            name="description", 
-            description="The solution process for the given problem."),
-        ResponseSchema(
-            name="keywords", 
-            description="The keywords of scientific concepts that you need to know to solve the given problem. If there are two or more keywords for the problem, separate them with commas (,) and output a maximum of three."
-        )
-    ]
-    parser = StructuredOutputParser.from_response_schemas(response_schemas)
-    output_parser = OutputFixingParser.from_llm(parser=parser, llm=llm_outputfixer)
-    format_instructions = output_parser.get_format_instructions()
-
-    message = HumanMessage(
-        content=[
-            {
-                "type": "text",
-                "text": f"""
+                """,
+    },
+    "과학": {
+        "schema_version": "20261018",
+        "response_schemas": [
+            ("answer", "The answer for the given problem"),
+            ("description", "The solution process for the given problem."),
+            ("keywords", "The keywords of scientific concepts that you need to know to solve the given problem. If there are two or more keywords for the problem, separate them with commas (,) and output a maximum of three."),
+        ],
+        "prompt": """
                 # Role
                 Your role is to output the answer(answer), the solution process (description), and the keywords needed to solve a given South Korean high school-level science problem (Image).
                 - Answer: Provide the correct answer to the problem.
@@ -127,23 +96,197 @@ def quiz_analyzer_science(img_input_base64):
                 For short-answer questions, output the exact answer.
                 
                 # OutputFormat: {format_instructions}
-                """
+                """,
+    },
+}
+
+class SubjectAnalyzer:
+    """과목별 출력 스키마/파서/프롬프트를 한 번만 생성하여 재사용합니다."""
+
+    def __init__(self, subject, spec):
+        self.subject = subject
+        self.schema_version = spec["schema_version"]
+        self.field_names = [name for name, _ in spec["response_schemas"]]
+        response_schemas = [ResponseSchema(name=name, description=description) for name, description in spec["response_schemas"]]
+        self.parser = StructuredOutputParser.from_response_schemas(response_schemas)
+        # LLM 재요청을 통한 출력 수리는 로컬 파싱이 모두 실패한 경우에만 사용
+        self.repair_parser = OutputFixingParser.from_llm(parser=self.parser, llm=llm_outputfixer)
+        # 응답 형식은 structured output(JSON schema strict 모드)으로 강제하므로, 프롬프트에는 코드 블록(```json) 형식 안내 대신 필드 목록만 포함
+        self.prompt = spec["prompt"].format(format_instructions=f"A JSON object with the string fields: {', '.join(self.field_names)}")
+        self.json_schema = {
+            "type": "object",
+            "properties": {
+                name: {"type": "string", "description": description}
+                for name, description in spec["response_schemas"]
             },
-            {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/png;base64,{img_input_base64}"
+            "required": self.field_names,
+            "additionalProperties": False,
+        }
+        response_format = {
+            "type": "json_schema",
+            "json_schema": {"name": "quiz_analysis", "strict": True, "schema": self.json_schema},
+        }
+        self.llm = llm_analyzer.bind(response_format=response_format)
+        self.batch_llm = llm_batch_analyzer.bind(response_format=response_format)
+
+    def build_message(self, img_input_base64, mime_type):
+        return HumanMessage(
+            content=[
+                {
+                    "type": "text",
+                    "text": self.prompt
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{mime_type};base64,{img_input_base64}"
+                    }
                 }
-            }
-        ]
-    )
-    chain = llm_analyzer | output_parser
+            ]
+        )
+
+    def parse_local(self, text):
+        """JSON으로 엄격하게 파싱하고, 실패 시 코드 블록(```json) 등을 허용하는 로컬 파서로 재시도합니다."""
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = self.parser.parse(text)
+        return self.validate(data, text)
+
+    def validate(self, data, text):
+        """응답 스키마의 필드가 모두 문자열로 있는지 확인하고, 스키마 필드만 담아 반환합니다."""
+        if not isinstance(data, dict) or any(not isinstance(data.get(name), str) for name in self.field_names):
+            raise OutputParserException(f"Invalid output for schema: {text}")
+        return {name: data[name] for name in self.field_names}
+
+    def parse(self, text):
+        """(response, repaired, repair_cost)를 반환합니다. 출력 수리 결과도 스키마에 맞지 않으면 OutputParserException이 발생합니다."""
+        try:
+            return self.parse_local(text), False, 0
+        except OutputParserException:
+            with span("llm.repair"), get_openai_callback() as cb:
+                response = self.repair_parser.parse(text)
+            return self._validate_repaired(response, text), True, cb.total_cost * 1400
+
+    async def aparse(self, text):
+        try:
+            return self.parse_local(text), False, 0
+        except OutputParserException:
+            with span("llm.repair"), get_openai_callback() as cb:
+                response = await self.repair_parser.aparse(text)
+            return self._validate_repaired(response, text), True, cb.total_cost * 1400
+
+    def _validate_repaired(self, response, text):
+        try:
+            return self.validate(response, text)
+        except OutputParserException:
+            _record_repair_failure(self.subject)
+            raise
+
+ANALYZERS = {subject: SubjectAnalyzer(subject, spec) for subject, spec in SUBJECT_SPECS.items()}
+
+def get_schema_version(subject):
+    return ANALYZERS[subject].schema_version
+
+# 과목별 응답 파싱 및 출력 수리(LLM 재요청) 횟수/비용
+_parse_stats = {subject: {"responses": 0, "repaired": 0, "repair_failed": 0, "repair_cost": 0.0} for subject in SUBJECT_SPECS}
+_parse_stats_lock = threading.Lock()
+
+def _record_repair_failure(subject):
+    with _parse_stats_lock:
+        _parse_stats[subject]["repair_failed"] += 1
+
+def _record_parse(subject, response, repaired, analyze_cost, repair_cost):
+    with _parse_stats_lock:
+        stats = _parse_stats[subject]
+        stats["responses"] += 1
+        stats["repaired"] += int(repaired)
+        stats["repair_cost"] += repair_cost
+    response["repaired"] = repaired
+    response["cost_by_stage"] = {"analyze": analyze_cost, "repair": repair_cost}
+    return analyze_cost + repair_cost, response
+
+def get_parse_stats():
+    """과목별 응답 수, 출력 수리 횟수/비율, 수리 후에도 스키마에 맞지 않은 횟수 및 수리 비용을 반환합니다."""
+    with _parse_stats_lock:
+        return {
+            subject: {**stats, "repair_rate": stats["repaired"] / stats["responses"] if stats["responses"] else 0.0}
+            for subject, stats in _parse_stats.items()
+        }
+
+_PARTIAL_FIELD_PATTERN = '"{}"\\s*:\\s*"'
+
+def extract_partial_field(text, field):
+    """스트리밍 중인(닫히지 않은) JSON 텍스트에서 문자열 필드의 현재까지 값을 추출합니다."""
+    match = re.search(_PARTIAL_FIELD_PATTERN.format(field), text)
+    if match is None:
+        return None
+    chars = []
+    escaped = False
+    for ch in text[match.end():]:
+        if escaped:
+            escaped = False
+        elif ch == '\\':
+            escaped = True
+        elif ch == '"':
+            break
+        chars.append(ch)
+    value = ''.join(chars)
+    # 이스케이프 시퀀스가 중간에 잘린 경우 완성된 부분까지만 디코딩
+    for end in range(len(value), max(len(value) - 6, -1), -1):
+        try:
+            return json.loads(f'"{value[:end]}"', strict=False)
+        except ValueError:
+            continue
+    return None
+
+@traced("llm.analyze")
+def analyze(subject, img_input_base64, mime_type="image/png"):
+    """과목별 문제 분석. (total_cost, response)를 반환하며, 오류 발생 시 (None, None)을 반환합니다."""
+    analyzer = ANALYZERS[subject]
+    try:
+        with get_openai_callback() as cb:
+            message = analyzer.llm.invoke([analyzer.build_message(img_input_base64, mime_type)])
+        response, repaired, repair_cost = analyzer.parse(message.content)
+        return _record_parse(subject, response, repaired, cb.total_cost * 1400, repair_cost)
+    except Exception as e:
+        print(f"Error: {e}")
+        return None, None
+
+@traced("llm.analyze")
+async def aanalyze(subject, img_input_base64, mime_type="image/png", raise_errors=False):
+    """
+    analyze의 비동기 버전. raise_errors=True인 경우 오류를 그대로 전달합니다.
+    - raise_errors=True인 경우 재시도는 호출자가 담당하므로 SDK 내부 재시도 없이 1회만 요청
+    """
+    analyzer = ANALYZERS[subject]
+    llm = analyzer.batch_llm if raise_errors else analyzer.llm
+    # asyncio.CancelledError는 Exception이 아니므로 그대로 전파되어 진행 중인 요청이 중단됨
+    try:
+        with get_openai_callback() as cb:
+            message = await llm.ainvoke([analyzer.build_message(img_input_base64, mime_type)])
+        response, repaired, repair_cost = await analyzer.aparse(message.content)
+        return _record_parse(subject, response, repaired, cb.total_cost * 1400, repair_cost)
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Error: {e}")
+        return None, None
 
+@traced("llm.analyze_stream")
+async def astream_analyze(subject, img_input_base64, mime_type="image/png", on_description=None):
+    """토큰 단위로 응답을 받아 description의 현재까지 내용을 on_description으로 전달하고, 완료 후 전체 응답을 파싱합니다."""
+    analyzer = ANALYZERS[subject]
     try:
         with get_openai_callback() as cb:
-            response = chain.invoke([message])
-        total_cost = cb.total_cost * 1400
-        return total_cost, response
+            text = ""
+            async for chunk in analyzer.llm.astream([analyzer.build_message(img_input_base64, mime_type)]):
+                text += chunk.content if isinstance(chunk.content, str) else ""
+                description = extract_partial_field(text, "description")
+                if description and on_description is not None:
+                    on_description(description)
+        response, repaired, repair_cost = await analyzer.aparse(text)
+        return _record_parse(subject, response, repaired, cb.total_cost * 1400, repair_cost)
     except Exception as e:
         print(f"Error: {e}")
         return None, None
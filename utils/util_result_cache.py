@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from io import BytesIO
+
+import streamlit as st
+from PIL import Image, ImageOps
+
+from utils.util_image_hash import HammingIndex
+
+RESULT_CACHE_PATH = os.path.join(".cache", "quiz_result_cache.db")
+RESULT_CACHE_MAX_ENTRIES = 5000
+RESULT_CACHE_MAX_AGE_SEC = 60 * 60 * 24 * 30  # 30일
+PHASH_MAX_DISTANCE = 6  # 근사 중복으로 판단하는 최대 해밍 거리 (64비트 기준)
+
+def normalize_image_bytes(img_bytes):
+    """메타데이터(EXIF 등)를 제외한 이미지 픽셀 데이터를 반환합니다."""
+    try:
+        with Image.open(BytesIO(img_bytes)) as img:
+            img = ImageOps.exif_transpose(img).convert("RGB")
+            return f"{img.width}x{img.height}|".encode("utf-8") + img.tobytes()
+    except Exception:
+        # 이미지로 해석되지 않는 경우 원본 바이트 기준으로 처리
+        return img_bytes
+
+def make_cache_key(img_bytes, subject, version):
+    """정규화된 이미지, 과목, 프롬프트/스키마 버전으로 캐시 키를 생성합니다."""
+    h = hashlib.sha256()
+    h.update(normalize_image_bytes(img_bytes))
+    h.update(f"|{subject}|{version}".encode("utf-8"))
+    return h.hexdigest()
+
+class ResultCache:
+    """분석 결과(answer/description/keywords)를 저장하는 SQLite 기반 영구 캐시"""
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_entries=RESULT_CACHE_MAX_ENTRIES, max_age_sec=RESULT_CACHE_MAX_AGE_SEC):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_sec = max_age_sec
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # (subject, version)별 perceptual hash 인덱스
+        self._phash_index = {}
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS quiz_result_cache (
+                cache_key TEXT PRIMARY KEY,
+                subject TEXT NOT NULL,
+                version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                phash TEXT
+            )
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(quiz_result_cache)")]
+        if 'phash' not in columns:
+            self._conn.execute("ALTER TABLE quiz_result_cache ADD COLUMN phash TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_quiz_result_cache_last_access ON quiz_result_cache(last_access)")
+        self._conn.commit()
+
+        for cache_key, subject, version, img_phash in self._conn.execute(
+            "SELECT cache_key, subject, version, phash FROM quiz_result_cache WHERE phash IS NOT NULL"
+        ):
+            self._get_phash_index(subject, version).add(cache_key, int(img_phash, 16))
+
+    def _get_phash_index(self, subject, version):
+        if (subject, version) not in self._phash_index:
+            self._phash_index[(subject, version)] = HammingIndex()
+        return self._phash_index[(subject, version)]
+
+    def get(self, cache_key):
+        """캐시된 결과를 반환합니다. 없거나 만료된 경우 None을 반환합니다."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM quiz_result_cache WHERE cache_key = ?",
+                (cache_key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_sec:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE quiz_result_cache SET last_access = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                (now, cache_key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def get_similar(self, img_phash, subject, version, max_distance=PHASH_MAX_DISTANCE):
+        """perceptual hash가 가까운(근사 중복) 이미지의 캐시된 결과를 반환합니다."""
+        now = time.time()
+        with self._lock:
+            matches = self._get_phash_index(subject, version).search(img_phash, max_distance)
+            for _, cache_key in matches:
+                row = self._conn.execute(
+                    "SELECT result, created_at FROM quiz_result_cache WHERE cache_key = ?",
+                    (cache_key,)
+                ).fetchone()
+                if row is None or now - row[1] > self.max_age_sec:
+                    continue
+                self._conn.execute(
+                    "UPDATE quiz_result_cache SET last_access = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                    (now, cache_key)
+                )
+                self._conn.commit()
+                self.near_hits += 1
+                return json.loads(row[0])
+        return None
+
+    def put(self, cache_key, subject, version, result, img_phash=None):
+        """분석 결과를 저장하고 크기/기간 기준으로 오래된 항목을 정리합니다."""
+        now = time.time()
+        payload = json.dumps(
+            {k: result.get(k, '') for k in ['answer', 'description', 'keywords']},
+            ensure_ascii=False
+        )
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO quiz_result_cache (cache_key, subject, version, result, created_at, last_access, hit_count, phash)
+                VALUES (?, ?, ?, ?, ?, ?, 0, ?)
+                """,
+                (cache_key, subject, version, payload, now, now, f"{img_phash:016x}" if img_phash is not None else None)
+            )
+            if img_phash is not None:
+                self._get_phash_index(subject, version).add(cache_key, img_phash)
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        # 기간 기준 정리
+        expired = self._conn.execute(
+            "SELECT cache_key FROM quiz_result_cache WHERE created_at < ?",
+            (now - self.max_age_sec,)
+        ).fetchall()
+        # 크기 기준 정리 (가장 오래 사용되지 않은 항목부터 삭제)
+        overflow = self._conn.execute(
+            """
+            SELECT cache_key FROM quiz_result_cache
+            ORDER BY last_access DESC
+            LIMIT -1 OFFSET ?
+            """,
+            (self.max_entries,)
+        ).fetchall()
+
+        evicted_keys = {row[0] for row in expired + overflow}
+        if not evicted_keys:
+            return
+        self._conn.executemany(
+            "DELETE FROM quiz_result_cache WHERE cache_key = ?",
+            [(cache_key,) for cache_key in evicted_keys]
+        )
+        self.evictions += len(evicted_keys)
+        for index in self._phash_index.values():
+            for cache_key in evicted_keys:
+                index.remove(cache_key)
+
+    def stats(self):
+        """캐시 적중/미적중/삭제(만료, 용량 초과) 횟수와 저장된 항목 수를 반환합니다."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM quiz_result_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses - self.near_hits,
+            "hit_rate": (self.hits + self.near_hits) / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+@st.cache_resource
+def get_result_cache():
+    """프로세스 전체에서 공유하는 분석 결과 캐시를 반환합니다."""
+    return ResultCache()
@@ -0,0 +1,185 @@
+import time
+import uuid
+import heapq
+import queue
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from utils.util_datastore import append_log
+from utils.util_sms_sender import send_bulk_sms, get_sms_request, get_sms_result, SMS_BULK_MAX_RECIPIENTS, SMS_POOL_SIZE
+
+DELIVERY_CHECK_DELAY_SEC = 5  # 발송 요청 후 전송 결과를 조회하기까지 대기 시간
+DELIVERY_CHECK_ATTEMPTS = 3  # 전송 결과가 확정되지 않은 경우 재조회 횟수
+DISPATCH_RETENTION_SEC = 60 * 60  # 완료된 발송 작업의 보관 기간
+
+class SmsRecipient:
+    """발송 대상 1명"""
+
+    def __init__(self, phone_number, sms_type, sms_body, meta=None):
+        self.phone_number = phone_number
+        self.sms_type = sms_type
+        self.sms_body = sms_body
+        self.meta = meta or {}
+        self.status = "대기"  # 대기 / 요청 완료 / 요청 실패 / 전송 완료 / 전송 실패
+        self.request_id = None
+        self.message_id = None
+        self.detail = ""
+
+    def finished(self):
+        return self.status not in ["대기"]
+
+class SmsDispatchJob:
+    """같은 내용의 문자를 묶어서 발송하는 작업"""
+
+    def __init__(self, job_id, recipients):
+        self.job_id = job_id
+        self.recipients = recipients
+        self.submitted_at = time.time()
+        self.done = False
+        self.checking = False  # 전송 결과 조회 중
+
+    def progress(self):
+        return sum(recipient.finished() for recipient in self.recipients), len(self.recipients)
+
+class SmsDispatcher:
+    """
+    문자 일괄 발송을 백그라운드 스레드에서 처리합니다.
+    - 수신자를 (문자 유형, 내용)별로 묶어 요청당 최대 SMS_BULK_MAX_RECIPIENTS명씩 발송
+    - 요청이 접수되면 수신자별 발송 내역(tbl_sms_log_incr)을 기록
+    - 발송 후 requestId로 수신자별 messageId를 조회하고, 전송 결과가 확정될 때까지 재조회
+    - 전송 결과 조회는 별도 스레드에서 예약 시각 순으로 실행하므로, 다음 발송 작업이 앞선 작업의 조회 대기에 밀리지 않음
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()  # 발송 작업
+        self._checks = []  # 전송 결과 조회 예약 (heap: 예약 시각, 순번, 작업, 남은 조회 횟수)
+        self._checks_cond = threading.Condition()
+        self._check_seq = itertools.count()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="sms-dispatcher", daemon=True)
+        self._thread.start()
+        self._check_thread = threading.Thread(target=self._run_checks, name="sms-delivery-checker", daemon=True)
+        self._check_thread.start()
+
+    def submit(self, recipients):
+        """발송 대상 목록을 제출하고 job id를 반환합니다."""
+        job = SmsDispatchJob(uuid.uuid4().hex, recipients)
+        with self._lock:
+            self._cleanup()
+            self._jobs[job.job_id] = job
+        self._queue.put(job)
+        return job.job_id
+
+    def refresh_delivery(self, job_id):
+        """전송 결과를 다시 조회합니다."""
+        job = self.get(job_id)
+        if job is not None and not job.checking:
+            job.checking = True
+            self._schedule_check(job, 0, 1)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _cleanup(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and now - job.submitted_at > DISPATCH_RETENTION_SEC]
+        for job_id in expired:
+            self._jobs.pop(job_id)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._send(job)
+            except Exception as e:
+                print(f"Error: {e}")
+            job.checking = True
+            job.done = True
+            self._schedule_check(job, DELIVERY_CHECK_DELAY_SEC, DELIVERY_CHECK_ATTEMPTS)
+
+    def _schedule_check(self, job, delay_sec, attempts):
+        with self._checks_cond:
+            heapq.heappush(self._checks, (time.time() + delay_sec, next(self._check_seq), job, attempts))
+            self._checks_cond.notify()
+
+    def _run_checks(self):
+        while True:
+            with self._checks_cond:
+                while not self._checks or self._checks[0][0] > time.time():
+                    self._checks_cond.wait(self._checks[0][0] - time.time() if self._checks else None)
+                _, _, job, attempts = heapq.heappop(self._checks)
+            try:
+                pending = self._check_delivery(job)
+            except Exception as e:
+                print(f"Error: {e}")
+                pending = False
+            if pending and attempts > 1:
+                self._schedule_check(job, DELIVERY_CHECK_DELAY_SEC, attempts - 1)
+            else:
+                job.checking = False
+
+    def _send(self, job):
+        groups = {}
+        for recipient in job.recipients:
+            groups.setdefault((recipient.sms_type, recipient.sms_body), []).append(recipient)
+
+        for (sms_type, sms_body), recipients in groups.items():
+            for i in range(0, len(recipients), SMS_BULK_MAX_RECIPIENTS):
+                chunk = recipients[i:i + SMS_BULK_MAX_RECIPIENTS]
+                try:
+                    result = send_bulk_sms(sms_type, sms_body, [recipient.phone_number for recipient in chunk])
+                except Exception as e:
+                    print(f"Error: {e}")
+                    result = {"statusCode": "error", "statusName": str(e)}
+                accepted = result.get("statusCode") == "202"
+                create_dt = time.strftime("%Y%m%d %H:%M:%S", time.localtime())
+                date_partition = create_dt.split(" ")[0]
+                for recipient in chunk:
+                    if accepted:
+                        recipient.status = "요청 완료"
+                        recipient.request_id = result.get("requestId")
+                        append_log("tbl_sms_log_incr", [date_partition, create_dt, recipient.phone_number, sms_type])
+                    else:
+                        recipient.status = "요청 실패"
+                        recipient.detail = str(result.get("statusName", ""))
+
+    def _check_delivery(self, job):
+        """전송 결과를 1회 조회하고, 아직 결과가 확정되지 않은 수신자가 남아 있는지 반환합니다."""
+        pending = [recipient for recipient in job.recipients if recipient.status == "요청 완료"]
+        if not pending:
+            return False
+
+        # requestId별로 1회 조회하여 수신자(to) -> messageId 매핑
+        for request_id in {recipient.request_id for recipient in pending if recipient.message_id is None}:
+            messages = get_sms_request(request_id).get("messages", [])
+            message_ids = {message.get("to"): message.get("messageId") for message in messages}
+            for recipient in pending:
+                if recipient.request_id == request_id and recipient.message_id is None:
+                    recipient.message_id = message_ids.get(recipient.phone_number)
+
+        # 메시지별 결과 조회는 SMS 클라이언트의 연결 풀 크기만큼 동시에 수행
+        with ThreadPoolExecutor(max_workers=SMS_POOL_SIZE) as executor:
+            executor.map(self._check_message, [recipient for recipient in pending if recipient.message_id is not None])
+        return any(recipient.status == "요청 완료" for recipient in job.recipients)
+
+    def _check_message(self, recipient):
+        try:
+            messages = get_sms_result(recipient.message_id).get("messages", [])
+        except Exception as e:
+            print(f"Error: {e}")
+            return
+        if not messages or messages[0].get("status") != "COMPLETED":
+            return
+        message = messages[0]
+        recipient.status = "전송 완료" if message.get("statusName") == "success" else "전송 실패"
+        recipient.detail = message.get("statusMessage", "")
+
+@st.cache_resource
+def get_sms_dispatcher():
+    """프로세스 전체에서 공유하는 문자 발송기를 반환합니다."""
+    return SmsDispatcher()
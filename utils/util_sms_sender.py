@@ -6,10 +6,17 @@ import base64
 import time
 import random
 import string
+import threading
+from collections import deque, defaultdict
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 import streamlit as st
-from utils.utils_gsheet import update_sheet_add_row
+from utils.util_datastore import append_log
+from utils.util_config import get_setting
+from utils.util_tracing import traced
 
 # from dotenv import load_dotenv
 # load_dotenv()
@@ -18,27 +25,148 @@ from utils.utils_gsheet import update_sheet_add_row
 # NCP_SMS_SVC_ID = os.getenv("NCP_SMS_SVC_ID")
 # NCP_SMS_SENDER = os.getenv("NCP_SMS_SENDER")
 
-NCP_ACCESS_KEY = st.secrets["NCP_ACCESS_KEY"]
-NCP_SECRET_KEY = st.secrets["NCP_SECRET_KEY"]
-NCP_SMS_SVC_ID = st.secrets["NCP_SMS_SVC_ID"]
-NCP_SMS_SENDER = st.secrets["NCP_SMS_SENDER"]
+NCP_ACCESS_KEY = get_setting("NCP_ACCESS_KEY")
+NCP_SECRET_KEY = get_setting("NCP_SECRET_KEY")
+NCP_SMS_SVC_ID = get_setting("NCP_SMS_SVC_ID")
+NCP_SMS_SENDER = get_setting("NCP_SMS_SENDER")
+
+# 부하 테스트 시 tools/fake_services.py의 로컬 서버 주소로 지정
+SMS_API_BASE_URL = get_setting("SMS_API_BASE_URL", "https://sens.apigw.ntruss.com")
+SMS_CONNECT_TIMEOUT_SEC = 3
+SMS_READ_TIMEOUT_SEC = 10
+SMS_MAX_RETRIES = 2  # 연결 실패/요청 한도 초과(429)/서버 오류(5xx) 시 재시도 횟수
+SMS_BACKOFF_FACTOR = 0.5  # 재시도 대기 시간: 0.5초, 1초 ... (Retry-After 헤더가 있으면 SMS_BACKOFF_MAX_SEC 이내로 우선 적용)
+SMS_BACKOFF_MAX_SEC = 2
+SMS_RETRY_STATUS = [429, 500, 502, 503, 504]  # 조회(GET) 재시도 대상
+SMS_POST_RETRY_STATUS = [429, 503]  # 발송(POST) 재시도 대상: 요청이 처리되지 않은 것이 확실한 응답만 재시도
+SMS_POOL_SIZE = 10
+SMS_SIGNATURE_REUSE_SEC = 60  # 같은 서명을 재사용하는 시간 (NCP는 타임스탬프 기준 5분 이내 요청만 허용)
+SMS_LATENCY_WINDOW = 1000  # 지연 시간 통계에 사용하는 최근 호출 수
+SMS_BULK_MAX_RECIPIENTS = 100  # 1회 요청당 최대 수신자 수 (NCP SENS 제한)
+
+class _SmsRetry(Retry):
+    """
+    발송(POST)은 멱등하지 않으므로 SENS가 요청을 처리하지 않은 것이 확실한 경우(연결 실패, 429/503)에만 재시도
+    - 응답 대기 중 타임아웃(read)은 재시도하지 않음 (이미 접수되었을 수 있어 중복 문자가 발송될 수 있음)
+    - Retry-After 대기 시간은 SMS_BACKOFF_MAX_SEC 이내로 제한
+    """
 
-def make_signature(timestamp):
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method and method.upper() == "POST" and status_code not in SMS_POST_RETRY_STATUS:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, SMS_BACKOFF_MAX_SEC)
+
+def make_signature(timestamp, method="POST", uri=None):
     secret_key = bytes(NCP_SECRET_KEY, "UTF-8")
-    uri = f"/sms/v2/services/{NCP_SMS_SVC_ID}/messages"
-    message = f"POST {uri}\n{timestamp}\n{NCP_ACCESS_KEY}"
+    uri = uri or f"/sms/v2/services/{NCP_SMS_SVC_ID}/messages"
+    message = f"{method} {uri}\n{timestamp}\n{NCP_ACCESS_KEY}"
     message = bytes(message, "UTF-8")
     return base64.b64encode(hmac.new(secret_key, message, digestmod=hashlib.sha256).digest()) 
 
+class SmsClient:
+    """
+    NCP SENS API 클라이언트
+    - requests.Session의 연결 풀(keep-alive)을 재사용하여 매 발송마다 TLS 연결을 새로 맺지 않음
+    - 연결/응답 타임아웃을 적용하고, 연결 실패 또는 429/5xx 응답 시 지수 증가 대기 후 최대 SMS_MAX_RETRIES회 재시도
+      (발송 요청은 연결 실패/429/503만 재시도하며, 최악의 경우에도 연결 3회 + 응답 대기 1회 + 대기 약 3초 = 약 22초 이내)
+    - 서명은 SMS_SIGNATURE_REUSE_SEC 동안 재사용
+    - 호출별 지연 시간과 상태 코드를 기록
+    """
+
+    def __init__(self, base_url=SMS_API_BASE_URL):
+        self.base_url = base_url
+        retry = _SmsRetry(
+            total=SMS_MAX_RETRIES,
+            read=0,
+            backoff_factor=SMS_BACKOFF_FACTOR,
+            backoff_max=SMS_BACKOFF_MAX_SEC,
+            status_forcelist=SMS_RETRY_STATUS,
+            allowed_methods=["GET", "POST"],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SMS_POOL_SIZE, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._signatures = {}  # (method, uri) -> (timestamp, signature)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=SMS_LATENCY_WINDOW)
+        self._status_counts = defaultdict(int)
+        self.calls = 0
+        self.errors = 0
+
+    def _auth_headers(self, method, uri):
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            cached = self._signatures.get((method, uri))
+            if cached is None or now_ms - int(cached[0]) > SMS_SIGNATURE_REUSE_SEC * 1000:
+                # 결과 조회 URI는 메시지마다 달라 재사용되지 않으므로, 새 서명 저장 시 만료된 서명을 정리
+                expired_before = now_ms - SMS_SIGNATURE_REUSE_SEC * 1000
+                self._signatures = {key: value for key, value in self._signatures.items() if int(value[0]) >= expired_before}
+                timestamp = str(now_ms)
+                cached = (timestamp, make_signature(timestamp, method, uri))
+                self._signatures[(method, uri)] = cached
+        timestamp, signature = cached
+        return {
+            'Content-Type': 'application/json; charset=utf-8',
+            'x-ncp-apigw-timestamp': timestamp,
+            'x-ncp-iam-access-key': NCP_ACCESS_KEY,
+            'x-ncp-apigw-signature-v2': signature
+        }
+
+    @traced("sms.request")
+    def request(self, method, uri, body=None):
+        """API를 호출하고 응답(JSON)을 반환합니다. 응답이 JSON이 아닌 경우 statusCode만 담아 반환합니다."""
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = self.session.request(
+                method,
+                f"{self.base_url}{uri}",
+                headers=self._auth_headers(method, uri),
+                json=body,
+                timeout=(SMS_CONNECT_TIMEOUT_SEC, SMS_READ_TIMEOUT_SEC),
+            )
+            status = response.status_code
+            try:
+                return response.json()
+            except ValueError:
+                return {"statusCode": str(response.status_code), "statusName": response.text[:200]}
+        finally:
+            self._record(time.perf_counter() - start, status)
+
+    def _record(self, latency, status):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(status == "error" or status >= 400)
+            self._latencies.append(latency)
+            self._status_counts[status] += 1
+
+    def stats(self):
+        """호출 수, 오류 수, 상태 코드별 건수 및 최근 호출의 지연 시간(초) 통계를 반환합니다."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {"calls": self.calls, "errors": self.errors, "status_counts": dict(self._status_counts)}
+        if latencies:
+            stats.update({
+                "latency_avg": sum(latencies) / len(latencies),
+                "latency_p50": latencies[int(len(latencies) * 0.5)],
+                "latency_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "latency_max": latencies[-1],
+            })
+        return stats
+
+@st.cache_resource
+def get_sms_client():
+    """프로세스 전체에서 공유하는 SMS 클라이언트를 반환합니다."""
+    return SmsClient()
+
 def send_sms(date_partition, create_dt, phone_number, sms_type, sms_body):
-    timestamp = str(int(time.time() * 1000))
-    signature = make_signature(timestamp)
-    headers = {
-        'Content-Type': 'application/json; charset=utf-8',
-        'x-ncp-apigw-timestamp': timestamp,
-        'x-ncp-iam-access-key': NCP_ACCESS_KEY,
-        'x-ncp-apigw-signature-v2': signature
-    }
     body = {
         "type":'sms',
         "contentType":"COMM",
@@ -52,17 +180,40 @@ def send_sms(date_partition, create_dt, phone_number, sms_type, sms_body):
             }
         ]
     }
-    SMS_URL = f'https://sens.apigw.ntruss.com/sms/v2/services/{NCP_SMS_SVC_ID}/messages'
-    response = requests.post(SMS_URL, headers=headers, json=body)
-    result = response.json()
+    result = get_sms_client().request("POST", f"/sms/v2/services/{NCP_SMS_SVC_ID}/messages", body)
     if result.get('statusCode') == '202':
         try:
-            update_sheet_add_row("tbl_sms_log_incr", [date_partition, create_dt, phone_number, sms_type])
+            append_log("tbl_sms_log_incr", [date_partition, create_dt, phone_number, sms_type])
         except Exception as e:
             st.warning(f"⚠️ 문자 발송 내역 기록 중 오류 발생: {e}")
 
     return result
 
+def send_bulk_sms(sms_type, sms_body, phone_numbers):
+    """
+    같은 내용의 문자를 최대 SMS_BULK_MAX_RECIPIENTS명에게 1회 요청으로 발송합니다.
+    - 발송 내역(tbl_sms_log_incr)은 수신자별 결과를 확인한 호출자가 기록
+    """
+    if len(phone_numbers) > SMS_BULK_MAX_RECIPIENTS:
+        raise ValueError(f"Too many recipients: {len(phone_numbers)} > {SMS_BULK_MAX_RECIPIENTS}")
+    body = {
+        "type":'sms',
+        "contentType":"COMM",
+        "countryCode":'82',
+        "from":NCP_SMS_SENDER,
+        "content": sms_body,
+        "messages":[{"to": phone_number} for phone_number in phone_numbers]
+    }
+    return get_sms_client().request("POST", f"/sms/v2/services/{NCP_SMS_SVC_ID}/messages", body)
+
+def get_sms_request(request_id):
+    """발송 요청(requestId)에 포함된 수신자별 messageId 목록을 조회합니다."""
+    return get_sms_client().request("GET", f"/sms/v2/services/{NCP_SMS_SVC_ID}/messages?requestId={request_id}")
+
+def get_sms_result(message_id):
+    """메시지(messageId)의 전송 결과를 조회합니다."""
+    return get_sms_client().request("GET", f"/sms/v2/services/{NCP_SMS_SVC_ID}/messages/{message_id}")
+
 def generate_verification_code():
     """6자리 인증번호 생성"""
     return ''.join(random.choices(string.digits, k=6))
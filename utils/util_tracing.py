@@ -0,0 +1,233 @@
+import time
+import bisect
+import inspect
+import functools
+import threading
+import contextvars
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import streamlit as st
+
+from utils.util_config import get_setting
+
+# 구간(span)별 실행 시간 집계
+# - 비활성화 상태에서는 span()이 공유 no-op 객체를 반환하고, traced 함수는 플래그 확인 후 원래 함수를 바로 호출
+# - 활성화 상태에서는 구간 이름별 히스토그램(Prometheus 버킷)과 최근 실행 시간(백분위수 계산용)을 보관
+TRACING_ENABLED = get_setting("TRACING_ENABLED", False)
+TRACING_PROMETHEUS_PORT = get_setting("TRACING_PROMETHEUS_PORT")  # 지정 시 해당 포트의 /metrics 로 Prometheus 수집 지원
+# /metrics 는 인증 없이 제공되므로 기본적으로 로컬에서만 접근 가능 (외부 수집기 사용 시 "0.0.0.0" 등으로 지정)
+TRACING_PROMETHEUS_HOST = get_setting("TRACING_PROMETHEUS_HOST", "127.0.0.1")
+TRACING_BUCKETS_SEC = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+TRACING_LATENCY_WINDOW = 1000  # 백분위수 계산에 사용하는 구간별 최근 실행 수
+TRACING_RECENT_TRACES = 50  # 보관하는 최근 실행(하위 구간이 있는 최상위 구간) 수
+PROMETHEUS_METRIC_PREFIX = "basecamp"
+
+_enabled = bool(TRACING_ENABLED)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Histogram:
+    """구간 1개의 실행 횟수/합계/최대/오류 수, 버킷별 건수 및 최근 실행 시간"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self.buckets = [0] * (len(TRACING_BUCKETS_SEC) + 1)  # 마지막은 +Inf
+        self.recent = deque(maxlen=TRACING_LATENCY_WINDOW)
+
+    def observe(self, duration, error=False):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.errors += int(error)
+        self.buckets[bisect.bisect_left(TRACING_BUCKETS_SEC, duration)] += 1
+        self.recent.append(duration)
+
+    def summary(self):
+        recent = sorted(self.recent)
+
+        def percentile(q):
+            return recent[min(len(recent) - 1, int(len(recent) * q))] if recent else None
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_sec": self.total,
+            "avg_sec": self.total / self.count if self.count else None,
+            "p50_sec": percentile(0.50),
+            "p95_sec": percentile(0.95),
+            "p99_sec": percentile(0.99),
+            "max_sec": self.max,
+        }
+
+_histograms = {}  # 구간 이름 -> Histogram
+_recent_traces = deque(maxlen=TRACING_RECENT_TRACES)
+_lock = threading.Lock()
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class Span:
+    """실행 시간을 측정하는 구간. 같은 스레드/비동기 작업 안에서 중첩된 구간은 상위 구간의 하위 구간으로 기록"""
+
+    __slots__ = ("name", "start", "duration", "children", "_parent", "_token")
+
+    def __init__(self, name):
+        self.name = name
+        self.children = []
+        self.duration = None
+
+    def __enter__(self):
+        self._parent = _current_span.get()
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        # st.rerun()/st.stop() 등 흐름 제어용 예외(BaseException)는 오류로 집계하지 않음
+        error = exc_type is not None and issubclass(exc_type, Exception)
+        with _lock:
+            histogram = _histograms.get(self.name)
+            if histogram is None:
+                histogram = _histograms[self.name] = Histogram()
+            histogram.observe(self.duration, error)
+            if self._parent is None and self.children:
+                _recent_traces.append(self._trace())
+        if self._parent is not None:
+            self._parent.children.append(self)
+        return False
+
+    def _trace(self):
+        breakdown = {}
+        for child in self.children:
+            entry = breakdown.setdefault(child.name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += child.duration
+        return {
+            "name": self.name,
+            "finished_at": time.time(),
+            "duration_sec": self.duration,
+            "children": {name: {"count": count, "total_sec": total} for name, (count, total) in breakdown.items()},
+        }
+
+def span(name):
+    """with span("sheets.read"): ... 형식으로 구간의 실행 시간을 기록합니다."""
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name)
+
+def traced(name):
+    """함수(동기/비동기) 전체를 구간으로 기록하는 decorator"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                with Span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def is_tracing_enabled():
+    return _enabled
+
+def set_tracing_enabled(enabled):
+    """실행 중에 측정을 켜거나 끕니다. (프로세스 전체에 적용)"""
+    global _enabled
+    _enabled = bool(enabled)
+
+def reset_tracing():
+    with _lock:
+        _histograms.clear()
+        _recent_traces.clear()
+
+def get_span_stats():
+    """구간 이름별 실행 횟수/오류 수/합계/평균/p50/p95/p99/최대(초)를 반환합니다."""
+    with _lock:
+        return {name: histogram.summary() for name, histogram in sorted(_histograms.items())}
+
+def get_span_buckets(name):
+    """구간의 버킷 상한(초, 마지막은 None=+Inf)별 건수를 반환합니다."""
+    with _lock:
+        histogram = _histograms.get(name)
+        counts = list(histogram.buckets) if histogram else [0] * (len(TRACING_BUCKETS_SEC) + 1)
+    return list(zip(TRACING_BUCKETS_SEC + [None], counts))
+
+def get_recent_traces():
+    """최근 실행(하위 구간이 있는 최상위 구간)의 전체 시간과 하위 구간별 시간을 최신순으로 반환합니다."""
+    with _lock:
+        return list(reversed(_recent_traces))
+
+def export_prometheus():
+    """구간별 히스토그램을 Prometheus text exposition 형식으로 반환합니다."""
+    metric = f"{PROMETHEUS_METRIC_PREFIX}_span_duration_seconds"
+    errors_metric = f"{PROMETHEUS_METRIC_PREFIX}_span_errors_total"
+    lines = [
+        f"# HELP {metric} Duration of traced spans.",
+        f"# TYPE {metric} histogram",
+    ]
+    error_lines = [
+        f"# HELP {errors_metric} Traced spans that raised an exception.",
+        f"# TYPE {errors_metric} counter",
+    ]
+    with _lock:
+        for name, histogram in sorted(_histograms.items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(TRACING_BUCKETS_SEC + ["+Inf"], histogram.buckets):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{span="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {histogram.total}')
+            lines.append(f'{metric}_count{{span="{label}"}} {histogram.count}')
+            error_lines.append(f'{errors_metric}{{span="{label}"}} {histogram.errors}')
+    return "\n".join(lines + error_lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        payload = export_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+@st.cache_resource
+def get_prometheus_exporter():
+    """TRACING_PROMETHEUS_PORT가 지정된 경우 TRACING_PROMETHEUS_HOST에서 /metrics 를 제공하는 서버를 1회 실행합니다. (미지정 시 None)"""
+    if not TRACING_PROMETHEUS_PORT:
+        return None
+    try:
+        server = ThreadingHTTPServer((TRACING_PROMETHEUS_HOST, int(TRACING_PROMETHEUS_PORT)), _MetricsHandler)
+    except OSError as e:
+        print(f"Error: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="prometheus-exporter", daemon=True).start()
+    return server
@@ -0,0 +1,135 @@
+import time
+import threading
+from collections import Counter
+
+import pandas as pd
+import streamlit as st
+
+from utils.utils_gsheet import format_phone_number
+from utils.util_datastore import read_table
+from utils.util_partitioned_reader import normalize_partition
+
+ROLLUP_DIMENSIONS = ["date_partition", "phn_no", "access_type", "subject"]
+ROLLUP_REFRESH_SEC = 60  # 사용 이력 전체를 다시 집계하는 주기 (다른 프로세스/시트 직접 수정 분 반영)
+ROLLUP_PENDING_MAX_SEC = 60 * 10  # 이 시간이 지나도 시트에 나타나지 않는 record 분은 다시 집계할 때 제외
+
+class UsageRollup:
+    """
+    Agent 사용 이력(tbl_agent_usg_incr)의 일별 집계
+    - (날짜, 연락처, 권한 유형, 과목)별 사용 횟수와 비용 합계를 보관
+    - 사용 기록이 적재될 때마다 record로 즉시 갱신하고, 백그라운드 스레드가 ROLLUP_REFRESH_SEC마다 사용 이력 전체를 다시 집계
+      (다른 프로세스의 기록, 재시작 후 저널 재전송 분, 시트 직접 수정 분은 다시 집계할 때 반영)
+    - record 분 중 아직 시트에 반영되지 않은 기록(로그 버퍼 대기 중)은 다시 집계한 결과에 더해 유지
+    - 대시보드의 합계/추이/상위 사용자는 원본 이력 대신 집계 결과에서 계산
+    """
+
+    def __init__(self, refresh_sec=ROLLUP_REFRESH_SEC):
+        self.refresh_sec = refresh_sec
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._counts = {}  # (date_partition, phn_no, access_type, subject) -> [사용 횟수, 비용 합계]
+        self._pending = []  # record로 반영한 기록 [(식별 key, 집계 key, 비용, 기록 시각)] (시트에서 확인되면 제거)
+        self._frame = None  # 조회용 DataFrame (갱신 시 다시 생성)
+        self.rebuild()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="usage-rollup", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_sec):
+            try:
+                self.rebuild()
+            except Exception as e:
+                # 실패 시 기존 집계를 유지
+                print(f"Error: {e}")
+
+    def close(self):
+        """백그라운드 갱신을 중지합니다. (이후에는 rebuild를 직접 호출한 경우에만 갱신)"""
+        self._stop.set()
+
+    @staticmethod
+    def _identity(create_dt, phn_no, access_type, subject):
+        return (str(create_dt), format_phone_number(phn_no), access_type, subject)
+
+    def rebuild(self):
+        """사용 이력 전체를 다시 집계합니다."""
+        df = read_table("tbl_agent_usg_incr")
+        counts = {}
+        seen = Counter()
+        if not df.empty:
+            df = df.assign(
+                date_partition=df["date_partition"].map(normalize_partition),
+                phn_no=df["phn_no"].map(format_phone_number),
+                total_cost=pd.to_numeric(df["total_cost"], errors="coerce").fillna(0.0),
+            )
+            grouped = df.groupby(ROLLUP_DIMENSIONS, dropna=False)["total_cost"].agg(["count", "sum"])
+            counts = {key: [int(count), float(cost)] for key, (count, cost) in grouped.iterrows()}
+            seen = Counter(zip(df["create_dt"].astype(str), df["phn_no"], df["access_type"], df["subject"]))
+        now = time.time()
+        with self._lock:
+            # 조회 결과에 없는 record 분(로그 버퍼 대기 중, 조회 중에 기록된 분)은 다시 더함
+            pending = []
+            for identity, key, cost, recorded_at in self._pending:
+                if seen[identity] > 0:
+                    seen[identity] -= 1
+                elif now - recorded_at < ROLLUP_PENDING_MAX_SEC:
+                    entry = counts.setdefault(key, [0, 0.0])
+                    entry[0] += 1
+                    entry[1] += cost
+                    pending.append((identity, key, cost, recorded_at))
+            self._counts = counts
+            self._pending = pending
+            self._frame = None
+            self.loaded_at = now
+
+    def record(self, date_partition, create_dt, phn_no, access_type, subject, total_cost):
+        """사용 기록 1건을 집계에 반영합니다. (tbl_agent_usg_incr에 적재한 행과 같은 값)"""
+        key = (normalize_partition(date_partition), format_phone_number(phn_no), access_type, subject)
+        cost = float(total_cost or 0)
+        with self._lock:
+            entry = self._counts.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += cost
+            self._pending.append((self._identity(create_dt, phn_no, access_type, subject), key, cost, time.time()))
+            self._frame = None
+
+    def frame(self, start_date=None, end_date=None, phn_no=None, access_type=None):
+        """조건에 맞는 일별 집계(date_partition, phn_no, access_type, subject, count, total_cost)를 반환합니다."""
+        with self._lock:
+            if self._frame is None:
+                self._frame = pd.DataFrame(
+                    [[*key, count, cost] for key, (count, cost) in self._counts.items()],
+                    columns=ROLLUP_DIMENSIONS + ["count", "total_cost"],
+                )
+            df = self._frame
+        if start_date is not None:
+            df = df[df["date_partition"] >= normalize_partition(start_date)]
+        if end_date is not None:
+            df = df[df["date_partition"] <= normalize_partition(end_date)]
+        if phn_no is not None:
+            df = df[df["phn_no"] == format_phone_number(phn_no)]
+        if access_type is not None:
+            df = df[df["access_type"] == access_type]
+        return df
+
+    def totals(self, **filters):
+        df = self.frame(**filters)
+        return {"count": int(df["count"].sum()), "total_cost": float(df["total_cost"].sum())}
+
+    def daily(self, **filters):
+        """날짜별 사용 횟수/비용 합계"""
+        return self.frame(**filters).groupby("date_partition")[["count", "total_cost"]].sum().sort_index()
+
+    def by(self, dimension, **filters):
+        """과목/권한 유형 등 dimension별 사용 횟수/비용 합계"""
+        return self.frame(**filters).groupby(dimension)[["count", "total_cost"]].sum().sort_values("count", ascending=False)
+
+    def top_users(self, n=10, **filters):
+        """비용 합계 기준 상위 사용자"""
+        df = self.frame(**filters).groupby(["phn_no", "access_type"])[["count", "total_cost"]].sum()
+        return df.sort_values("total_cost", ascending=False).head(n).reset_index()
+
+@st.cache_resource
+def get_usage_rollup():
+    """프로세스 전체에서 공유하는 사용 이력 집계를 반환합니다."""
+    return UsageRollup()
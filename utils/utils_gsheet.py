@@ -1,7 +1,23 @@
+import time
+import threading
+from collections import defaultdict
+
+import pandas as pd
+import requests
 import streamlit as st
 from streamlit_gsheets import GSheetsConnection
 import gspread
 from google.oauth2.service_account import Credentials
+from google.auth.exceptions import RefreshError
+
+from utils.util_config import get_setting, get_secret_section
+from utils.util_tracing import span, traced
+
+# 구글 시트 API 주소 (부하 테스트 시 tools/fake_services.py의 로컬 서버 주소로 지정)
+# - 지정된 경우 서비스 계정 인증 없이 해당 주소로 요청하며, 조회도 GSheetsConnection 대신 gspread로 수행
+GSHEET_API_BASE_URL = get_setting("GSHEET_API_BASE_URL")
+GSHEET_API_HOSTS = ["https://sheets.googleapis.com", "https://www.googleapis.com"]
+PHONE_COLUMNS = ["phn_no", "author"]
 
 def format_phone_number(phone):
     try:
@@ -17,8 +33,100 @@ def format_phone_number(phone):
     except:
         return str(phone)
 
+def convert_sheet_types(df):
+    """시트 값(문자열)을 GSheetsConnection 조회 결과와 같은 타입으로 변환합니다."""
+    df = df.replace("", None)
+    for column in df.columns:
+        if column in PHONE_COLUMNS:
+            df[column] = df[column].apply(lambda x: format_phone_number(x) if pd.notna(x) else x)
+            continue
+        try:
+            df[column] = pd.to_numeric(df[column])
+        except (ValueError, TypeError):
+            pass
+    return df
+
+def get_connection_info(sheet_name):
+    """테이블의 시트 연결 정보를 반환합니다. 시트 API 주소가 지정된 경우 secrets에 없는 테이블도 로컬 시트로 연결합니다."""
+    connections = get_secret_section("connections")
+    if sheet_name in connections:
+        return connections[sheet_name]
+    if GSHEET_API_BASE_URL:
+        return {"client_email": "local", "spreadsheet": f"{GSHEET_API_BASE_URL}/spreadsheets/d/{sheet_name}"}
+    raise KeyError(f"No sheet connection: {sheet_name}")
+
+def has_sheet_connection(sheet_name):
+    return bool(GSHEET_API_BASE_URL) or sheet_name in get_secret_section("connections")
+
+# 세션 간 공유하는 시트 조회 캐시 (테이블별 TTL)
+# - 이 모듈을 통해 시트에 쓰는 경우 해당 테이블의 버전을 올려 캐시를 즉시 무효화
+READ_CACHE_TTL_SEC = {
+    "tbl_mbr_req_incr": 60,
+    "tbl_mbr_access_chg_incr": 60,
+    "tbl_mbr_login_incr": 30,
+    "tbl_agent_usg_incr": 30,
+    "tbl_sms_log_incr": 30,
+}
+READ_CACHE_DEFAULT_TTL_SEC = 30
+
+_read_cache = {}  # sheet_name -> {"df", "loaded_at", "version"}
+_read_cache_versions = defaultdict(int)
+_read_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_read_cache_lock = threading.Lock()
+
 def read_sheet_by_df(sheet_name):
-    """구글 시트의 데이터를 읽어옵니다."""
+    """구글 시트의 데이터를 읽어옵니다. (테이블별 TTL 동안 캐시된 데이터를 공유)"""
+    now = time.time()
+    ttl = READ_CACHE_TTL_SEC.get(sheet_name, READ_CACHE_DEFAULT_TTL_SEC)
+    with _read_cache_lock:
+        entry = _read_cache.get(sheet_name)
+        if entry is not None and now - entry["loaded_at"] < ttl and entry["version"] == _read_cache_versions[sheet_name]:
+            _read_cache_stats["hits"] += 1
+            return entry["df"].copy()
+        _read_cache_stats["misses"] += 1
+        version = _read_cache_versions[sheet_name]
+
+    df = _load_sheet_df(sheet_name)
+    with _read_cache_lock:
+        # 조회 중 쓰기가 발생한 경우 이전 버전의 데이터는 캐시하지 않음
+        if version == _read_cache_versions[sheet_name]:
+            _read_cache[sheet_name] = {"df": df, "loaded_at": now, "version": version}
+    return df.copy()
+
+def invalidate_sheet_cache(sheet_name):
+    """테이블의 버전을 올리고 캐시된 데이터를 제거합니다."""
+    with _read_cache_lock:
+        _read_cache_versions[sheet_name] += 1
+        _read_cache.pop(sheet_name, None)
+        _read_cache_stats["invalidations"] += 1
+
+def get_sheet_version(sheet_name):
+    with _read_cache_lock:
+        return _read_cache_versions[sheet_name]
+
+def get_read_cache_stats():
+    """조회 캐시 적중/미적중/무효화 횟수와 테이블별 버전 및 캐시 경과 시간을 반환합니다."""
+    now = time.time()
+    with _read_cache_lock:
+        total = _read_cache_stats["hits"] + _read_cache_stats["misses"]
+        return {
+            **_read_cache_stats,
+            "hit_rate": _read_cache_stats["hits"] / total if total else 0.0,
+            "tables": {
+                sheet_name: {
+                    "version": _read_cache_versions[sheet_name],
+                    "age_sec": now - entry["loaded_at"],
+                    "rows": len(entry["df"]),
+                }
+                for sheet_name, entry in _read_cache.items()
+            },
+        }
+
+@traced("sheets.read")
+def _load_sheet_df(sheet_name):
+    if GSHEET_API_BASE_URL:
+        values = with_worksheet(sheet_name, lambda worksheet: worksheet.get_values())
+        return convert_sheet_types(pd.DataFrame(values[1:], columns=values[0] if values else []))
     conn = st.connection(sheet_name, type=GSheetsConnection, ttl=0)
     df = conn.read(worksheet=sheet_name, ttl=0)
     if 'phn_no' in df.columns:
@@ -27,141 +135,173 @@ def read_sheet_by_df(sheet_name):
         df['author'] = df['author'].apply(format_phone_number)
     return df
 
-def is_registered_user(phone_number, access_type):
-    """등록된 사용자인지 확인 - 구글 스프레드시트에서 권한활성여부가 '활성'인 사용자만 확인"""
-    try:
-        clean_phone = phone_number.replace('-', '').replace(' ', '')
+# 프로세스 전체에서 공유하는 gspread 핸들 캐시
+# - 클라이언트는 서비스 계정별로 1회만 인증하며, 액세스 토큰 만료 시 google-auth 세션이 자동 갱신
+# - 인증 오류 발생 시 캐시를 비우고 다시 인증
+_client_cache = {}  # client_email -> gspread.Client
+_worksheet_cache = {}  # sheet_name -> gspread.Worksheet
+_handle_lock = threading.Lock()
 
-        df = read_sheet_by_df("tbl_mbr_req_incr")        
-        df['phn_no'] = df['phn_no'].apply(format_phone_number)
+AUTH_ERROR_STATUS_CODES = [401, 403]
 
-        if access_type == 'admin':
-            cond_access = df['access_type']=='관리자'
-        else:
-            cond_access = df['access_type']=='일반(학생)'
-
-        active_phones = ['0'+str(int(x)) for x in df[(df['status']=='활성') & (cond_access)]['phn_no'].unique().tolist()]
-        waiting_phones = ['0'+str(int(x)) for x in df[(df['status']=='대기') & (cond_access)]['phn_no'].unique().tolist()]
-        inactive_phones = ['0'+str(int(x)) for x in df[(df['status']=='비활성') & (cond_access)]['phn_no'].unique().tolist()]
-
-        if clean_phone in active_phones:
-            return 'active'
-        elif clean_phone in waiting_phones:
-            return 'waiting'
-        elif clean_phone in inactive_phones:
-            return 'inactive'
-        else:
-            return 'not_found'
-    except Exception as e:
-        return 'not_found'
+class _EndpointSession(requests.Session):
+    """구글 API 주소를 GSHEET_API_BASE_URL로 바꿔서 요청하는 세션"""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, url, *args, **kwargs):
+        for host in GSHEET_API_HOSTS:
+            if url.startswith(host):
+                url = self.base_url + url[len(host):]
+                break
+        return super().request(method, url, *args, **kwargs)
+
+def _get_client(connection_info):
+    client_email = connection_info["client_email"]
+    if client_email not in _client_cache and GSHEET_API_BASE_URL:
+        _client_cache[client_email] = gspread.Client(auth=None, session=_EndpointSession(GSHEET_API_BASE_URL))
+    if client_email not in _client_cache:
+        service_account_info = {
+            "type": connection_info["type"],
+            "project_id": connection_info["project_id"],
+            "private_key_id": connection_info["private_key_id"],
+            "private_key": connection_info["private_key"],
+            "client_email": connection_info["client_email"],
+            "client_id": connection_info["client_id"],
+            "auth_uri": connection_info["auth_uri"],
+            "token_uri": connection_info["token_uri"],
+            "auth_provider_x509_cert_url": connection_info["auth_provider_x509_cert_url"],
+            "client_x509_cert_url": connection_info["client_x509_cert_url"]
+        }
+        scope = [
+            "https://spreadsheets.google.com/feeds",
+            "https://www.googleapis.com/auth/drive",
+        ]
+        credentials = Credentials.from_service_account_info(
+            service_account_info, 
+            scopes=scope
+        )
+        _client_cache[client_email] = gspread.authorize(credentials)
+    return _client_cache[client_email]
 
 def get_worksheet(sheet_name):
-    connection_info = st.secrets["connections"][sheet_name]
-    service_account_info = {
-        "type": connection_info["type"],
-        "project_id": connection_info["project_id"],
-        "private_key_id": connection_info["private_key_id"],
-        "private_key": connection_info["private_key"],
-        "client_email": connection_info["client_email"],
-        "client_id": connection_info["client_id"],
-        "auth_uri": connection_info["auth_uri"],
-        "token_uri": connection_info["token_uri"],
-        "auth_provider_x509_cert_url": connection_info["auth_provider_x509_cert_url"],
-        "client_x509_cert_url": connection_info["client_x509_cert_url"]
-    }
-    scope = [
-        "https://spreadsheets.google.com/feeds",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    credentials = Credentials.from_service_account_info(
-        service_account_info, 
-        scopes=scope
-    )
-    gc = gspread.authorize(credentials)
-
-    spreadsheet_url = connection_info["spreadsheet"]
-    spreadsheet = gc.open_by_url(spreadsheet_url)
-    worksheet = spreadsheet.worksheet(sheet_name)
-    return worksheet
+    """캐시된 워크시트 핸들을 반환합니다. 없으면 인증 후 시트를 열어 캐시에 저장합니다."""
+    with _handle_lock:
+        if sheet_name not in _worksheet_cache:
+            connection_info = get_connection_info(sheet_name)
+            gc = _get_client(connection_info)
+            spreadsheet_url = connection_info["spreadsheet"]
+            spreadsheet = gc.open_by_url(spreadsheet_url)
+            _worksheet_cache[sheet_name] = spreadsheet.worksheet(sheet_name)
+        return _worksheet_cache[sheet_name]
+
+def invalidate_worksheet(sheet_name):
+    """인증 오류 등으로 더 이상 유효하지 않은 핸들을 캐시에서 제거합니다."""
+    with _handle_lock:
+        _worksheet_cache.pop(sheet_name, None)
+        client_email = get_connection_info(sheet_name)["client_email"]
+        _client_cache.pop(client_email, None)
+
+def _is_auth_error(e):
+    if isinstance(e, RefreshError):
+        return True
+    if isinstance(e, gspread.exceptions.APIError):
+        return getattr(e.response, "status_code", None) in AUTH_ERROR_STATUS_CODES
+    return False
+
+def with_worksheet(sheet_name, func):
+    """워크시트 작업을 실행합니다. 인증 오류 시 핸들을 다시 만들어 1회 재시도합니다."""
+    try:
+        return func(get_worksheet(sheet_name))
+    except Exception as e:
+        if not _is_auth_error(e):
+            raise
+        invalidate_worksheet(sheet_name)
+        return func(get_worksheet(sheet_name))
 
 def update_sheet_add_row(sheet_name, new_row:list):
     """구글 시트에 새로운 행을 추가합니다."""
     try:
-        worksheet = get_worksheet(sheet_name)
-        worksheet.append_row(new_row)
+        with span("sheets.append"):
+            with_worksheet(sheet_name, lambda worksheet: worksheet.append_row(new_row))
+        invalidate_sheet_cache(sheet_name)
         return True
     except Exception as e:
         st.error(f"❌ 행 추가 중 오류: {e}")
         return False
 
+@traced("sheets.append")
+def append_sheet_rows(sheet_name, rows):
+    """구글 시트에 여러 행을 한 번에 추가합니다. (백그라운드 적재용으로 오류는 호출자에게 전달)"""
+    with_worksheet(sheet_name, lambda worksheet: worksheet.append_rows(rows))
+    invalidate_sheet_cache(sheet_name)
+
+def find_changed_cells(original_df, updated_df):
+    """req_id 기준으로 원본 대비 값이 변경된 셀 목록을 반환합니다."""
+    changed_rows = []
+    
+    # 원본 데이터프레임의 인덱스를 req_id로 설정
+    original_df_indexed = original_df.set_index('req_id')
+    
+    for _, updated_row in updated_df.iterrows():
+        req_id = updated_row.get('req_id')
+        if req_id is not None and req_id in original_df_indexed.index:
+            original_row = original_df_indexed.loc[req_id]
+            
+            # 변경사항이 있는지 확인
+            for col in updated_df.columns:
+                if col in original_df.columns and col != 'req_id':
+                    if str(updated_row[col]) != str(original_row[col]):
+                        changed_rows.append({
+                            'req_id': req_id,
+                            'column': col,
+                            'old_value': original_row[col],
+                            'new_value': updated_row[col]
+                        })
+    return changed_rows
+
 def update_sheet_specific_rows(sheet_name, original_df, updated_df):
-    """구글 시트의 변경된 행만 업데이트합니다."""
+    """구글 시트의 변경된 행만 업데이트합니다. (시트 1회 조회 + 1회 일괄 업데이트)"""
     try:
-        worksheet = get_worksheet(sheet_name)
-        
         # 변경된 행 찾기
-        changed_rows = []
-        
-        # 원본 데이터프레임의 인덱스를 req_id로 설정
-        original_df_indexed = original_df.set_index('req_id')
-        
-        for _, updated_row in updated_df.iterrows():
-            req_id = updated_row.get('req_id')
-            if req_id is not None and req_id in original_df_indexed.index:
-                original_row = original_df_indexed.loc[req_id]
-                
-                # 변경사항이 있는지 확인
-                for col in updated_df.columns:
-                    if col in original_df.columns and col != 'req_id':
-                        if str(updated_row[col]) != str(original_row[col]):
-                            changed_rows.append({
-                                'req_id': req_id,
-                                'column': col,
-                                'old_value': original_row[col],
-                                'new_value': updated_row[col]
-                            })
-        
-        # 변경된 행들만 업데이트
-        updated_count = 0
-        for change in changed_rows:
-            try:
-                # req_id로 행 번호 찾기
-                all_data = worksheet.get_all_values()
-                headers = all_data[0]
-                
-                # req_id 컬럼 인덱스 찾기
-                req_id_col_idx = None
-                for i, header in enumerate(headers):
-                    if header == 'req_id':
-                        req_id_col_idx = i
-                        break
-                
-                if req_id_col_idx is not None:
-                    # req_id가 일치하는 행 찾기
-                    row_idx = None
-                    for i, row in enumerate(all_data[1:], start=2):  # 2부터 시작 (헤더 제외)
-                        if len(row) > req_id_col_idx and str(row[req_id_col_idx]) == str(change['req_id']):
-                            row_idx = i
-                            break
-                    
-                    if row_idx is not None:
-                        # 변경할 컬럼의 인덱스 찾기
-                        col_idx = None
-                        for i, header in enumerate(headers):
-                            if header == change['column']:
-                                col_idx = i
-                                break
-                        
-                        if col_idx is not None:
-                            # 셀 업데이트 (예: A2, B3 등)
-                            cell_address = f"{chr(65 + col_idx)}{row_idx}"  # A=65, B=66, ...
-                            worksheet.update(cell_address, str(change['new_value']))
-                            updated_count += 1
-                            
-            except Exception as e:
-                st.error(f"❌ 행 업데이트 중 오류 (req_id: {change['req_id']}): {e}")
-                continue
+        changed_rows = find_changed_cells(original_df, updated_df)
         
+        if not changed_rows:
+            return True, 0
+
+        def apply_changes(worksheet):
+            # 시트 전체를 1회만 조회하여 req_id → 행 번호, 컬럼명 → 열 번호 인덱스 생성
+            all_data = worksheet.get_all_values()
+            headers = all_data[0] if all_data else []
+            col_index = {header: i + 1 for i, header in enumerate(headers)}
+            req_id_col = col_index.get('req_id')
+            if req_id_col is None:
+                return 0
+            row_index = {}
+            for i, row in enumerate(all_data[1:], start=2):  # 2부터 시작 (헤더 제외)
+                if len(row) >= req_id_col:
+                    row_index.setdefault(str(row[req_id_col - 1]), i)
+
+            # 변경된 셀 전체를 1회의 batch_update로 반영 (예: A2, AB3 등)
+            updates = []
+            for change in changed_rows:
+                row_idx = row_index.get(str(change['req_id']))
+                col_idx = col_index.get(change['column'])
+                if row_idx is None or col_idx is None:
+                    continue
+                updates.append({
+                    'range': gspread.utils.rowcol_to_a1(row_idx, col_idx),
+                    'values': [[str(change['new_value'])]],
+                })
+            if updates:
+                worksheet.batch_update(updates)
+            return len(updates)
+
+        with span("sheets.update"):
+            updated_count = with_worksheet(sheet_name, apply_changes)
+        invalidate_sheet_cache(sheet_name)
         return True, updated_count
         
     except ImportError:
@@ -169,5 +309,7 @@ def update_sheet_specific_rows(sheet_name, original_df, updated_df):
         st.info("pip install gspread google-auth를 실행해주세요.")
         return False, 0
     except Exception as e:
+        if _is_auth_error(e):
+            invalidate_worksheet(sheet_name)
         st.error(f"❌ 시트 업데이트 중 오류: {e}")
         return False, 0
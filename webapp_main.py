@@ -5,6 +5,8 @@
 import streamlit as st
 import pandas as pd
 import time
+import uuid
+import datetime
 import base64
 import json
 # import gspread
@@ -14,9 +16,24 @@ from streamlit_option_menu import option_menu
 
 from pages.page_phone_input import page_phone_input
 from pages.page_verification import page_verification
-from utils.utils_gsheet import read_sheet_by_df, update_sheet_add_row, update_sheet_specific_rows
-from utils.util_quiz_agent import quiz_analyzer_english, quiz_analyzer_science
-from utils.util_sms_sender import send_sms
+from utils.util_datastore import read_table, query_table, iter_table_chunks, add_rows, append_log, update_rows
+from utils.util_member_index import get_member_index
+from utils.util_usage_rollup import get_usage_rollup
+from utils.util_quiz_agent import ANALYZERS, get_schema_version
+from utils.util_analysis_job import get_analysis_runner, ANALYSIS_POLL_INTERVAL_SEC, BATCH_MAX_ITEMS
+from utils.util_result_cache import get_result_cache, make_cache_key
+from utils.util_image_hash import phash
+from utils.util_image_preprocess import preprocess_image
+from utils.util_sms_dispatcher import get_sms_dispatcher, SmsRecipient
+from utils.util_sms_sender import get_sms_client
+from utils.util_quiz_agent import get_parse_stats
+from utils.utils_gsheet import get_read_cache_stats
+from utils.util_partitioned_reader import get_partitioned_reader
+from utils.util_log_writer import get_log_writer
+from utils.util_tracing import (
+    span, is_tracing_enabled, set_tracing_enabled, reset_tracing, get_span_stats, get_span_buckets, get_recent_traces,
+    export_prometheus, get_prometheus_exporter
+)
 
 # from dotenv import load_dotenv
 # load_dotenv()
@@ -28,6 +45,10 @@ DEVELOPER_EMAIL = st.secrets["DEVELOPER_EMAIL"]
 # os.environ["STREAMLIT_BROWSER_GATHER_USAGE_STATS"] = "false"
 
 WEBAPP_NAME = "BASECAMP Agent"
+ROWS_PER_PAGE = 50  # 이력 조회 시 페이지당 행 수
+LOG_VIEWER_DEFAULT_DAYS = 30  # 이력 조회 기본 기간 (일)
+EXPORT_MAX_ROWS = 100000  # CSV 다운로드 최대 행 수 (파일 전체가 메모리에 생성되므로 상한을 둠)
+ACCESS_TYPES = ["관리자", "일반(학생)"]
 
 # # 환경 변수를 확인하여 무한 실행 방지
 # if "RUNNING_STREAMLIT" not in os.environ:
@@ -35,9 +56,316 @@ WEBAPP_NAME = "BASECAMP Agent"
 #     subprocess.Popen([sys.executable, "-m", "streamlit", "run", sys.argv[0]], close_fds=True)
 #     sys.exit(0)
 
+@st.fragment(run_every=ANALYSIS_POLL_INTERVAL_SEC)
+def render_analysis_progress(tab_name):
+    """분석 작업의 진행 상황(스트리밍 중인 해설 포함)을 주기적으로 표시하고, 완료되면 화면 전체를 갱신합니다."""
+    job = get_analysis_runner().get(st.session_state.get(f"analysis_job_{tab_name}"))
+    if job is None or job.done():
+        st.rerun()
+    st.info(f"⏳ 문제를 분석하고 있습니다... ({job.elapsed:.0f}초 경과)")
+    st.markdown("##### 분석 결과 예시")
+    st.markdown(":red-background[1. 정답]")
+    st.divider()
+    st.markdown(":red-background[2. 해설]")
+    if job.partial_description:
+        st.markdown(job.partial_description + " ▌")
+    st.divider()
+    st.markdown(":red-background[3. 키워드]")
+
+def log_agent_usage(subject, total_cost, run_id):
+    """Agent 사용 기록을 업로드합니다. (백그라운드에서 일괄 반영, 분석 1건(run_id)당 1회만 기록)"""
+    create_dt = time.strftime("%Y%m%d %H:%M:%S", time.localtime())
+    date_partition = create_dt.split(" ")[0]
+    phn_no = st.session_state.get("phone_number", "")
+    admin_mode = st.session_state.get("admin_mode", False)
+    if admin_mode:
+        access_type = "관리자"
+    else:
+        access_type = "일반(학생)"
+    agent_type = "quiz_analyzer"
+    # 집계를 먼저 생성해 두어야 최초 집계와 이번 기록이 중복 반영되지 않음
+    usage_rollup = get_usage_rollup()
+    if append_log("tbl_agent_usg_incr", [date_partition, create_dt, phn_no, access_type, subject, agent_type, total_cost], dedupe_key=run_id):
+        usage_rollup.record(date_partition, create_dt, phn_no, access_type, subject, total_cost)
+
+def render_log_viewer(table, column_mapping, key, filter_options=None, fixed_filters=None):
+    """
+    로그성 테이블을 페이지 단위로 조회하여 표시합니다.
+    - 기간/필터/정렬/페이지 처리는 저장소에서 수행하며, 화면에는 현재 페이지의 행만 전달
+    - filter_options: {컬럼: 선택지 목록} (화면에서 선택), fixed_filters: {컬럼: 값} (항상 적용)
+    - column_mapping: 표시할 컬럼과 한글 컬럼명 ('name'은 회원 색인에서 연락처로 매핑)
+    """
+    today = datetime.date.today()
+
+    def reset_page():
+        # 조회 조건이 바뀌면 이전 페이지 번호가 결과 범위를 벗어날 수 있으므로 첫 페이지로 이동
+        st.session_state[f"{key}_page"] = 1
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        date_range = st.date_input(
+            "기간",
+            value=(today - datetime.timedelta(days=LOG_VIEWER_DEFAULT_DAYS), today),
+            key=f"{key}_date_range",
+            on_change=reset_page
+        )
+    sortable_columns = [column for column in column_mapping if column != 'name']
+    with col2:
+        sort_by = st.selectbox(
+            "정렬 기준",
+            sortable_columns,
+            index=sortable_columns.index('create_dt') if 'create_dt' in sortable_columns else 0,
+            format_func=column_mapping.get,
+            key=f"{key}_sort_by"
+        )
+    with col3:
+        sort_order = st.segmented_control("정렬 순서", ["최신순", "오래된순"], default="최신순", key=f"{key}_sort_order")
+    ascending = sort_order == "오래된순"
+    start_date = date_range[0] if len(date_range) > 0 else None
+    end_date = date_range[1] if len(date_range) > 1 else start_date
+
+    filters = dict(fixed_filters or {})
+    filter_columns = list((filter_options or {}).items())
+    if 'phn_no' in column_mapping and 'phn_no' not in filters:
+        filter_columns.append(('phn_no', None))
+    if filter_columns:
+        for (column, options), col in zip(filter_columns, st.columns(len(filter_columns))):
+            with col:
+                if options is None:
+                    value = st.text_input(column_mapping[column], placeholder="01012345678", key=f"{key}_filter_{column}", on_change=reset_page)
+                    value = value.replace('-', '').replace(' ', '')
+                else:
+                    value = st.selectbox(column_mapping[column], ["전체"] + list(options), key=f"{key}_filter_{column}", on_change=reset_page)
+                    value = "" if value == "전체" else value
+                if value:
+                    filters[column] = value
+
+    # 현재 페이지만 조회하며, 조건 변경으로 페이지 수가 줄어든 경우 마지막 페이지로 이동
+    page = st.session_state.get(f"{key}_page", 1)
+    df_page, total = query_table(table, start_date, end_date, filters, sort_by, ascending, (page - 1) * ROWS_PER_PAGE, ROWS_PER_PAGE)
+    total_pages = max(1, -(-total // ROWS_PER_PAGE))
+    if page > total_pages:
+        page = total_pages
+        st.session_state[f"{key}_page"] = page
+        df_page, total = query_table(table, start_date, end_date, filters, sort_by, ascending, (page - 1) * ROWS_PER_PAGE, ROWS_PER_PAGE)
+
+    if total == 0:
+        st.info("조회 조건에 맞는 데이터가 없습니다.")
+        return
+
+    member_names = get_member_index().names()
+    columns = list(column_mapping)
+
+    def to_display(df):
+        if 'name' in column_mapping:
+            df = df.assign(name=df['phn_no'].map(member_names))
+        return df[columns].rename(columns=column_mapping)
+
+    st.dataframe(to_display(df_page), use_container_width=True, hide_index=True)
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.number_input("페이지", min_value=1, max_value=total_pages, key=f"{key}_page", label_visibility="collapsed")
+    with col2:
+        start = (page - 1) * ROWS_PER_PAGE
+        st.caption(f"전체 {total:,}건 중 {start + 1:,}~{start + len(df_page):,}건 (페이지 {page}/{total_pages})")
+        if total > EXPORT_MAX_ROWS:
+            st.caption(f"CSV 다운로드는 정렬 기준 상위 {EXPORT_MAX_ROWS:,}건까지만 포함됩니다. 기간/조건을 좁혀 주세요.")
+    with col3:
+        def export_csv():
+            # 다운로드 클릭 시(스크립트 스레드) 조건에 맞는 행을 EXPORT_CHUNK_ROWS 단위로 조회하여 최대 EXPORT_MAX_ROWS건으로 생성
+            parts = []
+            remaining = EXPORT_MAX_ROWS
+            for chunk in iter_table_chunks(table, start_date, end_date, filters, sort_by, ascending):
+                chunk = chunk.iloc[:remaining]
+                parts.append(to_display(chunk).to_csv(index=False, header=not parts))
+                remaining -= len(chunk)
+                if remaining <= 0:
+                    break
+            return "".join(parts).encode("utf-8-sig")
+
+        st.download_button(
+            "CSV 다운로드",
+            data=export_csv,
+            file_name=f"{table}_{start_date:%Y%m%d}_{end_date:%Y%m%d}.csv" if start_date else f"{table}.csv",
+            mime="text/csv",
+            key=f"{key}_download",
+            use_container_width=True,
+        )
+
+def render_usage_summary(usage_rollup, **filters):
+    """사용 이력 집계로 합계, 일별 추이, 과목별 사용 현황을 표시합니다."""
+    totals = usage_rollup.totals(**filters)
+    col1, col2 = st.columns(2)
+    col1.metric("사용 횟수", f"{totals['count']:,}회")
+    col2.metric("발생 비용", f"{totals['total_cost']:,.0f}원")
+    if totals['count'] == 0:
+        return
+    st.markdown("##### 일별 사용 추이")
+    st.bar_chart(usage_rollup.daily(**filters)[['count']].rename(columns={'count': '사용 횟수'}))
+    st.markdown("##### 과목별 사용 현황")
+    df_subject = usage_rollup.by('subject', **filters).rename(columns={'count': '사용 횟수', 'total_cost': '발생 비용'})
+    df_subject.index.name = '과목'
+    st.dataframe(df_subject, use_container_width=True)
+
+@st.fragment(run_every=ANALYSIS_POLL_INTERVAL_SEC)
+def render_batch_progress(tab_name):
+    """일괄 분석의 문항별 진행 상황을 주기적으로 표시하고, 완료되면 화면 전체를 갱신합니다."""
+    batch = get_analysis_runner().get(st.session_state.get(f"batch_job_{tab_name}"))
+    if batch is None or batch.done():
+        st.rerun()
+    if batch.splitting:
+        st.info(f"⏳ 페이지를 문제 단위로 분할하고 있습니다... ({batch.elapsed:.0f}초 경과)")
+        return
+    completed, total = batch.progress()
+    st.progress(completed / total, text=f"⏳ {completed}/{total}개 문제 분석 완료 ({batch.elapsed:.0f}초 경과)")
+    df_progress = pd.DataFrame([
+        {'순서': item.index + 1, '파일명': item.name, '상태': item.status, '시도 횟수': item.attempts}
+        for item in batch.items
+    ])
+    st.dataframe(df_progress, use_container_width=True, hide_index=True)
+
+def render_sms_dispatch_table(dispatch):
+    df_dispatch = pd.DataFrame([
+        {'요청ID': recipient.meta.get('req_id'), '연락처': recipient.phone_number, '문자 유형': recipient.sms_type, '상태': recipient.status, '상세': recipient.detail}
+        for recipient in dispatch.recipients
+    ])
+    st.dataframe(df_dispatch, use_container_width=True, hide_index=True)
+
+@st.fragment(run_every=1)
+def render_sms_dispatch_progress():
+    """문자 발송 진행 상황을 주기적으로 표시하고, 발송이 끝나면 화면 전체를 갱신합니다."""
+    dispatch = get_sms_dispatcher().get(st.session_state.get("sms_dispatch_job"))
+    if dispatch is None or (dispatch.done and not dispatch.checking):
+        st.rerun()
+    completed, total = dispatch.progress()
+    if dispatch.done:
+        st.info("⏳ 문자 전송 결과를 확인하고 있습니다...")
+    else:
+        st.progress(completed / total, text=f"⏳ 권한 변경 안내 문자 발송 중 ({completed}/{total}명)")
+    render_sms_dispatch_table(dispatch)
+
+def render_sms_dispatch_status():
+    """권한 변경 안내 문자의 수신자별 발송/전송 결과를 표시합니다."""
+    dispatcher = get_sms_dispatcher()
+    dispatch = dispatcher.get(st.session_state.get("sms_dispatch_job"))
+    if dispatch is None:
+        return
+    st.markdown("##### 권한 변경 안내 문자 발송 현황")
+    if not dispatch.done or dispatch.checking:
+        render_sms_dispatch_progress()
+        return
+    failed_count = sum(recipient.status in ["요청 실패", "전송 실패"] for recipient in dispatch.recipients)
+    st.caption(f"총 {len(dispatch.recipients)}명 중 {failed_count}명 발송 실패")
+    render_sms_dispatch_table(dispatch)
+    if st.button("전송 결과 새로고침", key="sms_dispatch_refresh"):
+        dispatcher.refresh_delivery(dispatch.job_id)
+        st.rerun()
+
+def render_quiz_batch_analyzer(tab_name):
+    """여러 문제(이미지)를 한 번에 업로드하여 병렬로 분석합니다."""
+    col1, col2 = st.columns([1, 1], gap="large")
+    runner = get_analysis_runner()
+    batch_key = f"batch_job_{tab_name}"
+    batch_in_progress = False
+
+    with col1:
+        st.subheader("1단계: 문제 선택")
+        uploaded_images = st.file_uploader(
+            f"분석 대상 이미지를 모두 업로드하세요. (최대 {BATCH_MAX_ITEMS}개)",
+            type=['png', 'jpg', 'jpeg'],
+            accept_multiple_files=True,
+            key=f"batch_file_uploader_{tab_name}"
+        )
+
+        if uploaded_images:
+            st.divider()
+            st.subheader("2단계: 문제 확인 및 분석 시작")
+            if len(uploaded_images) > BATCH_MAX_ITEMS:
+                st.warning(f"⚠️ 최대 {BATCH_MAX_ITEMS}개까지 분석 가능합니다. 업로드 순서 기준 {BATCH_MAX_ITEMS}개만 분석합니다.")
+            else:
+                st.caption(f"{len(uploaded_images)}개 문제가 업로드되었습니다.")
+
+            split_pages = st.checkbox(
+                "한 장에 여러 문제가 있는 시험지 (문제별로 분할하여 분석)",
+                key=f"batch_split_pages_{tab_name}",
+                disabled=bool(st.session_state.get(batch_key))
+            )
+
+            if not st.session_state.get(batch_key):
+                if st.button("일괄 분석 시작", type="primary", use_container_width=True, key=f"start_batch_analyze_{tab_name}"):
+                    images = [(uploaded_image.name, uploaded_image.getvalue()) for uploaded_image in uploaded_images]
+                    st.session_state[batch_key] = runner.submit_batch(tab_name, images, split_pages)
+                    st.session_state[f"batch_result_{tab_name}"] = None
+                    st.rerun()
+            else:
+                if st.button("분석 중단", type="secondary", use_container_width=True, key=f"stop_batch_analyze_{tab_name}"):
+                    runner.cancel(st.session_state.pop(batch_key))
+                    st.info("분석이 중단되었습니다.")
+                    st.rerun()
+            st.divider()
+
+    if st.session_state.get(batch_key):
+        batch = runner.get(st.session_state[batch_key])
+        if batch is None:
+            del st.session_state[batch_key]
+            st.error("❌ 문제 분석 중 오류가 발생했습니다. 다시 시도해주세요.")
+        elif not batch.done():
+            batch_in_progress = True
+        else:
+            runner.pop(batch.job_id)
+            del st.session_state[batch_key]
+            # 업로드 순서대로 결과 저장
+            batch_result = []
+            for item in batch.items:
+                response = item.response or {}
+                batch_result.append({
+                    'name': item.name,
+                    'answer': response.get('answer', ''),
+                    'description': response.get('description', ''),
+                    'keywords': response.get('keywords', ''),
+                    'total_cost': item.total_cost or 0,
+                    'cached': item.cached,
+                    'repaired': response.get('repaired', False),
+                    'error': item.error if item.status != "완료" else None,
+                })
+                if item.status == "완료":
+                    log_agent_usage(tab_name, item.total_cost or 0, f"{batch.job_id}:{item.index}")
+            st.session_state[f"batch_result_{tab_name}"] = batch_result
+            st.rerun()
+
+    with col2:
+        st.subheader("3단계: 분석 결과 확인")
+        batch_result = st.session_state.get(f"batch_result_{tab_name}")
+        if batch_in_progress:
+            render_batch_progress(tab_name)
+        elif batch_result:
+            failed_count = sum(1 for result in batch_result if result['error'])
+            st.caption(f"총 {len(batch_result)}개 문제 중 {len(batch_result) - failed_count}개 분석 완료")
+            for i, result in enumerate(batch_result, start=1):
+                with st.expander(f"{i}. {result['name']}", expanded=(i == 1)):
+                    if result['error']:
+                        st.error(f"❌ 문제 분석 중 오류가 발생했습니다: {result['error']}")
+                        continue
+                    if result['cached']:
+                        st.caption("이전에 분석된 동일한 문제의 결과입니다. (추가 비용 없음)")
+                    st.markdown(":red-background[1. 정답]")
+                    st.markdown(result['answer'])
+                    st.markdown(":red-background[2. 해설]")
+                    st.markdown(result['description'])
+                    st.markdown(":red-background[3. 키워드]")
+                    st.markdown(result['keywords'])
+        else:
+            st.info("업로드한 문제들의 분석 결과가 업로드 순서대로 표시됩니다.")
+
 def render_quiz_analyzer(tab_name):
+    # 여러 문제 일괄 분석 모드
+    if st.toggle("여러 문제 일괄 분석", key=f"batch_mode_{tab_name}", help="여러 장의 문제 이미지를 한 번에 업로드하여 동시에 분석합니다."):
+        render_quiz_batch_analyzer(tab_name)
+        return
+
     # 2열 레이아웃 생성
     col1, col2 = st.columns([1, 1], gap="large")
+    analysis_in_progress = False
 
     # 분석 중단 플래그를 세션 상태로 관리 (탭별로 독립적)
     if f"analyzing_{tab_name}" not in st.session_state:
@@ -83,9 +411,11 @@ def render_quiz_analyzer(tab_name):
             st.subheader("2단계: 문제 확인 및 분석 시작")
             st.image(st.session_state[f"uploaded_image_{tab_name}"], caption="업로드된 문제")
 
-            # 이미지를 base64로 변환
             img_bytes = st.session_state[f"uploaded_image_{tab_name}"].getvalue()
-            img_base64 = base64.b64encode(img_bytes).decode('utf-8')
+
+            runner = get_analysis_runner()
+            job_key = f"analysis_job_{tab_name}"
+            analysis_in_progress = False
 
             # 분석 중이 아닐 때: 분석 시작 버튼, 분석 중일 때: 분석 중단 버튼
             if not st.session_state[f"analyzing_{tab_name}"]:
@@ -95,6 +425,9 @@ def render_quiz_analyzer(tab_name):
                     st.rerun()
             else:
                 if st.button("분석 중단", type="secondary", use_container_width=True, key=f"stop_analyze_{tab_name}"):
+                    # 백그라운드 작업을 취소하여 진행 중인 LLM 요청도 함께 중단
+                    if st.session_state.get(job_key):
+                        runner.cancel(st.session_state.pop(job_key))
                     st.session_state[f"analyze_stop_{tab_name}"] = True
                     st.session_state[f"analyzing_{tab_name}"] = False
                     st.info("분석이 중단되었습니다.")
@@ -102,44 +435,106 @@ def render_quiz_analyzer(tab_name):
 
             # 분석 중일 때만 분석 로직 실행
             if st.session_state[f"analyzing_{tab_name}"] and not st.session_state[f"analyze_stop_{tab_name}"]:
-                with st.spinner("문제를 분석하고 있습니다...", show_time=True):
+                if not st.session_state.get(job_key):
+                    # 동일한 문제의 분석 결과가 캐시에 있으면 LLM 호출 없이 바로 표시
+                    result_cache = get_result_cache()
+                    schema_version = get_schema_version(tab_name)
+                    cache_key = make_cache_key(img_bytes, tab_name, schema_version)
+                    cached_result = result_cache.get(cache_key)
+                    img_phash = None
+                    if cached_result is None:
+                        # 카메라 촬영 등으로 바이트가 달라진 동일 문제는 perceptual hash로 판별
+                        try:
+                            img_phash = phash(img_bytes)
+                            cached_result = result_cache.get_similar(img_phash, tab_name, schema_version)
+                        except Exception as e:
+                            print(f"Error: {e}")
+                    if cached_result:
+                        run_id = uuid.uuid4().hex
+                        st.session_state[f"quiz_result_{tab_name}"] = {
+                            'answer': cached_result.get('answer', ''),
+                            'description': cached_result.get('description', ''),
+                            'keywords': cached_result.get('keywords', ''),
+                            'total_cost': 0,
+                            'cached': True,
+                            'run_id': run_id,
+                        }
+                        # 사용 기록 업로드
+                        log_agent_usage(tab_name, 0, run_id)
+                        st.session_state[f"analyzing_{tab_name}"] = False
+                        st.session_state[f"last_feedback_uploaded_{tab_name}"] = False
+                        st.rerun()
+
+                    # 이미지 전처리 (회전 보정/여백 제거/축소/재인코딩) 후 base64로 변환
                     try:
-                        if tab_name == "영어":
-                            total_cost, response = quiz_analyzer_english(img_base64)
-                        elif tab_name == "과학":
-                            total_cost, response = quiz_analyzer_science(img_base64)
-
-                        # 분석 중단 요청이 들어왔는지 확인
-                        if st.session_state[f"analyze_stop_{tab_name}"]:
-                            st.info("분석이 중단되었습니다.")
-                            st.session_state[f"analyzing_{tab_name}"] = False
-                            st.rerun()
-                        else:
-                            if total_cost:
-                                # 결과를 세션 상태에 저장 (탭별로 독립적)
-                                st.session_state[f"quiz_result_{tab_name}"] = {
-                                    'answer': response.get('answer', ''),
-                                    'description': response.get('description', ''),
-                                    'keywords': response.get('keywords', ''),
-                                    'total_cost': total_cost if total_cost is not None else 0,
-                                }
-                                st.session_state[f"analyzing_{tab_name}"] = False
-                                st.session_state[f"last_feedback_uploaded_{tab_name}"] = False
-                                st.rerun()
-                            else:
-                                st.session_state[f"analyzing_{tab_name}"] = False
-                                st.error("❌ 문제 분석 중 오류가 발생했습니다. 다시 시도해주세요.")
+                        processed_bytes, mime_type, preprocess_stats = preprocess_image(img_bytes)
                     except Exception as e:
-                        st.session_state[f"analyzing_{tab_name}"] = False
-                        st.error(f"❌ 문제 분석 중 오류가 발생했습니다: {str(e)}")
+                        print(f"Error: {e}")
+                        processed_bytes, mime_type, preprocess_stats = img_bytes, "image/png", None
+                    with span("image.encode"):
+                        img_base64 = base64.b64encode(processed_bytes).decode('utf-8')
+
+                    # 백그라운드 실행기에 분석 작업 제출 (스크립트 스레드는 대기하지 않음)
+                    st.session_state[job_key] = runner.submit(tab_name, img_base64, mime_type)
+                    st.session_state[f"analysis_meta_{tab_name}"] = {
+                        'cache_key': cache_key,
+                        'img_phash': img_phash,
+                        'preprocess_stats': preprocess_stats,
+                    }
+
+                job = runner.get(st.session_state[job_key])
+                if job is None:
+                    # 서버 재시작 등으로 작업 정보가 유실된 경우
+                    del st.session_state[job_key]
+                    st.session_state[f"analyzing_{tab_name}"] = False
+                    st.error("❌ 문제 분석 중 오류가 발생했습니다. 다시 시도해주세요.")
+                elif not job.done():
+                    # 진행 상황은 3단계(분석 결과) 영역에 표시
+                    analysis_in_progress = True
+                else:
+                    runner.pop(job.job_id)
+                    del st.session_state[job_key]
+                    analysis_meta = st.session_state.pop(f"analysis_meta_{tab_name}", {})
+                    total_cost, response = job.result()
+                    st.session_state[f"analyzing_{tab_name}"] = False
+                    if response:
+                        # 결과를 세션 상태에 저장 (탭별로 독립적)
+                        st.session_state[f"quiz_result_{tab_name}"] = {
+                            'answer': response.get('answer', ''),
+                            'description': response.get('description', ''),
+                            'keywords': response.get('keywords', ''),
+                            'total_cost': total_cost if total_cost is not None else 0,
+                            'preprocess_stats': analysis_meta.get('preprocess_stats'),
+                            'repaired': response.get('repaired', False),
+                            'run_id': job.job_id,
+                        }
+                        # 사용 기록 업로드
+                        log_agent_usage(tab_name, total_cost or 0, job.job_id)
+                        if analysis_meta.get('cache_key'):
+                            get_result_cache().put(analysis_meta['cache_key'], tab_name, get_schema_version(tab_name), response, analysis_meta.get('img_phash'))
+                        st.session_state[f"last_feedback_uploaded_{tab_name}"] = False
+                        st.rerun()
+                    else:
+                        st.error("❌ 문제 분석 중 오류가 발생했습니다. 다시 시도해주세요.")
             st.divider()
 
     with col2:
         st.subheader("3단계: 분석 결과 확인")
+        # 분석 중인 경우 진행 상황 및 스트리밍 중인 해설 표시
+        if analysis_in_progress:
+            render_analysis_progress(tab_name)
         # 이전 분석 결과가 있는 경우 표시
-        if f"quiz_result_{tab_name}" in st.session_state and st.session_state[f"quiz_result_{tab_name}"]:
+        elif f"quiz_result_{tab_name}" in st.session_state and st.session_state[f"quiz_result_{tab_name}"]:
             quiz_result = st.session_state.get(f"quiz_result_{tab_name}", "")
             st.markdown("##### 분석 결과 예시")
+            if quiz_result.get('cached', False):
+                st.caption("이전에 분석된 동일한 문제의 결과입니다. (추가 비용 없음)")
+            elif quiz_result.get('preprocess_stats'):
+                preprocess_stats = quiz_result['preprocess_stats']
+                st.caption(
+                    f"이미지 최적화: {preprocess_stats['bytes_saved'] / 1024:,.0f}KB 절감, "
+                    f"예상 토큰 {preprocess_stats['tokens_saved']:,}개 절감"
+                )
             st.markdown(":red-background[1. 정답]")
             st.markdown(quiz_result.get('answer', ''))
             st.divider()
@@ -148,20 +543,6 @@ def render_quiz_analyzer(tab_name):
             st.divider()
             st.markdown(":red-background[3. 키워드]")
             st.markdown(quiz_result.get('keywords', ''))
-            
-            # 사용 기록 업로드
-            create_dt = time.strftime("%Y%m%d %H:%M:%S", time.localtime())
-            date_partition = create_dt.split(" ")[0]    
-            phn_no = st.session_state.get("phone_number", "")
-            admin_mode = st.session_state.get("admin_mode", False)
-            if admin_mode:
-                access_type = "관리자"
-            else:
-                access_type = "일반(학생)"
-            subject = tab_name
-            agent_type = "quiz_analyzer"
-            total_cost = quiz_result.get('total_cost', 0)
-            update_sheet_add_row("tbl_agent_usg_incr", [date_partition, create_dt, phn_no, access_type, subject, agent_type, total_cost])
         else:
             st.markdown("##### 분석 결과 예시")
             st.markdown(":red-background[1. 정답]")
@@ -170,6 +551,91 @@ def render_quiz_analyzer(tab_name):
             st.divider()
             st.markdown(":red-background[3. 키워드]")
 
+def render_performance():
+    """구간별 실행 시간(히스토그램)과 캐시/외부 API 통계를 표시합니다."""
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        enabled = st.toggle(
+            "실행 시간 측정",
+            value=is_tracing_enabled(),
+            help="시트 조회/기록, LLM 호출, 문자 발송, 이미지 처리, 화면 렌더링 구간의 실행 시간을 기록합니다. (서버 전체에 적용)"
+        )
+        if enabled != is_tracing_enabled():
+            set_tracing_enabled(enabled)
+    with col2:
+        if st.button("측정 결과 초기화", use_container_width=True):
+            reset_tracing()
+    with col3:
+        st.download_button(
+            "Prometheus 내보내기",
+            data=export_prometheus,
+            file_name="metrics.prom",
+            mime="text/plain",
+            use_container_width=True,
+        )
+
+    span_stats = get_span_stats()
+    if not span_stats:
+        st.info("측정된 구간이 없습니다. 실행 시간 측정을 켜고 서비스를 사용하면 결과가 표시됩니다.")
+    else:
+        st.markdown("##### 구간별 실행 시간")
+        df_spans = pd.DataFrame([
+            {
+                '구간': name,
+                '호출 수': stats['count'],
+                '오류 수': stats['errors'],
+                '합계(초)': stats['total_sec'],
+                '평균(ms)': stats['avg_sec'] * 1000,
+                'p50(ms)': stats['p50_sec'] * 1000,
+                'p95(ms)': stats['p95_sec'] * 1000,
+                'p99(ms)': stats['p99_sec'] * 1000,
+                '최대(ms)': stats['max_sec'] * 1000,
+            }
+            for name, stats in span_stats.items()
+        ]).sort_values('합계(초)', ascending=False)
+        st.dataframe(df_spans, use_container_width=True, hide_index=True)
+
+        st.markdown("##### 구간별 분포")
+        span_name = st.selectbox("구간", df_spans['구간'].tolist(), key="performance_span")
+        df_buckets = pd.DataFrame(
+            [(f"≤{bound * 1000:g}ms" if bound is not None else "그 이상", count) for bound, count in get_span_buckets(span_name)],
+            columns=['실행 시간', '호출 수']
+        )
+        st.bar_chart(df_buckets, x='실행 시간', y='호출 수', sort=False)
+
+        recent_traces = get_recent_traces()
+        if recent_traces:
+            st.markdown("##### 최근 실행")
+            df_traces = pd.DataFrame([
+                {
+                    '시각': time.strftime("%H:%M:%S", time.localtime(trace['finished_at'])),
+                    '구간': trace['name'],
+                    '전체(ms)': trace['duration_sec'] * 1000,
+                    '하위 구간': ", ".join(
+                        f"{name} {child['count']}회 {child['total_sec'] * 1000:,.0f}ms"
+                        for name, child in sorted(trace['children'].items(), key=lambda item: -item[1]['total_sec'])
+                    ),
+                }
+                for trace in recent_traces
+            ])
+            st.dataframe(df_traces, use_container_width=True, hide_index=True)
+
+    with st.expander("캐시/외부 API 통계"):
+        st.markdown("**시트 조회 캐시**")
+        st.json(get_read_cache_stats(), expanded=False)
+        st.markdown("**분석 결과 캐시**")
+        st.json(get_result_cache().stats(), expanded=False)
+        st.markdown("**로그 테이블 증분 조회**")
+        st.json(get_partitioned_reader().stats, expanded=False)
+        st.markdown("**회원 색인**")
+        st.json(get_member_index().stats(), expanded=False)
+        st.markdown("**로그 적재 버퍼**")
+        st.json(get_log_writer().stats(), expanded=False)
+        st.markdown("**문자 발송 API**")
+        st.json(get_sms_client().stats(), expanded=False)
+        st.markdown("**LLM 응답 파싱**")
+        st.json(get_parse_stats(), expanded=False)
+
 def page_main():
     """메인 페이지"""
     # 페이지 설정
@@ -201,8 +667,8 @@ def page_main():
         menu_options = ["About", "Release Notes", "---", "Quiz Analyzer", "---", "Dashboard"]
         menu_icons = ["bi bi-house", "bi bi-sticky", None, "bi bi-chat", None, "bi bi-bar-chart-line"]
         if admin_mode:
-            menu_options += ["---", "Access Control", "Admin Dashboard"]
-            menu_icons += [None, "bi bi-key", "bi bi-bar-chart-line"]
+            menu_options += ["---", "Access Control", "Admin Dashboard", "Performance"]
+            menu_icons += [None, "bi bi-key", "bi bi-bar-chart-line", "bi bi-speedometer2"]
 
         # 현재 선택된 메뉴를 세션 상태로 관리
         if "selected_menu" not in st.session_state:
@@ -282,6 +748,8 @@ def page_main():
 
             :red-background[1단계: 문제 선택]
             - 문제는 사진 업로드 또는 사진 촬영을 통해 업로드 가능합니다. (PNG, JPG, JPEG / 10MB 이하)
+            - **여러 문제 일괄 분석**을 켜면 여러 장의 문제를 한 번에 업로드하여 동시에 분석할 수 있습니다.
+            - 한 장에 여러 문제가 있는 시험지는 문제별로 분할하여 각각 분석할 수 있습니다.
 
             :red-background[2단계: 문제 확인 및 분석 시작]
             - 업로드한 문제를 확인할 수 있으며, 분석 시작을 통해 AI 분석을 실행합니다.
@@ -292,21 +760,21 @@ def page_main():
             - 새로운 문제를 분석하고자 할 때는 1단계로 돌아가 새로운 문제를 업로드해주세요.
             """
         )
-        tab1, tab2, tab3, tab4 = st.tabs(["국어", "수학", "영어", "과학"])
-        with tab1:
-            st.write("Coming soon...")
-        with tab2:
-            st.write("Coming soon...")
-        with tab3:
-            render_quiz_analyzer("영어")
-        with tab4:
-            render_quiz_analyzer("과학")
+        subjects = ["국어", "수학", "영어", "과학"]
+        for subject, tab in zip(subjects, st.tabs(subjects)):
+            with tab:
+                # 분석 설정이 등록된 과목만 분석 기능 제공
+                if subject in ANALYZERS:
+                    render_quiz_analyzer(subject)
+                else:
+                    st.write("Coming soon...")
 
     elif selected_menu == "Dashboard":
         st.title("Dashboard")
         st.markdown(
             """
-            - 나의 Agent 사용 기록을 확인할 수 있습니다.
+            - 나의 Agent 사용 횟수, 발생 비용 및 일별/과목별 사용 현황을 확인할 수 있습니다.
+            - 상세 이력 보기를 켜면 사용 기록 원본을 확인할 수 있습니다.
             """
         )
 
@@ -316,15 +784,10 @@ def page_main():
             admin_mode = "일반(학생)"
         phone_number = st.session_state.get("phone_number", "")
 
-        df_log = read_sheet_by_df("tbl_agent_usg_incr")
-        df_log = df_log[(df_log['phn_no'] == phone_number) & (df_log['access_type'] == admin_mode)]
-                
-        df_name = read_sheet_by_df("tbl_mbr_req_incr")
-        df_name = df_name[(df_name['phn_no'] == phone_number) & (df_name['access_type'] == admin_mode)]
-        df_name = df_name[['phn_no', 'name']].drop_duplicates()
-        df_log = df_log.merge(df_name, on='phn_no', how='left')
+        render_usage_summary(get_usage_rollup(), phn_no=phone_number, access_type=admin_mode)
 
-        if not df_log.empty:
+        # 원본 이력은 요청 시에만 조회
+        if st.toggle("상세 이력 보기", key="dashboard_show_rows"):
             # 컬럼명을 한글로 매핑 (필요시)
             column_mapping = {
                 'date_partition': '날짜',
@@ -336,9 +799,11 @@ def page_main():
                 'agent_type': 'Agent 유형',
                 'total_cost': '발생 비용'
             }
-            df_log_renamed = df_log[['date_partition', 'create_dt', 'name', 'phn_no', 'access_type', 'subject', 'agent_type', 'total_cost']]
-            df_log_renamed = df_log_renamed.rename(columns=column_mapping)
-            st.dataframe(df_log_renamed, use_container_width=True)
+            render_log_viewer(
+                "tbl_agent_usg_incr", column_mapping, "dashboard_rows",
+                filter_options={'subject': list(ANALYZERS)},
+                fixed_filters={'phn_no': phone_number, 'access_type': admin_mode},
+            )
 
     elif selected_menu == "Access Control" and  admin_mode==True:
         st.title("Access Control")
@@ -361,7 +826,7 @@ def page_main():
             try:
                 # 세션 상태에 데이터가 없거나 Admin 메뉴에 처음 접근한 경우에만 데이터를 불러옴
                 if "admin_df" not in st.session_state or "admin_last_load" not in st.session_state:
-                    st.session_state.admin_df = read_sheet_by_df("tbl_mbr_req_incr")
+                    st.session_state.admin_df = read_table("tbl_mbr_req_incr")
                     st.session_state.admin_last_load = time.time()
                 
                 df = st.session_state.admin_df
@@ -462,33 +927,38 @@ def page_main():
                                                 if col in updated_df.columns and col not in ['req_id', 'date_partition', 'create_dt', 'access_type', 'agr_svc_terms', 'agr_psnl_info']:
                                                     updated_df.loc[original_idx[0], col] = edited_row[col]
                                 
-                                # 문자 발송 대상 연락처 추출
-                                for change in status_changes:
-                                    if change['from'] in ['대기', '비활성'] and change['to'] == '활성':
-                                        sms_body = f"[BASECAMP Agent]\n접근 권한이 활성화되었습니다."
-                                        sms_type = "approved"
-                                    elif change['from'] == '활성' and change['to'] in ['대기', '비활성']:
-                                        sms_body = f"[BASECAMP Agent]\n접근 권한이 비활성화되었습니다."
-                                        sms_type = "rejected"
-                                    else:
-                                        continue
+                                # 변경된 행만 업데이트
+                                success, _ = update_rows("tbl_mbr_req_incr", df, updated_df)
+                                if success:
+                                    # 로그인 확인용 회원 색인에 변경된 권한 상태 즉시 반영
+                                    member_index = get_member_index()
+                                    for change in status_changes:
+                                        member_index.update_status(change['req_id'], change['phn_no'], change['access_type'], change['to'])
 
+                                    # 문자 발송 대상 연락처 추출
                                     create_dt = time.strftime("%Y%m%d %H:%M:%S", time.localtime())
-                                    date_partition = create_dt.split(" ")[0]    
-                                    send_sms(date_partition, create_dt, change['phn_no'], sms_type, sms_body)
-
+                                    date_partition = create_dt.split(" ")[0]
                                     phn_no_author = st.session_state.get("phone_number", "")
-                                    update_sheet_add_row(
-                                        "tbl_mbr_access_chg_incr", 
-                                        [
+                                    recipients = []
+                                    audit_rows = []
+                                    for change in status_changes:
+                                        if change['from'] in ['대기', '비활성'] and change['to'] == '활성':
+                                            sms_body = f"[BASECAMP Agent]\n접근 권한이 활성화되었습니다."
+                                            sms_type = "approved"
+                                        elif change['from'] == '활성' and change['to'] in ['대기', '비활성']:
+                                            sms_body = f"[BASECAMP Agent]\n접근 권한이 비활성화되었습니다."
+                                            sms_type = "rejected"
+                                        else:
+                                            continue
+                                        recipients.append(SmsRecipient(change['phn_no'], sms_type, sms_body, meta={'req_id': change['req_id']}))
+                                        audit_rows.append([
                                             change['req_id'], date_partition, create_dt, change['phn_no'], change['access_type'], phn_no_author, change['from'], change['to']
-                                        ]
-                                    )
-                                    time.sleep(0.1)
-                                
-                                # 변경된 행만 업데이트
-                                success, _ = update_sheet_specific_rows("tbl_mbr_req_incr", df, updated_df)
-                                if success:
+                                        ])
+
+                                    # 권한 수정 이력은 1회에 모두 기록하고, 문자는 백그라운드에서 내용별로 묶어 발송
+                                    add_rows("tbl_mbr_access_chg_incr", audit_rows)
+                                    if recipients:
+                                        st.session_state.sms_dispatch_job = get_sms_dispatcher().submit(recipients)
                                     st.session_state.admin_message = {"type": "success", "text": f"✅ 변경사항을 성공적으로 적용하였습니다."}
                                     # 저장 후 세션 상태의 데이터도 업데이트
                                     st.session_state.admin_df = updated_df
@@ -522,6 +992,10 @@ def page_main():
                         # 단, warning 메시지는 실시간 검증을 위해 유지
                         if message_type != "warning":
                             del st.session_state.admin_message
+
+                    # 권한 변경 안내 문자 발송 현황
+                    if st.session_state.get("sms_dispatch_job"):
+                        render_sms_dispatch_status()
                 else:
                     st.info("데이터가 없습니다.")
                     
@@ -530,30 +1004,22 @@ def page_main():
                 st.code(f"오류 상세: {str(e)}")
         with tab2:
             try:
-                df_access_chg = read_sheet_by_df("tbl_mbr_access_chg_incr")
-                
-                df_name = read_sheet_by_df("tbl_mbr_req_incr")
-                df_name = df_name[['phn_no', 'name']].drop_duplicates()
-                df_access_chg = df_access_chg.merge(df_name, on='phn_no', how='left')
-
-                if not df_access_chg.empty:
-                    # 컬럼명을 한글로 매핑 (필요시)
-                    column_mapping = {
-                        'req_id': '요청ID',
-                        'date_partition': '날짜',
-                        'create_dt': '날짜/시간',
-                        'name': '이름',
-                        'phn_no': '연락처',
-                        'access_type': '권한 유형',
-                        'author': '관리자 연락처',
-                        'status_from': '기존 권한',
-                        'status_to': '신규 권한'
-                    }
-                    df_access_chg_renamed = df_access_chg[['req_id', 'date_partition', 'create_dt', 'name', 'phn_no', 'access_type', 'author', 'status_from', 'status_to']]
-                    df_access_chg_renamed = df_access_chg_renamed.rename(columns=column_mapping)
-                    st.dataframe(df_access_chg_renamed, use_container_width=True)
-                else:
-                    st.info("권한 변경 이력 데이터가 없습니다.")
+                # 컬럼명을 한글로 매핑 (필요시)
+                column_mapping = {
+                    'req_id': '요청ID',
+                    'date_partition': '날짜',
+                    'create_dt': '날짜/시간',
+                    'name': '이름',
+                    'phn_no': '연락처',
+                    'access_type': '권한 유형',
+                    'author': '관리자 연락처',
+                    'status_from': '기존 권한',
+                    'status_to': '신규 권한'
+                }
+                render_log_viewer(
+                    "tbl_mbr_access_chg_incr", column_mapping, "access_chg_rows",
+                    filter_options={'access_type': ACCESS_TYPES, 'status_to': ['활성', '대기', '비활성']},
+                )
             except Exception as e:
                 st.error(f"권한 변경 이력 데이터를 불러오는 중 오류가 발생했습니다: {e}")
                 st.code(f"오류 상세: {str(e)}")
@@ -568,45 +1034,49 @@ def page_main():
             - 사용자들의 로그인 이력을 확인할 수 있습니다. (읽기 전용)
 
             :red-background[Agent 사용 이력]
-            - 사용자들의 Agent 사용 이력을 확인할 수 있습니다. (읽기 전용)
+            - 사용자들의 Agent 사용 현황(합계, 일별 추이, 과목/권한 유형별 현황, 상위 사용자)과 사용 이력을 확인할 수 있습니다. (읽기 전용)
             """
         )
 
         tab1, tab2 = st.tabs(["로그인 이력", "Agent 사용 이력"])
         with tab1:
             try:
-                df_login = read_sheet_by_df("tbl_mbr_login_incr")
-
-                df_name = read_sheet_by_df("tbl_mbr_req_incr")
-                df_name = df_name[['phn_no', 'name']].drop_duplicates()
-                df_login = df_login.merge(df_name, on='phn_no', how='left')
-
-                if not df_login.empty:
-                    # 컬럼명을 한글로 매핑 (필요시)
-                    column_mapping = {
-                        'date_partition': '날짜',
-                        'create_dt': '날짜/시간',
-                        'name':'이름',
-                        'phn_no': '연락처',
-                        'access_type': '권한 유형',
-                    }
-                    df_login_renamed = df_login[['date_partition', 'create_dt', 'name', 'phn_no', 'access_type']]
-                    df_login_renamed = df_login_renamed.rename(columns=column_mapping)
-                    st.dataframe(df_login_renamed, use_container_width=True)
-                else:
-                    st.info("로그인 이력 데이터가 없습니다.")
+                # 컬럼명을 한글로 매핑 (필요시)
+                column_mapping = {
+                    'date_partition': '날짜',
+                    'create_dt': '날짜/시간',
+                    'name':'이름',
+                    'phn_no': '연락처',
+                    'access_type': '권한 유형',
+                }
+                render_log_viewer(
+                    "tbl_mbr_login_incr", column_mapping, "admin_login_rows",
+                    filter_options={'access_type': ACCESS_TYPES},
+                )
             except Exception as e:
                 st.error(f"로그인 이력 데이터를 불러오는 중 오류가 발생했습니다: {e}")
                 st.code(f"오류 상세: {str(e)}")
         with tab2:
             try:
-                df_log = read_sheet_by_df("tbl_agent_usg_incr")
-                        
-                df_name = read_sheet_by_df("tbl_mbr_req_incr")
-                df_name = df_name[['phn_no', 'name']].drop_duplicates()
-                df_log = df_log.merge(df_name, on='phn_no', how='left')
+                usage_rollup = get_usage_rollup()
+                render_usage_summary(usage_rollup)
+                member_names = get_member_index().names()
+
+                st.markdown("##### 권한 유형별 사용 현황")
+                df_access_type = usage_rollup.by('access_type').rename(columns={'count': '사용 횟수', 'total_cost': '발생 비용'})
+                df_access_type.index.name = '권한 유형'
+                st.dataframe(df_access_type, use_container_width=True)
 
-                if not df_log.empty:
+                st.markdown("##### 상위 사용자 (발생 비용 기준)")
+                df_top = usage_rollup.top_users(10)
+                df_top['name'] = df_top['phn_no'].map(member_names)
+                df_top = df_top[['name', 'phn_no', 'access_type', 'count', 'total_cost']].rename(
+                    columns={'name': '이름', 'phn_no': '연락처', 'access_type': '권한 유형', 'count': '사용 횟수', 'total_cost': '발생 비용'}
+                )
+                st.dataframe(df_top, use_container_width=True, hide_index=True)
+
+                # 원본 이력은 요청 시에만 조회
+                if st.toggle("상세 이력 보기", key="admin_usage_show_rows"):
                     # 컬럼명을 한글로 매핑 (필요시)
                     column_mapping = {
                         'date_partition': '날짜',
@@ -618,26 +1088,47 @@ def page_main():
                         'agent_type': 'Agent 유형',
                         'total_cost': '발생 비용'
                     }
-                    df_log_renamed = df_log[['date_partition', 'create_dt', 'name', 'phn_no', 'access_type', 'subject', 'agent_type', 'total_cost']]
-                    df_log_renamed = df_log_renamed.rename(columns=column_mapping)
-                    st.dataframe(df_log_renamed, use_container_width=True)
+                    render_log_viewer(
+                        "tbl_agent_usg_incr", column_mapping, "admin_usage_rows",
+                        filter_options={'access_type': ACCESS_TYPES, 'subject': list(ANALYZERS)},
+                    )
             except Exception as e:
                 st.error(f"사용 이력 데이터를 불러오는 중 오류가 발생했습니다: {e}")
                 st.code(f"오류 상세: {str(e)}")
 
+    elif selected_menu == "Performance" and admin_mode==True:
+        st.title("Performance")
+        st.markdown(
+            """
+            관리자 전용 성능 모니터링 화면입니다.
+
+            :red-background[구간별 실행 시간]
+            - 실행 시간 측정을 켠 이후의 구간별 호출 수, 평균/백분위수 실행 시간과 분포를 확인할 수 있습니다.
+            - 최근 실행에서 화면 1회 렌더링 중 시트/LLM/문자/이미지 처리에 사용된 시간을 확인할 수 있습니다.
+            """
+        )
+        render_performance()
+
 def main():
     # 세션 상태 초기화
     if "logged_in" not in st.session_state:
         st.session_state.logged_in = False
     if "step" not in st.session_state:
         st.session_state.step = "phone_input"  # phone_input, verification, main
-    
+
+    # TRACING_PROMETHEUS_PORT가 지정된 경우 /metrics 서버 실행 (최초 1회)
+    get_prometheus_exporter()
+
+    # 화면 렌더링 구간 (메인 페이지는 메뉴별로 기록)
     if st.session_state.logged_in:
-        page_main()
+        with span(f"page.{st.session_state.get('selected_menu', 'Quiz Analyzer')}"):
+            page_main()
     elif st.session_state.step == "phone_input":
-        page_phone_input()
+        with span("page.phone_input"):
+            page_phone_input()
     elif st.session_state.step == "verification":
-        page_verification()
+        with span("page.verification"):
+            page_verification()
 
 if __name__ == "__main__":
     main()